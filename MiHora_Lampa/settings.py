@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'django.contrib.postgres',
     "core",
     'colorfield',
 ]
@@ -51,7 +52,7 @@ X_FRAME_OPTIONS='SAMEORIGIN'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.SesionPorRutaMiddleware',
     "django.middleware.locale.LocaleMiddleware", 
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,6 +61,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "core.middleware.PacienteForcePasswordChangeMiddleware",
     "core.middleware.ensure_prof_setup_middleware",
+    "core.middleware.LecturaPrimarioTrasEscrituraMiddleware",
 ]
 
 ROOT_URLCONF = 'MiHora_Lampa.urls'
@@ -112,18 +114,113 @@ WSGI_APPLICATION = 'MiHora_Lampa.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+def _env_bool(nombre, defecto):
+    valor = os.getenv(nombre)
+    return defecto if valor is None else valor.strip().lower() in ("1", "true", "si", "sí", "yes", "on")
+
+
+# Conexión configurable por variables de entorno (los valores por defecto son los del pooler de Supabase).
+# - DB_CONN_MAX_AGE: segundos que una conexión se reutiliza entre requests (0 = abrir/cerrar en cada request).
+# - DB_CONN_HEALTH_CHECKS: verifica la conexión reutilizada antes de usarla (evita errores tras un corte del pooler).
+# - DB_DISABLE_SERVER_SIDE_CURSORS: obligatorio con PgBouncer en modo transacción (puerto 6543),
+#   porque un cursor con nombre no sobrevive de una transacción a otra.
+# - DB_POOL=1: pool de conexiones de psycopg 3 (requiere "psycopg[pool]"); reemplaza a CONN_MAX_AGE.
+DB_PORT = os.getenv("DB_PORT", "6543")
+DB_POOL = _env_bool("DB_POOL", False)
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
-        "NAME":   "postgres",
-        "USER":   "postgres.dwcwaimjdtrbvzcxjaab",
-        "PASSWORD": "ernesto-eder1234.",  # tal cual, sin URL-encode
-        "HOST":   "aws-1-sa-east-1.pooler.supabase.com",        # p.ej. db.abcd.supabase.co
-        "PORT":   "6543",
-        "OPTIONS": {"sslmode": "require"},
+        "NAME":   os.getenv("DB_NAME", "postgres"),
+        "USER":   os.getenv("DB_USER", "postgres.dwcwaimjdtrbvzcxjaab"),
+        "PASSWORD": os.getenv("DB_PASSWORD", "ernesto-eder1234."),  # tal cual, sin URL-encode
+        "HOST":   os.getenv("DB_HOST", "aws-1-sa-east-1.pooler.supabase.com"),        # p.ej. db.abcd.supabase.co
+        "PORT":   DB_PORT,
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": _env_bool("DB_CONN_HEALTH_CHECKS", True),
+        "DISABLE_SERVER_SIDE_CURSORS": _env_bool("DB_DISABLE_SERVER_SIDE_CURSORS", DB_PORT == "6543"),
+        "OPTIONS": {
+            "sslmode": os.getenv("DB_SSLMODE", "require"),
+            "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+        },
   }
 }
 
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX", "10")),
+        "timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+    }
+
+# Réplica de lectura opcional (DB_REPLICA_HOST): la usan las vistas marcadas con @lectura_replica.
+# Mismas credenciales que "default" salvo que se indiquen DB_REPLICA_*.
+if os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "USER": os.getenv("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.getenv("DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", DB_PORT),
+        "OPTIONS": {**DATABASES["default"]["OPTIONS"]},
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+# Segundos que una sesión sigue leyendo del primario después de escribir (read-your-writes)
+REPLICA_STICKY_SEGUNDOS = int(os.getenv("REPLICA_STICKY_SEGUNDOS", "15"))
+
+
+# Caché compartida entre workers (rate limiting, directorio, KPIs...).
+# CACHE_BACKEND: "file" (por defecto, sirve para varios workers en el mismo servidor),
+# "db" (tabla en la BD; crear con `python manage.py createcachetable`),
+# "redis" (REDIS_URL, requiere el paquete redis) o "locmem" (solo desarrollo, por proceso).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file").lower()
+_CACHE_OPCIONES = {
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("CACHE_DIR", str(BASE_DIR / ".cache")),
+    },
+    "db": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_mihora",
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1"),
+    },
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+CACHES = {
+    "default": {
+        **_CACHE_OPCIONES[CACHE_BACKEND],
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", "300")),
+        "KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", "mihora"),
+    },
+}
+
+# Límite de intentos en login/recuperación de pacientes (core/ratelimit.py).
+# RATELIMIT_CONFIAR_PROXY: tomar la IP de X-Forwarded-For (solo detrás de un proxy propio).
+RATELIMIT_ACTIVO = os.getenv("RATELIMIT_ACTIVO", "1") != "0"
+RATELIMIT_CONFIAR_PROXY = os.getenv("RATELIMIT_CONFIAR_PROXY", "0") == "1"
+# Dónde van los contadores: "cache" solo con Redis (incr atómico); si no, tabla en la BD ("bd")
+RATELIMIT_ALMACEN = os.getenv("RATELIMIT_ALMACEN", "cache" if CACHE_BACKEND == "redis" else "bd")
+
+# Sesiones por zona (core/sesiones.py + SesionPorRutaMiddleware):
+# - personal (/panel, /admin, /ingreso, ...): cached_db, cookie SESSION_COOKIE_NAME.
+# - portal de pacientes y páginas públicas: cookie firmada (sin consultas a la BD),
+#   cookie propia y duración SESION_PACIENTES_EDAD.
+# Las sesiones vencidas del personal se limpian con `python manage.py clearsessions`
+# (cron diario, p.ej.: 15 3 * * * python manage.py clearsessions).
+SESSION_ENGINE = os.getenv("SESION_STAFF_ENGINE", "django.contrib.sessions.backends.cached_db")
+SESION_STAFF_ENGINE = SESSION_ENGINE
+SESION_PACIENTES_ENGINE = os.getenv("SESION_PACIENTES_ENGINE", "core.sesiones")
+SESION_PACIENTES_COOKIE = os.getenv("SESION_PACIENTES_COOKIE", "mihora_paciente")
+SESION_PACIENTES_EDAD = int(os.getenv("SESION_PACIENTES_EDAD", str(60 * 60 * 8)))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -135,6 +232,28 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',},
 ]
 
+# Hash de contraseñas (core/hashing.py). PASSWORD_HASHER: "pbkdf2" (por defecto) o "argon2"
+# (requiere argon2-cffi). Cambiar el hasher o el costo no invalida claves: los hashes viejos
+# se siguen verificando y se re-hashean con la configuración actual en el siguiente login.
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "pbkdf2").lower()
+PBKDF2_ITERACIONES = int(os.getenv("PBKDF2_ITERACIONES", "870000"))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "102400"))   # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "8"))
+HASHING_HILOS = int(os.getenv("HASHING_HILOS", "0")) or None          # None = min(4, núcleos)
+
+PASSWORD_HASHERS = [
+    "core.hashing.PBKDF2Configurable",
+    "core.hashing.Argon2Configurable",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+if PASSWORD_HASHER == "argon2":
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -151,12 +270,52 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = Path(os.getenv("STATIC_ROOT", BASE_DIR / "staticfiles"))
+
+# collectstatic: nombres con hash de contenido + .gz/.br al lado (ver core/estaticos.py)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "core.estaticos.ManifestComprimidoStorage"},
+}
+
+# La app sirve /static/ desde STATIC_ROOT (sin nginx delante); con DEBUG lo hace runserver
+SERVIR_ESTATICOS = _env_bool("SERVIR_ESTATICOS", not DEBUG)
+ESTATICOS_MAX_AGE = 60 * 60 * 24 * 365          # archivos con hash: un año, immutable
+ESTATICOS_MAX_AGE_SIN_HASH = 60 * 60            # el resto (p.ej. rutas sin pasar por {% static %})
+
+# Anchos (px) de las variantes responsive que genera generar_variantes_imagenes
+IMAGENES_ANCHOS = (480, 768, 1080)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Auditoría de citas: retención en BD y destino de los meses archivados (JSONL gzip)
+AUDITORIA_ARCHIVO_DIR = Path(os.getenv("AUDITORIA_ARCHIVO_DIR", BASE_DIR / "archivo" / "auditoria"))
+AUDITORIA_RETENCION_MESES = int(os.getenv("AUDITORIA_RETENCION_MESES", "12"))
+
+# Catálogos en memoria (estados de cita, ubicaciones, especialidades): vigencia máxima en segundos
+CATALOGOS_TTL = int(os.getenv("CATALOGOS_TTL", "300"))
+
+# Directorio público de profesionales (listado + grillas renderizadas) en caché
+DIRECTORIO_TTL = int(os.getenv("DIRECTORIO_TTL", "600"))
+# JSON de KPIs de recepción (por rango y profesional)
+KPIS_CACHE_TTL = int(os.getenv("KPIS_CACHE_TTL", "120"))
+
+# Lista de espera: al cancelar una cita el bloque se asigna a la mejor inscripción activa
+LISTA_ESPERA_ACTIVA = _env_bool("LISTA_ESPERA_ACTIVA", True)
+LISTA_ESPERA_ANTICIPACION = int(os.getenv("LISTA_ESPERA_ANTICIPACION", "120"))  # minutos mínimos
+LISTA_ESPERA_ESTADO = os.getenv("LISTA_ESPERA_ESTADO", "Pendiente")             # estado de la cita creada
+
+# Riesgo de ausencia: días hacia adelante que puntúa `puntuar_citas` (y el entrenamiento al terminar)
+RIESGO_DIAS_ADELANTE = int(os.getenv("RIESGO_DIAS_ADELANTE", "14"))
+
+# Sobrecupo por franja (profesional, hora) según la ausencia histórica; ver core/sobrecupo.py
+SOBRECUPO_COSTO_DESBORDE = float(os.getenv("SOBRECUPO_COSTO_DESBORDE", "0.25"))  # en bloques por paciente de más
+SOBRECUPO_MAX_POR_BLOQUE = int(os.getenv("SOBRECUPO_MAX_POR_BLOQUE", "1"))
+SOBRECUPO_MIN_CITAS = int(os.getenv("SOBRECUPO_MIN_CITAS", "30"))                # historial mínimo de la franja
+
 # Para manejar fotos
 MEDIA_URL = "/media/"
 from pathlib import Path
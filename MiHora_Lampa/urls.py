@@ -16,7 +16,9 @@ Including another URLconf
 """
 from django.conf import settings
 from django.conf.urls.static import static
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from core.estaticos import servir_estatico
 
 
 urlpatterns = [
@@ -27,5 +29,8 @@ urlpatterns = [
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
+if settings.SERVIR_ESTATICOS:
+    urlpatterns += [re_path(rf"^{settings.STATIC_URL.strip('/')}/(?P<ruta>.+)$", servir_estatico)]
+
 handler404 = "core.views.custom_404"
 
@@ -1,13 +1,142 @@
+from datetime import datetime, time, timedelta
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .forms import normaliza_rut, valida_rut_chileno
 from .models import (
     Role, UserRole,
     Especialidad, Profesional,
     Ubicacion, EstadoCita,
     Agenda, Paciente,
-    AuditoriaCita, ContactoCita
+    AuditoriaCita, ContactoCita, ListaEspera, ExcepcionAgenda, ModeloRiesgo
 )
 
 
+# =========================
+#  RENDIMIENTO DEL ADMIN (tablas grandes)
+# =========================
+# En Agenda, Paciente, Auditoría y Contactos el changelist no debe recorrer la tabla:
+# - sin filtros, el total sale de las estadísticas de PostgreSQL (pg_class.reltuples);
+# - con filtros, se cuenta como máximo CONTEO_TOPE filas (COUNT sobre un LIMIT);
+# - show_full_result_count=False evita el segundo COUNT(*) del "N en total";
+# - las barras laterales solo filtran por catálogos chicos o choices (nada de DISTINCT
+#   sobre la tabla), y las FKs a tablas grandes se editan con raw_id/autocompletar.
+
+CONTEO_UMBRAL = 50_000     # bajo esto el COUNT(*) exacto es barato
+CONTEO_TOPE = 10_000       # filas como máximo al contar un listado filtrado
+
+
+def filas_estimadas(model, alias="default") -> int | None:
+    """
+    Filas según las estadísticas de PostgreSQL (suma las particiones si la tabla está
+    particionada, como auditoria_citas). None en otros motores o sin ANALYZE todavía.
+    """
+    conn = connections[alias]
+    if conn.vendor != "postgresql":
+        return None
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT SUM(GREATEST(c.reltuples, 0)), BOOL_OR(c.reltuples >= 0) FROM pg_class c "
+            "WHERE c.oid = to_regclass(%s) "
+            "   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))",
+            [model._meta.db_table] * 2,
+        )
+        total, analizada = cur.fetchone()
+    return int(total) if analizada else None
+
+
+class ConteoEstimadoPaginator(Paginator):
+    """Paginador del admin con conteo estimado (sin filtros) o acotado (con filtros)."""
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if not qs.query.where:
+            estimado = filas_estimadas(qs.model, qs.db)
+            if estimado is not None and estimado >= CONTEO_UMBRAL:
+                return estimado
+            return qs.count()
+        # SELECT COUNT(*) FROM (... LIMIT CONTEO_TOPE): el costo no crece con la tabla
+        return qs.order_by()[:CONTEO_TOPE].count()
+
+
+class AdminEscalable(admin.ModelAdmin):
+    """Base para los modelos con millones de filas."""
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class FiltroRangoAgenda(admin.SimpleListFilter):
+    """Rangos sobre el índice de inicio (reemplaza date_hierarchy, que hace DISTINCT por año)."""
+    title = "rango"
+    parameter_name = "rango"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("hoy", "Hoy"),
+            ("semana", "Próximos 7 días"),
+            ("mes", "Próximos 30 días"),
+            ("pasadas", "Últimos 30 días"),
+        )
+
+    def queryset(self, request, queryset):
+        hoy = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        rangos = {
+            "hoy": (hoy, hoy + timedelta(days=1)),
+            "semana": (hoy, hoy + timedelta(days=7)),
+            "mes": (hoy, hoy + timedelta(days=30)),
+            "pasadas": (hoy - timedelta(days=30), hoy),
+        }
+        if self.value() not in rangos:
+            return queryset
+        desde, hasta = rangos[self.value()]
+        return queryset.filter(inicio__gte=desde, inicio__lt=hasta)
+
+
+class FiltroProfesional(admin.SimpleListFilter):
+    """Como el filtro por FK, pero en una consulta (str(profesional) usa la especialidad)."""
+    title = "profesional"
+    parameter_name = "profesional__id__exact"
+
+    def lookups(self, request, model_admin):
+        return [(p.pk, str(p)) for p in Profesional.objects.select_related("especialidad").order_by("apellido", "nombre")]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(profesional_id=self.value())
+        return queryset
+
+
+def _rut_buscado(termino: str) -> str | None:
+    rut = normaliza_rut(termino)
+    return rut if valida_rut_chileno(rut) else None
+
+
+class BusquedaPorCitaMixin:
+    """
+    Búsqueda indexada para tablas que cuelgan de una cita: por id de cita (número) o
+    por RUT del paciente (unique en pacientes -> citas por paciente -> filas por cita).
+    Cualquier otro texto no busca: un icontains cruzando joins recorrería toda la tabla.
+    """
+    search_help_text = "Id de cita o RUT del paciente."
+
+    def get_search_results(self, request, queryset, search_term):
+        termino = search_term.strip()
+        if not termino:
+            return queryset, False
+        if termino.isdigit():
+            return queryset.filter(cita_id=int(termino)), False
+        rut = _rut_buscado(termino)
+        if rut:
+            return queryset.filter(cita__paciente__rut=rut), False
+        return queryset.none(), False
+
+
 # =========================
 #  ROLES / USUARIOS
 # =========================
@@ -25,6 +154,8 @@ class UserRoleAdmin(admin.ModelAdmin):
     list_filter = ("rol",)
     search_fields = ("usuario__username", "rol__nombre")
     list_editable = ("rol",)
+    list_select_related = ("usuario", "rol")
+    autocomplete_fields = ("usuario",)
 
 
 # =========================
@@ -45,6 +176,7 @@ class ProfesionalAdmin(admin.ModelAdmin):
     list_filter = ("activo", "especialidad")
     search_fields = ("nombre", "apellido", "email", "telefono")
     list_editable = ("nombre", "apellido","especialidad", "email", "telefono", "activo")
+    list_select_related = ("especialidad",)
 
 
 # =========================
@@ -53,9 +185,9 @@ class ProfesionalAdmin(admin.ModelAdmin):
 
 @admin.register(Ubicacion)
 class UbicacionAdmin(admin.ModelAdmin):
-    list_display = ("id", "nombre")
+    list_display = ("id", "nombre", "capacidad")
     search_fields = ("nombre",)
-    list_editable = ("nombre",)
+    list_editable = ("nombre", "capacidad")
 
 # =========================
 #  ESTADOS DE CITA
@@ -75,11 +207,13 @@ class EstadoCitaAdmin(admin.ModelAdmin):
 # =========================
 
 @admin.register(Agenda)
-class AgendaAdmin(admin.ModelAdmin):
-    list_display = ("id", "profesional", "ubicacion", "inicio", "fin", "modalidad")
-    list_filter = ("profesional", "ubicacion", "modalidad")
-    search_fields = ("profesional__nombre", "profesional__apellido", "ubicacion__nombre")
-    date_hierarchy = "inicio"
+class AgendaAdmin(AdminEscalable):
+    list_display = ("id", "profesional", "ubicacion", "inicio", "fin", "modalidad", "sobrecupo_max")
+    # profesional/ubicación son catálogos chicos: el filtro lista esas tablas, no las agendas
+    list_filter = (FiltroRangoAgenda, "modalidad", "ubicacion", FiltroProfesional)
+    list_select_related = ("profesional__especialidad", "ubicacion")
+    search_fields = ("^profesional__apellido", "^profesional__nombre")
+    autocomplete_fields = ("profesional",)
 
 
 # =========================
@@ -87,11 +221,18 @@ class AgendaAdmin(admin.ModelAdmin):
 # =========================
 
 @admin.register(Paciente)
-class PacienteAdmin(admin.ModelAdmin):
+class PacienteAdmin(AdminEscalable):
     list_display = ("id", "rut", "nombres", "apellidos", "email", "telefono", "is_active")
-    search_fields = ("rut", "nombres", "apellidos", "email", "telefono")
-    list_filter = ("nombres","apellidos", "is_active")
-    list_editable = ("rut", "nombres", "apellidos", "email", "telefono", "is_active")
+    # Prefijos sobre los índices UPPER(...) text_pattern_ops de Paciente
+    search_fields = ("^apellidos", "^nombres", "^email")
+    search_help_text = "RUT exacto, o inicio de apellidos, nombres o email."
+    list_filter = ("is_active", "debe_cambiar_password")
+
+    def get_search_results(self, request, queryset, search_term):
+        rut = _rut_buscado(search_term.strip())
+        if rut:
+            return queryset.filter(rut=rut), False
+        return super().get_search_results(request, queryset, search_term)
 
 
 # =========================
@@ -99,11 +240,13 @@ class PacienteAdmin(admin.ModelAdmin):
 # =========================
 
 @admin.register(AuditoriaCita)
-class AuditoriaCitaAdmin(admin.ModelAdmin):
-    list_display = ("id", "cita", "usuario", "accion", "creado_en")
-    list_filter = ("accion", "usuario")
-    search_fields = ("cita__paciente__nombre", "cita__paciente__apellido", "accion")
-    date_hierarchy = "creado_en"
+class AuditoriaCitaAdmin(BusquedaPorCitaMixin, AdminEscalable):
+    list_display = ("id", "cita_id", "usuario", "accion", "creado_en")
+    list_filter = ("accion", ("creado_en", admin.DateFieldListFilter), "usuario")
+    list_select_related = ("usuario",)
+    search_fields = ("=cita__id", "=cita__paciente__rut")
+    raw_id_fields = ("cita",)
+    autocomplete_fields = ("usuario",)
 
 
 # =========================
@@ -111,11 +254,84 @@ class AuditoriaCitaAdmin(admin.ModelAdmin):
 # =========================
 
 @admin.register(ContactoCita)
-class ContactoCitaAdmin(admin.ModelAdmin):
+class ContactoCitaAdmin(BusquedaPorCitaMixin, AdminEscalable):
     list_display = ("id", "cita", "usuario", "canal", "resultado", "fecha_contacto")
-    list_filter = ("canal", "resultado", "usuario")
-    search_fields = ("cita__paciente__nombre", "cita__paciente__apellido", "descripcion")
-    date_hierarchy = "fecha_contacto"
+    list_filter = ("canal", "resultado", ("fecha_contacto", admin.DateFieldListFilter), "usuario")
+    # str(cita) usa paciente y agenda.profesional
+    list_select_related = ("cita__paciente", "cita__agenda__profesional__especialidad", "usuario")
+    search_fields = ("=cita__id", "=cita__paciente__rut")
+    raw_id_fields = ("cita",)
+    autocomplete_fields = ("usuario",)
+
+# =========================
+#  LISTA DE ESPERA
+# =========================
+
+@admin.register(ListaEspera)
+class ListaEsperaAdmin(AdminEscalable):
+    list_display = ("id", "paciente", "especialidad", "profesional", "prioridad", "estado", "creado_en", "cita")
+    list_filter = ("estado", "especialidad")
+    list_select_related = ("paciente", "especialidad", "profesional__especialidad")
+    raw_id_fields = ("paciente", "cita")
+    autocomplete_fields = ("profesional",)
+    readonly_fields = ("cita", "asignada_en", "creado_por")
+    search_fields = ("=paciente__rut",)
+    search_help_text = "RUT del paciente."
+
+    def get_search_results(self, request, queryset, search_term):
+        rut = _rut_buscado(search_term.strip())
+        if rut:
+            return queryset.filter(paciente__rut=rut), False
+        return (queryset.none() if search_term.strip() else queryset), False
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.creado_por = request.user
+        super().save_model(request, obj, form, change)
+
+
+# =========================
+#  EXCEPCIONES DE AGENDA
+# =========================
+
+@admin.register(ExcepcionAgenda)
+class ExcepcionAgendaAdmin(admin.ModelAdmin):
+    list_display = ("id", "tipo", "inicio", "fin", "profesional", "ubicacion", "motivo")
+    list_filter = ("tipo", "ubicacion")
+    list_select_related = ("profesional__especialidad", "ubicacion")
+    autocomplete_fields = ("profesional",)
+    readonly_fields = ("creado_por", "creado_en")
+    date_hierarchy = "inicio"
+    ordering = ("-inicio",)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.creado_por = request.user
+        super().save_model(request, obj, form, change)
+
+
+# =========================
+#  RIESGO DE AUSENCIA
+# =========================
+
+@admin.register(ModeloRiesgo)
+class ModeloRiesgoAdmin(admin.ModelAdmin):
+    list_display = ("id", "creado_en", "muestras", "auc", "tasa_ausencia")
+    readonly_fields = ("parametros", "metricas", "muestras", "creado_en")
+
+    @admin.display(description="AUC validación")
+    def auc(self, obj):
+        valor = obj.metricas.get("auc")
+        return f"{valor:.3f}" if valor else "—"
+
+    @admin.display(description="Tasa de ausencia")
+    def tasa_ausencia(self, obj):
+        valor = obj.metricas.get("tasa_ausencia")
+        return f"{valor:.1%}" if valor is not None else "—"
+
+    def has_add_permission(self, request):
+        return False          # se crean con `entrenar_riesgo_ausencia`
+
 
 class CustomAdminSite(admin.AdminSite):
     class Media:
@@ -1,7 +1,13 @@
+from bisect import bisect_right
 from datetime import datetime, timedelta, time
+from functools import reduce
+from operator import or_
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.db import transaction
-from core.models import Agenda, PlantillaAtencion, Profesional
+from django.db.models import Q
+from core import salas
+from core.models import Agenda, ExcepcionAgenda, PlantillaAtencion, Profesional
 
 
 def _daterange_days(start_date, end_date):
@@ -52,12 +58,72 @@ def _overlaps(a_start, a_end, b_start, b_end) -> bool:
     """Devuelve True si [a_start, a_end) se solapa con [b_start, b_end)."""
     return a_start < b_end and a_end > b_start
 
+
+# =========================
+#  INTERVALOS BLOQUEADOS (agendas existentes + excepciones)
+# =========================
+
+def _fusionar(intervalos):
+    """Ordena y une los intervalos [ini, fin) que se solapan o se tocan."""
+    fusion = []
+    for ini, fin in sorted(intervalos):
+        if fusion and ini <= fusion[-1][1]:
+            if fin > fusion[-1][1]:
+                fusion[-1][1] = fin
+        else:
+            fusion.append([ini, fin])
+    return fusion
+
+
+class Bloqueos:
+    """Intervalos ya fusionados (disjuntos y ordenados): choca() es una búsqueda binaria."""
+    __slots__ = ("inicios", "fines")
+
+    def __init__(self, intervalos=()):
+        fusion = _fusionar(intervalos)
+        self.inicios = [ini for ini, _ in fusion]
+        self.fines = [fin for _, fin in fusion]
+
+    def choca(self, inicio, termino) -> bool:
+        # Solo pueden solaparse el último intervalo que empieza antes del slot y el siguiente
+        i = bisect_right(self.inicios, inicio) - 1
+        if i >= 0 and self.fines[i] > inicio:
+            return True
+        return i + 1 < len(self.inicios) and self.inicios[i + 1] < termino
+
+
+def excepciones_para(prof: Profesional, desde, hasta):
+    """
+    Excepciones que afectan al profesional en [desde, hasta), ya fusionadas:
+    (Bloqueos generales, {ubicacion_id: Bloqueos}) — los cierres de una ubicación solo
+    bloquean los slots de esa ubicación (y se suman a los generales).
+    """
+    filas = (ExcepcionAgenda.objects
+             .filter(inicio__lt=hasta, fin__gt=desde)
+             .filter(Q(profesional=prof) | Q(profesional__isnull=True))
+             .values_list("ubicacion_id", "inicio", "fin"))
+    generales, por_ubicacion = [], {}
+    for ubicacion_id, ini, fin in filas:
+        if ubicacion_id is None:
+            generales.append((ini, fin))
+        else:
+            por_ubicacion.setdefault(ubicacion_id, []).append((ini, fin))
+    return Bloqueos(generales), {
+        u: Bloqueos(generales + intervalos) for u, intervalos in por_ubicacion.items()
+    }
+
+
 @transaction.atomic
-def generar_agendas_para_profesional(prof: Profesional, weeks_ahead: int = 8, tz=None):
+def generar_agendas_para_profesional(prof: Profesional, weeks_ahead: int = 8, tz=None, plantillas=None):
     """
     Genera slots desde HOY hasta 'weeks_ahead', sin crear:
     - slots que ya terminaron (pasado),
-    - slots que se solapen con agendas existentes (normalmente serán las que tienen cita).
+    - slots que se solapen con agendas existentes (normalmente serán las que tienen cita),
+    - slots dentro de una excepción (feriado, licencia del profesional, cierre de la ubicación),
+    - slots presenciales en una sala que ya está a su capacidad con otros profesionales.
+    Agendas, excepciones y ocupación de salas se cargan una vez como índices de intervalos;
+    cada slot se revisa con búsquedas binarias en la misma pasada.
+    Con `plantillas` se generan solo esas (p.ej. las que agregó una edición del horario).
     """
     if tz is None:
         tz = timezone.get_current_timezone()
@@ -66,47 +132,54 @@ def generar_agendas_para_profesional(prof: Profesional, weeks_ahead: int = 8, tz
     fin = hoy + timedelta(weeks=weeks_ahead)
     now = timezone.now()
 
-    plantillas = (PlantillaAtencion.objects
-                  .filter(profesional=prof, activo=True)
-                  .select_related("ubicacion"))
-    if not plantillas.exists():
-        return {"created": 0, "skipped_past": 0, "skipped_overlap": 0}
+    if plantillas is None:
+        plantillas = list(PlantillaAtencion.objects
+                          .filter(profesional=prof, activo=True)
+                          .select_related("ubicacion"))
+    if not plantillas:
+        return {"created": 0, "skipped_past": 0, "skipped_overlap": 0, "skipped_exception": 0, "skipped_room": 0}
 
-    # Cargamos las agendas existentes futuras (tras haber eliminado las libres, suelen quedar las con cita)
-    existentes = (Agenda.objects
-                  .filter(profesional=prof, inicio__gte=_inicio_de_hoy(tz))
-                  .select_related("ubicacion"))  # pueden incluir libres si no se eliminaron por alguna razón
+    desde_dt, hasta_dt = _inicio_de_hoy(tz), _combine(fin, time.min, tz)
 
-    # Agrupar por día para chequeo de solapamiento eficiente
-    existentes_por_dia = {}
-    for a in existentes:
-        d = a.inicio.date()
-        existentes_por_dia.setdefault(d, []).append((a.inicio, a.fin))
+    # Agendas existentes futuras (tras haber eliminado las libres, suelen quedar las con cita)
+    ocupados = Bloqueos(Agenda.objects
+                        .filter(profesional=prof, inicio__gte=desde_dt)
+                        .values_list("inicio", "fin"))
+    excluidos, excluidos_por_ubicacion = excepciones_para(prof, desde_dt, hasta_dt)
+    # Bloques presenciales de los demás profesionales, por sala
+    ocupacion_salas = salas.indice_salas(desde_dt, hasta_dt, excluir_profesional_id=prof.pk)
 
     to_create = []
     skipped_past = 0
     skipped_overlap = 0
+    skipped_exception = 0
+    skipped_room = 0
 
     for day in _daterange_days(hoy, fin):
         wd = day.weekday()
-        dia_agendas = existentes_por_dia.get(day, [])
         for p in plantillas:
             if p.dia_semana != wd:
                 continue
+            bloqueos = excluidos_por_ubicacion.get(p.ubicacion_id, excluidos)
+            sala = (ocupacion_salas.get(p.ubicacion_id)
+                    if p.modalidad == Agenda.Modalidad.PRESENCIAL else None)
             for inicio, termino in _slots_for_day(day, p, tz):
                 # 1) No crear slots en el pasado (ya terminados)
                 if termino <= now:
                     skipped_past += 1
                     continue
-                # 2) Evitar solapamiento con agendas existentes (reservadas u otras supervivientes)
-                choque = False
-                for (ei, ef) in dia_agendas:
-                    if _overlaps(inicio, termino, ei, ef):
-                        choque = True
-                        break
-                if choque:
+                # 2) Feriados, licencias y cierres
+                if bloqueos.choca(inicio, termino):
+                    skipped_exception += 1
+                    continue
+                # 3) Evitar solapamiento con agendas existentes (reservadas u otras supervivientes)
+                if ocupados.choca(inicio, termino):
                     skipped_overlap += 1
                     continue
+                # 4) Sala llena con otros profesionales a esa hora
+                if sala is not None and not sala.libre(inicio, termino):
+                    skipped_room += 1
+                    continue
                 to_create.append(Agenda(
                     profesional=prof,
                     ubicacion=p.ubicacion,
@@ -116,44 +189,238 @@ def generar_agendas_para_profesional(prof: Profesional, weeks_ahead: int = 8, tz
                 ))
 
     created = Agenda.objects.bulk_create(to_create, ignore_conflicts=True)
-    return {"created": len(created), "skipped_past": skipped_past, "skipped_overlap": skipped_overlap}
+    return {
+        "created": len(created),
+        "skipped_past": skipped_past,
+        "skipped_overlap": skipped_overlap,
+        "skipped_exception": skipped_exception,
+        "skipped_room": skipped_room,
+    }
+
+
+# =========================
+#  EXCEPCIONES: EFECTO INCREMENTAL SOBRE LAS AGENDAS
+# =========================
+
+def _agendas_afectadas(exc: ExcepcionAgenda):
+    qs = Agenda.objects.filter(inicio__lt=exc.fin, fin__gt=max(exc.inicio, timezone.now()))
+    if exc.profesional_id:
+        qs = qs.filter(profesional_id=exc.profesional_id)
+    if exc.ubicacion_id:
+        qs = qs.filter(ubicacion_id=exc.ubicacion_id)
+    return qs
+
+
+def aplicar_excepcion(exc: ExcepcionAgenda) -> dict:
+    """
+    Borra solo los slots LIBRES futuros que caen dentro de la excepción (un DELETE por
+    rango indexado). Los que ya tienen cita se cuentan: recepción debe reagendarlos.
+    """
+    afectadas = _agendas_afectadas(exc)
+    eliminados, _ = afectadas.filter(cita__isnull=True).delete()
+    return {"deleted_free": eliminados, "con_cita": afectadas.filter(cita__isnull=False).distinct().count()}
+
+
+def _profesionales_afectados(exc: ExcepcionAgenda):
+    qs = Profesional.objects.filter(activo=True, plantillas__activo=True)
+    if exc.profesional_id:
+        qs = qs.filter(pk=exc.profesional_id)
+    if exc.ubicacion_id:
+        qs = qs.filter(plantillas__ubicacion_id=exc.ubicacion_id)
+    return qs.distinct()
+
+
+def regenerar_afectados(exc: ExcepcionAgenda, weeks_ahead: int = 8) -> int:
+    """Tras acortar o borrar una excepción, vuelve a generar lo que quedó libre."""
+    total = 0
+    for prof in _profesionales_afectados(exc):
+        total += generar_agendas_para_profesional(prof, weeks_ahead=weeks_ahead)["created"]
+    return total
+
+
+# --- disparadores (conectados en core/signals.py) ---
+def al_guardar_excepcion(sender, instance, created, **kwargs):
+    aplicar_excepcion(instance)
+    if not created:
+        # El rango pudo achicarse: lo que ya no está cubierto se rellena tras el commit
+        transaction.on_commit(lambda: regenerar_afectados(instance), robust=True)
+
+
+def al_borrar_excepcion(sender, instance, **kwargs):
+    transaction.on_commit(lambda: regenerar_afectados(instance), robust=True)
+
+# =========================
+#  EDITOR DE HORARIO (conjunto completo de tramos, cambios incrementales)
+# =========================
+# Un tramo = dia_semana + hora_inicio/hora_fin + duracion_minutos + modalidad + ubicacion
+# (la misma clave que uk_plantilla_clave). guardar_horario recibe el horario completo:
+#   - los tramos que ya existían no se tocan (ni sus slots),
+#   - los que desaparecen se borran y, con ellos, solo SUS slots libres futuros,
+#   - los nuevos se crean y se generan solo sus slots.
+
+_DIAS = dict(PlantillaAtencion.DiaSemana.choices)
+
+
+def _clave(t) -> tuple:
+    ubicacion_id = t["ubicacion"].pk if "ubicacion" in t else t["ubicacion_id"]
+    return (t["dia_semana"], t["hora_inicio"], t["hora_fin"], t["duracion_minutos"], t["modalidad"], ubicacion_id)
+
+
+def _clave_plantilla(p: PlantillaAtencion) -> tuple:
+    return (p.dia_semana, p.hora_inicio, p.hora_fin, p.duracion_minutos, p.modalidad, p.ubicacion_id)
+
+
+def validar_tramos(tramos) -> None:
+    """
+    Una pasada sobre los tramos ordenados por (día, inicio): cada uno se compara con el
+    que termina más tarde entre los anteriores del mismo día. ValidationError con todos
+    los cruces encontrados.
+    """
+    errores = []
+    ultimo = {}
+    for t in sorted(tramos, key=lambda t: (t["dia_semana"], t["hora_inicio"], t["hora_fin"])):
+        dia = t["dia_semana"]
+        previo = ultimo.get(dia)
+        if previo and t["hora_inicio"] < previo["hora_fin"]:
+            errores.append(
+                f"{_DIAS[dia]}: {previo['hora_inicio']:%H:%M}–{previo['hora_fin']:%H:%M} "
+                f"se cruza con {t['hora_inicio']:%H:%M}–{t['hora_fin']:%H:%M}."
+            )
+        if previo is None or t["hora_fin"] > previo["hora_fin"]:
+            ultimo[dia] = t
+    if errores:
+        raise ValidationError(errores)
+
+
+def _slots_de(plantillas) -> Q:
+    """Los slots que generó cada plantilla: su día (local), ventana, sala y modalidad."""
+    return reduce(or_, (
+        Q(inicio__iso_week_day=p.dia_semana + 1,
+          inicio__time__gte=p.hora_inicio, fin__time__lte=p.hora_fin,
+          ubicacion_id=p.ubicacion_id, modalidad=p.modalidad)
+        for p in plantillas
+    ))
+
+
+def _en_grilla(inicio, fin, ubicacion_id, modalidad, p) -> bool:
+    """¿El slot (horas locales) es uno de los que generaría la plantilla p?"""
+    if (p.ubicacion_id, p.modalidad, p.dia_semana) != (ubicacion_id, modalidad, inicio.weekday()):
+        return False
+    dur = timedelta(minutes=p.duracion_minutos)
+    desde = datetime.combine(inicio.date(), p.hora_inicio, inicio.tzinfo)
+    hasta = datetime.combine(inicio.date(), p.hora_fin, inicio.tzinfo)
+    return fin - inicio == dur and desde <= inicio and fin <= hasta and (inicio - desde) % dur == timedelta(0)
+
+
+def _se_cruzan(a, b) -> bool:
+    return a.dia_semana == b.dia_semana and _overlaps(a.hora_inicio, a.hora_fin, b.hora_inicio, b.hora_fin)
+
 
 @transaction.atomic
-def actualizar_disponibilidad_y_regenerar(
-    prof: Profesional, *, dias, hora_inicio, hora_fin,
-    duracion, modalidad, ubicacion, weeks_ahead=8,
-):
+def guardar_horario(prof: Profesional, tramos, weeks_ahead: int = 8) -> dict:
     """
-    - Reemplaza completamente las plantillas del profesional.
-    - Elimina HOY-> futuro (solo libres).
-    - Regenera evitando choques y slots en pasado.
-    Devuelve métricas.
+    Reemplaza el horario semanal del profesional por `tramos` (dicts con las claves de
+    TramoHorarioForm) aplicando solo la diferencia. Devuelve métricas.
     """
-    # 1) Reemplazo REAL de plantillas (borra todo lo del profesional)
-    PlantillaAtencion.objects.filter(profesional=prof).delete()
+    validar_tramos(tramos)
+    # Serializa ediciones simultáneas del mismo profesional
+    Profesional.objects.select_for_update().only("pk").get(pk=prof.pk)
 
+    existentes = {_clave_plantilla(p): p for p in
+                  PlantillaAtencion.objects.filter(profesional=prof).select_related("ubicacion")}
+    pedidas = {_clave(t): t for t in tramos}
+
+    quitadas = [p for k, p in existentes.items() if k not in pedidas]
+    reactivadas = [p for k, p in existentes.items() if k in pedidas and not p.activo]
     nuevas = [
-        PlantillaAtencion(
-            profesional=prof,
-            dia_semana=d,
-            hora_inicio=hora_inicio,
-            hora_fin=hora_fin,
-            duracion_minutos=duracion,
-            modalidad=modalidad,
-            ubicacion=ubicacion,
-            activo=True,
-        )
-        for d in dias
+        PlantillaAtencion(profesional=prof, activo=True, **{
+            campo: t[campo] for campo in
+            ("dia_semana", "hora_inicio", "hora_fin", "duracion_minutos", "modalidad", "ubicacion")
+        })
+        for k, t in pedidas.items() if k not in existentes
     ]
-    # Sin ignore_conflicts: como acabamos de borrar, no habrá colisiones
+    entrantes = nuevas + reactivadas
+
+    # 1) Slots libres futuros de las plantillas quitadas. Los que calzan con la grilla de
+    #    una plantilla entrante (p.ej. solo se acortó la ventana) se conservan.
+    eliminados = conservados = 0
+    activas_quitadas = [p for p in quitadas if p.activo]
+    if activas_quitadas:
+        candidatos = (Agenda.objects
+                      .filter(profesional=prof, inicio__gte=timezone.now(), cita__isnull=True)
+                      .filter(_slots_de(activas_quitadas))
+                      .values_list("pk", "inicio", "fin", "ubicacion_id", "modalidad"))
+        borrar = []
+        for pk, ini, fin, ubicacion_id, modalidad in candidatos:
+            ini, fin = timezone.localtime(ini), timezone.localtime(fin)
+            if any(_en_grilla(ini, fin, ubicacion_id, modalidad, p) for p in entrantes):
+                conservados += 1
+            else:
+                borrar.append(pk)
+        if borrar:
+            eliminados, _ = Agenda.objects.filter(pk__in=borrar).delete()
+
+    if quitadas:
+        PlantillaAtencion.objects.filter(pk__in=[p.pk for p in quitadas]).delete()
+    if reactivadas:
+        PlantillaAtencion.objects.filter(pk__in=[p.pk for p in reactivadas]).update(activo=True)
     PlantillaAtencion.objects.bulk_create(nuevas)
 
-    # 2) Borrar HOY completo en adelante (solo libres)
-    eliminados = eliminar_bloques_futuros_libres(prof, cubrir_hoy_completo=True)
+    # 2) Generar solo lo entrante (y lo que compartía ventana con una plantilla quitada);
+    #    el generador omite los slots que ya existen.
+    a_generar = entrantes + [
+        p for k, p in existentes.items()
+        if k in pedidas and p.activo and any(_se_cruzan(p, q) for q in activas_quitadas)
+    ]
+    metrics = {"created": 0, "skipped_past": 0, "skipped_overlap": 0, "skipped_exception": 0, "skipped_room": 0}
+    if a_generar:
+        metrics = generar_agendas_para_profesional(
+            prof, weeks_ahead=weeks_ahead, tz=timezone.get_current_timezone(), plantillas=a_generar
+        )
+    metrics.update({
+        "deleted_free": eliminados,
+        "kept_free": conservados,
+        "plantillas_nuevas": len(entrantes),
+        "plantillas_quitadas": len(quitadas),
+        "plantillas_sin_cambios": len(pedidas) - len(entrantes),
+    })
+    return metrics
+
+
+def horario_actual(prof: Profesional) -> list[dict]:
+    """Tramos activos del profesional en el formato que recibe guardar_horario."""
+    return [
+        {
+            "dia_semana": p.dia_semana,
+            "hora_inicio": p.hora_inicio,
+            "hora_fin": p.hora_fin,
+            "duracion_minutos": p.duracion_minutos,
+            "modalidad": p.modalidad,
+            "ubicacion_id": p.ubicacion_id,
+        }
+        for p in PlantillaAtencion.objects
+        .filter(profesional=prof, activo=True)
+        .order_by("dia_semana", "hora_inicio")
+    ]
+
 
-    # 3) Regenerar evitando choques (ya tienes esta lógica)
-    metrics = generar_agendas_para_profesional(
-        prof, weeks_ahead=weeks_ahead, tz=timezone.get_current_timezone()
-    )
-    metrics["deleted_free"] = eliminados
-    return metrics
\ No newline at end of file
+def actualizar_disponibilidad_y_regenerar(
+    prof: Profesional, *, dias, hora_inicio, hora_fin,
+    duracion, modalidad, ubicacion, weeks_ahead=8,
+):
+    """
+    Formulario simple (un rango de días con una ventana): arma los tramos y delega en
+    guardar_horario, que solo toca lo que cambió. Devuelve métricas.
+    """
+    tramos = [
+        {
+            "dia_semana": d,
+            "hora_inicio": hora_inicio,
+            "hora_fin": hora_fin,
+            "duracion_minutos": duracion,
+            "modalidad": modalidad,
+            "ubicacion": ubicacion,
+        }
+        for d in dias
+    ]
+    return guardar_horario(prof, tramos, weeks_ahead=weeks_ahead)
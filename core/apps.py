@@ -5,3 +5,7 @@ class coreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'Módulos'
+
+    def ready(self):
+        from . import signals
+        signals.conectar()
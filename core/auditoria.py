@@ -0,0 +1,445 @@
+import gzip
+import json
+import os
+import shutil
+import sys
+import threading
+from contextlib import ContextDecorator
+from datetime import date, datetime, time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import AuditoriaCita
+
+# =========================
+#  REGISTRO EN LOTE (un solo INSERT por transacción)
+# =========================
+
+_estado = threading.local()
+
+
+def _pila():
+    if not hasattr(_estado, "pila"):
+        _estado.pila = []
+    return _estado.pila
+
+
+class RegistroAuditoria(ContextDecorator):
+    """
+    Abre una transacción (o un savepoint si ya hay una) y acumula los eventos que se
+    registren con registrar_auditoria(). Al cerrar el bloque más externo los inserta con
+    un único bulk_create, todavía dentro de la transacción (la auditoría se confirma o se
+    revierte junto con los cambios que describe).
+    Si un bloque anidado termina con excepción se descartan solo sus eventos, igual que
+    su savepoint.
+    """
+
+    def __init__(self, using=None):
+        self.using = using
+
+    def __enter__(self):
+        atomic = transaction.atomic(using=self.using)
+        atomic.__enter__()
+        pila = _pila()
+        buffer = pila[-1][1] if pila else []
+        # El estado vive en la pila del hilo: la misma instancia puede decorar una función
+        # que se llama de forma recursiva o desde varios hilos.
+        pila.append((atomic, buffer, len(buffer)))
+
+    def __exit__(self, exc_type, exc_value, tb):
+        pila = _pila()
+        atomic, buffer, marca = pila.pop()
+        if exc_type is not None:
+            del buffer[marca:]
+        elif not pila and buffer:
+            try:
+                AuditoriaCita.objects.using(self.using).bulk_create(buffer)
+            except Exception:
+                atomic.__exit__(*sys.exc_info())
+                raise
+            finally:
+                buffer.clear()
+        return atomic.__exit__(exc_type, exc_value, tb)
+
+
+def registro_auditoria(using=None):
+    """Uso: `@registro_auditoria`, `@registro_auditoria()` o `with registro_auditoria():`."""
+    if callable(using):
+        return RegistroAuditoria()(using)
+    return RegistroAuditoria(using)
+
+
+def registrar_auditoria(cita, accion, detalle=None, usuario=None):
+    """
+    Registra un evento de auditoría. Dentro de un bloque registro_auditoria() queda en
+    el buffer hasta el cierre del bloque; fuera de él se inserta de inmediato.
+    Acepta la cita o su id (la cita puede haber sido eliminada en la misma transacción).
+    """
+    evento = AuditoriaCita(
+        cita_id=getattr(cita, "pk", cita),
+        usuario_id=getattr(usuario, "pk", None),
+        accion=accion,
+        detalle=detalle,
+    )
+    pila = _pila()
+    if pila:
+        pila[-1][1].append(evento)
+    else:
+        evento.save(force_insert=True)
+    return evento
+
+
+# =========================
+#  PARTICIONES MENSUALES (PostgreSQL)
+# =========================
+
+TABLA = AuditoriaCita._meta.db_table
+PREFIJO_PARTICION = f"{TABLA}_y"          # auditoria_citas_y2025m10
+PARTICION_DEFAULT = f"{TABLA}_default"
+COLUMNAS = ("id", "cita_id", "usuario_id", "accion", "detalle", "creado_en")
+
+
+def _es_postgres(conn=None) -> bool:
+    return (conn or connection).vendor == "postgresql"
+
+
+def _inicio_mes(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _sumar_meses(d: date, meses: int) -> date:
+    total = d.year * 12 + (d.month - 1) + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _nombre_particion(mes: date) -> str:
+    return f"{PREFIJO_PARTICION}{mes.year}m{mes.month:02d}"
+
+
+def _mes_de_particion(nombre: str):
+    """Devuelve el primer día del mes a partir del nombre de la partición (o None)."""
+    if not nombre.startswith(PREFIJO_PARTICION):
+        return None
+    try:
+        anio, mes = nombre[len(PREFIJO_PARTICION):].split("m")
+        return date(int(anio), int(mes), 1)
+    except ValueError:
+        return None
+
+
+def _limite(d: date) -> str:
+    """Límite de rango de la partición en la zona horaria del proyecto."""
+    tz = timezone.get_current_timezone()
+    return timezone.make_aware(datetime.combine(d, time.min), tz).isoformat()
+
+
+def tabla_particionada(conn=None) -> bool:
+    conn = conn or connection
+    if not _es_postgres(conn):
+        return False
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT c.relkind FROM pg_class c "
+            "WHERE c.oid = to_regclass(%s)",
+            [TABLA],
+        )
+        row = cur.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def listar_particiones(conn=None):
+    """Lista [(mes, nombre)] de las particiones mensuales existentes, ordenadas por mes."""
+    conn = conn or connection
+    if not tabla_particionada(conn):
+        return []
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [TABLA],
+        )
+        nombres = [r[0] for r in cur.fetchall()]
+    meses = [(_mes_de_particion(n), n) for n in nombres]
+    return sorted((m, n) for m, n in meses if m is not None)
+
+
+def meses_en_default(conn=None) -> list[date]:
+    """Meses con filas en la partición DEFAULT (p.ej. el cron corrió tarde), en hora local."""
+    conn = conn or connection
+    if not tabla_particionada(conn):
+        return []
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s)", [PARTICION_DEFAULT])
+        if cur.fetchone()[0] is None:
+            return []
+        cur.execute(
+            f"SELECT DISTINCT date_trunc('month', creado_en AT TIME ZONE %s)::date "
+            f'FROM "{PARTICION_DEFAULT}" ORDER BY 1',
+            [timezone.get_current_timezone_name()],
+        )
+        return [r[0] for r in cur.fetchall()]
+
+
+def crear_particion(mes: date, conn=None) -> bool:
+    """
+    Crea la partición del mes indicado si no existe. Devuelve True si la creó.
+    PostgreSQL no deja crear una partición si la DEFAULT ya tiene filas de ese rango: en ese
+    caso se crea como tabla suelta, se le mueven esas filas y se adjunta (una transacción).
+    """
+    conn = conn or connection
+    mes = _inicio_mes(mes)
+    nombre = _nombre_particion(mes)
+    limites = [_limite(mes), _limite(_sumar_meses(mes, 1))]
+    with transaction.atomic(using=conn.alias), conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s), to_regclass(%s)", [nombre, PARTICION_DEFAULT])
+        existe, hay_default = cur.fetchone()
+        if existe is not None:
+            return False
+        atrapadas = False
+        if hay_default is not None:
+            cur.execute(
+                f'SELECT EXISTS (SELECT 1 FROM "{PARTICION_DEFAULT}" '
+                f"WHERE creado_en >= %s AND creado_en < %s)",
+                limites,
+            )
+            atrapadas = cur.fetchone()[0]
+        if not atrapadas:
+            cur.execute(
+                f'CREATE TABLE "{nombre}" PARTITION OF "{TABLA}" '
+                f"FOR VALUES FROM (%s) TO (%s)",
+                limites,
+            )
+            return True
+
+        cur.execute(f'CREATE TABLE "{nombre}" (LIKE "{TABLA}" INCLUDING DEFAULTS INCLUDING STORAGE)')
+        cur.execute(
+            f'WITH movidas AS (DELETE FROM "{PARTICION_DEFAULT}" '
+            f"WHERE creado_en >= %s AND creado_en < %s RETURNING *) "
+            f'INSERT INTO "{nombre}" SELECT * FROM movidas',
+            limites,
+        )
+        cur.execute(
+            f'ALTER TABLE "{TABLA}" ATTACH PARTITION "{nombre}" FOR VALUES FROM (%s) TO (%s)',
+            limites,
+        )
+    return True
+
+
+def asegurar_particiones(meses_adelante: int = 3, desde: date | None = None, conn=None):
+    """
+    Crea las particiones desde 'desde' (por defecto: mes actual) hasta 'meses_adelante',
+    más las de los meses que quedaron en la partición DEFAULT (sus filas pasan a la nueva
+    partición y así se archivan como las demás).
+    Pensado para ejecutarse periódicamente (cron) vía `manage.py archivar_auditoria`.
+    """
+    conn = conn or connection
+    if not tabla_particionada(conn):
+        return []
+    mes = _inicio_mes(desde or timezone.localdate())
+    meses = sorted({_sumar_meses(mes, i) for i in range(meses_adelante + 1)} | set(meses_en_default(conn)))
+    creadas = []
+    with transaction.atomic(using=conn.alias):
+        for m in meses:
+            if crear_particion(m, conn=conn):
+                creadas.append(_nombre_particion(m))
+    return creadas
+
+
+# =========================
+#  ARCHIVO (JSONL comprimido)
+# =========================
+
+def directorio_archivo() -> Path:
+    return Path(getattr(settings, "AUDITORIA_ARCHIVO_DIR", settings.BASE_DIR / "archivo" / "auditoria"))
+
+
+def _ruta_archivo(mes: date) -> Path:
+    return directorio_archivo() / f"{TABLA}_{mes.year}_{mes.month:02d}.jsonl.gz"
+
+
+def _mes_de_archivo(path: Path):
+    base = path.name[len(TABLA) + 1:].split(".")[0]
+    try:
+        anio, mes = base.split("_")
+        return date(int(anio), int(mes), 1)
+    except ValueError:
+        return None
+
+
+def _fila_a_dict(fila) -> dict:
+    d = dict(zip(COLUMNAS, fila))
+    if isinstance(d["detalle"], str):
+        d["detalle"] = json.loads(d["detalle"])
+    return d
+
+
+def _volcar(filas, destino: Path) -> int:
+    """Escribe las filas en destino (gzip JSONL) de forma atómica. Devuelve la cantidad."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_name(destino.name + ".tmp")
+    n = 0
+    # Si ya existe un archivo del mes (p.ej. un archivado parcial previo), se agrega
+    # como un nuevo miembro gzip (los lectores gzip concatenan miembros)
+    if destino.exists():
+        shutil.copyfile(destino, tmp)
+    with gzip.open(tmp, "at", encoding="utf-8") as fh:
+        for fila in filas:
+            fh.write(json.dumps(_fila_a_dict(fila), cls=DjangoJSONEncoder, ensure_ascii=False))
+            fh.write("\n")
+            n += 1
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, destino)
+    return n
+
+
+def _iterar(conn, sql, params=(), lote=2000):
+    # chunked_cursor: cursor de servidor si está habilitado (no carga la partición entera en memoria)
+    with conn.chunked_cursor() as cur:
+        cur.execute(sql, params)
+        while True:
+            filas = cur.fetchmany(lote)
+            if not filas:
+                break
+            yield from filas
+
+
+def archivar_mes(mes: date, conn=None) -> int:
+    """
+    Mueve a disco las filas de auditoría del mes indicado y las elimina de la BD.
+    En PostgreSQL particionado: vuelca la partición, la separa (DETACH) y la elimina.
+    En otros motores: vuelca y borra por rango de fechas.
+    """
+    conn = conn or connection
+    mes = _inicio_mes(mes)
+    destino = _ruta_archivo(mes)
+    cols = ", ".join(COLUMNAS)
+
+    with transaction.atomic(using=conn.alias), conn.cursor() as cur:
+        if tabla_particionada(conn):
+            nombre = _nombre_particion(mes)
+            cur.execute("SELECT to_regclass(%s)", [nombre])
+            if cur.fetchone()[0] is None:
+                return 0
+            n = _volcar(_iterar(conn, f'SELECT {cols} FROM "{nombre}" ORDER BY id'), destino)
+            cur.execute(f'ALTER TABLE "{TABLA}" DETACH PARTITION "{nombre}"')
+            cur.execute(f'DROP TABLE "{nombre}"')
+            return n
+
+        desde = timezone.make_aware(datetime.combine(mes, time.min))
+        hasta = timezone.make_aware(datetime.combine(_sumar_meses(mes, 1), time.min))
+        qs = AuditoriaCita.objects.using(conn.alias).filter(creado_en__gte=desde, creado_en__lt=hasta)
+        n = _volcar(qs.order_by("id").values_list(*COLUMNAS).iterator(chunk_size=2000), destino)
+        qs.delete()
+        return n
+
+
+def corte_por_retencion(meses: int) -> date:
+    """Primer mes que se conserva en la BD si se retienen 'meses' completos además del actual."""
+    return _sumar_meses(_inicio_mes(timezone.localdate()), -meses)
+
+
+def archivar_anteriores_a(corte: date, conn=None, dry_run=False):
+    """
+    Archiva todos los meses completos anteriores a 'corte'.
+    Devuelve [(mes, filas_archivadas)].
+    """
+    conn = conn or connection
+    corte = _inicio_mes(corte)
+    if tabla_particionada(conn):
+        # También los meses con filas en DEFAULT: si no, nunca se archivarían
+        meses = sorted({m for m, _ in listar_particiones(conn)} | set(meses_en_default(conn)))
+        meses = [m for m in meses if m < corte]
+        if not dry_run:
+            for m in meses:
+                crear_particion(m, conn=conn)
+    else:
+        primera = (AuditoriaCita.objects.using(conn.alias)
+                   .filter(creado_en__lt=timezone.make_aware(datetime.combine(corte, time.min)))
+                   .order_by("creado_en").values_list("creado_en", flat=True).first())
+        meses = []
+        if primera:
+            m = _inicio_mes(timezone.localtime(primera).date())
+            while m < corte:
+                meses.append(m)
+                m = _sumar_meses(m, 1)
+
+    if dry_run:
+        return [(m, None) for m in meses]
+    return [(m, archivar_mes(m, conn=conn)) for m in meses]
+
+
+# =========================
+#  LECTURA (BD + archivo)
+# =========================
+
+def _coincide(reg: dict, cita_id, usuario_id, accion, desde, hasta) -> bool:
+    if cita_id is not None and reg["cita_id"] != cita_id:
+        return False
+    if usuario_id is not None and reg["usuario_id"] != usuario_id:
+        return False
+    if accion and reg["accion"] != accion:
+        return False
+    if desde and reg["creado_en"] < desde:
+        return False
+    if hasta and reg["creado_en"] >= hasta:
+        return False
+    return True
+
+
+def _leer_archivo(path: Path):
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for linea in fh:
+            reg = json.loads(linea)
+            reg["creado_en"] = parse_datetime(reg["creado_en"])
+            yield reg
+
+
+def buscar_auditoria(*, cita_id=None, usuario_id=None, accion=None, desde=None, hasta=None,
+                     incluir_archivo=True):
+    """
+    Busca en el historial de auditoría de citas, incluyendo los meses ya archivados.
+    'desde'/'hasta' son datetimes aware ([desde, hasta)). Devuelve dicts con las
+    columnas de COLUMNAS, ordenados por creado_en.
+    Solo se abren los archivos cuyos meses se cruzan con el rango pedido.
+    """
+    resultados = []
+
+    if incluir_archivo and directorio_archivo().exists():
+        mes_desde = _inicio_mes(timezone.localtime(desde).date()) if desde else None
+        mes_hasta = timezone.localtime(hasta).date() if hasta else None
+        for path in sorted(directorio_archivo().glob(f"{TABLA}_*.jsonl.gz")):
+            mes = _mes_de_archivo(path)
+            if mes is None:
+                continue
+            if mes_desde and _sumar_meses(mes, 1) <= mes_desde:
+                continue
+            if mes_hasta and mes > mes_hasta:
+                continue
+            resultados.extend(
+                r for r in _leer_archivo(path)
+                if _coincide(r, cita_id, usuario_id, accion, desde, hasta)
+            )
+
+    qs = AuditoriaCita.objects.all()
+    if cita_id is not None:
+        qs = qs.filter(cita_id=cita_id)
+    if usuario_id is not None:
+        qs = qs.filter(usuario_id=usuario_id)
+    if accion:
+        qs = qs.filter(accion=accion)
+    if desde:
+        qs = qs.filter(creado_en__gte=desde)
+    if hasta:
+        qs = qs.filter(creado_en__lt=hasta)
+    resultados.extend(dict(zip(COLUMNAS, f)) for f in qs.order_by("creado_en").values_list(*COLUMNAS))
+
+    # Un archivado interrumpido puede dejar filas en disco y en la BD: se deduplica por id
+    unicos = {r["id"]: r for r in resultados}
+    return sorted(unicos.values(), key=lambda r: (r["creado_en"], r["id"]))
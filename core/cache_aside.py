@@ -0,0 +1,127 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from typing import Callable, TypeVar
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# =========================
+#  CACHE-ASIDE CON PROTECCIÓN CONTRA ESTAMPIDAS
+# =========================
+# obtener_o_calcular(clave, calcular, timeout) guarda (valor, vence_en) en la caché:
+# - Hasta vence_en el valor se sirve tal cual (hit).
+# - Un poco antes de vencer (REFRESCO_ANTICIPADO del timeout, con probabilidad creciente)
+#   un solo proceso toma un candado y recalcula; el resto sigue sirviendo el valor vigente.
+# - Si no hay valor (miss), solo quien obtiene el candado calcula; los demás esperan
+#   brevemente a que aparezca y, si no aparece, calculan por su cuenta (nunca se bloquea).
+# El valor queda en la caché el doble del timeout para poder servirlo mientras se refresca.
+
+REFRESCO_ANTICIPADO = 0.2     # fracción final del timeout en que se adelanta el recálculo
+ESPERA_CANDADO = 2.0          # segundos máximos esperando a que otro proceso calcule
+_SIN_VALOR = object()
+
+
+# --- métricas (por prefijo de clave: "directorio", "kpis", ...) ---
+_metricas = Counter()
+_metricas_lock = threading.Lock()
+_pendientes = Counter()
+VOLCAR_CADA = 50              # eventos locales antes de sumarlos a la caché compartida
+CLAVE_METRICAS = "cache_aside:metricas:{}"
+EVENTOS = ("hit", "miss", "refresco", "espera")
+
+
+def _registrar(clave: str, evento: str, alias: str):
+    nombre = f"{clave.split(':', 1)[0]}:{evento}"
+    with _metricas_lock:
+        _metricas[nombre] += 1
+        _pendientes[nombre] += 1
+        if sum(_pendientes.values()) < VOLCAR_CADA:
+            return
+        lote = dict(_pendientes)
+        _pendientes.clear()
+    # Suma a la caché compartida para ver los totales de todos los workers
+    cache = caches[alias]
+    for nombre, n in lote.items():
+        k = CLAVE_METRICAS.format(nombre)
+        try:
+            if not cache.add(k, n, timeout=None):
+                cache.incr(k, n)
+        except ValueError:
+            cache.set(k, n, timeout=None)
+
+
+def metricas_locales() -> dict:
+    """Contadores de este proceso: {"directorio:hit": N, ...}."""
+    with _metricas_lock:
+        return dict(_metricas)
+
+
+def metricas_compartidas(prefijos, alias: str = "default") -> dict:
+    """Totales acumulados en la caché compartida para los prefijos indicados."""
+    nombres = [f"{p}:{e}" for p in prefijos for e in EVENTOS]
+    valores = caches[alias].get_many([CLAVE_METRICAS.format(n) for n in nombres])
+    return {n: valores.get(CLAVE_METRICAS.format(n), 0) for n in nombres}
+
+
+def tasa_aciertos(hits: int, misses: int) -> float:
+    total = hits + misses
+    return round(100 * hits / total, 1) if total else 0.0
+
+
+# --- API ---
+def _calcular_y_guardar(cache, clave, calcular, timeout):
+    valor = calcular()
+    cache.set(clave, (valor, time.time() + timeout), timeout=timeout * 2)
+    return valor
+
+
+def obtener_o_calcular(clave: str, calcular: Callable[[], T], timeout: int, *, alias: str = "default") -> T:
+    """Devuelve el valor cacheado en `clave` o lo calcula con `calcular()` (ver notas arriba)."""
+    cache = caches[alias]
+    candado = f"{clave}:candado"
+    guardado = cache.get(clave, _SIN_VALOR)
+
+    if guardado is not _SIN_VALOR:
+        valor, vence_en = guardado
+        restante = vence_en - time.time()
+        ventana = timeout * REFRESCO_ANTICIPADO
+        # Refresco anticipado probabilístico: más probable cuanto más cerca del vencimiento
+        if restante > ventana or random.random() > 1 - max(restante, 0) / ventana:
+            _registrar(clave, "hit", alias)
+            return valor
+        if cache.add(candado, 1, timeout=int(ESPERA_CANDADO) + 5):
+            try:
+                _registrar(clave, "refresco", alias)
+                return _calcular_y_guardar(cache, clave, calcular, timeout)
+            finally:
+                cache.delete(candado)
+        _registrar(clave, "hit", alias)   # otro proceso está refrescando: sirve el vigente
+        return valor
+
+    _registrar(clave, "miss", alias)
+    if cache.add(candado, 1, timeout=int(ESPERA_CANDADO) + 5):
+        try:
+            return _calcular_y_guardar(cache, clave, calcular, timeout)
+        finally:
+            cache.delete(candado)
+
+    # Otro proceso ya está calculando: esperar un poco a que termine
+    _registrar(clave, "espera", alias)
+    limite = time.monotonic() + ESPERA_CANDADO
+    while time.monotonic() < limite:
+        time.sleep(0.05)
+        guardado = cache.get(clave, _SIN_VALOR)
+        if guardado is not _SIN_VALOR:
+            return guardado[0]
+    logger.warning("cache_aside: sin respuesta del candado de %s, se calcula igual", clave)
+    return _calcular_y_guardar(cache, clave, calcular, timeout)
+
+
+def invalidar(*claves: str, alias: str = "default"):
+    caches[alias].delete_many(list(claves))
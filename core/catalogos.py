@@ -0,0 +1,126 @@
+import threading
+import time
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
+
+from core.models import Especialidad, EstadoCita, Ubicacion
+
+# =========================
+#  CATÁLOGOS EN MEMORIA (EstadoCita, Ubicacion, Especialidad)
+# =========================
+
+class Catalogo:
+    """
+    Copia en memoria (por proceso) de una tabla pequeña y casi estática.
+    Se carga con una consulta la primera vez y luego se sirve sin ir a la BD.
+    Se invalida con las señales post_save/post_delete del modelo (ver core/signals.py)
+    y, como respaldo para cambios hechos desde otros procesos, expira tras CATALOGOS_TTL segundos.
+    """
+
+    def __init__(self, model, orden=("nombre",)):
+        self.model = model
+        self.orden = orden
+        self._lock = threading.Lock()
+        self._datos = None          # (items, por_id, por_nombre)
+        self._cargado_en = 0.0
+
+    def _vigente(self):
+        ttl = getattr(settings, "CATALOGOS_TTL", 300)
+        return self._datos is not None and (time.monotonic() - self._cargado_en) < ttl
+
+    def _cargar(self):
+        datos = self._datos
+        if datos is not None and self._vigente():
+            return datos
+        with self._lock:
+            if not self._vigente():
+                # Desde el primario: la copia dura CATALOGOS_TTL y no debe salir de una réplica atrasada
+                items = list(self.model._default_manager.db_manager("default").order_by(*self.orden))
+                self._datos = (
+                    items,
+                    {o.pk: o for o in items},
+                    {o.nombre.casefold(): o for o in items},
+                )
+                self._cargado_en = time.monotonic()
+            return self._datos
+
+    def invalidar(self, **kwargs):
+        self._datos = None
+
+    # --- lecturas ---
+    def todos(self) -> list:
+        return self._cargar()[0]
+
+    def get(self, pk):
+        """Instancia por id (acepta str) o None."""
+        try:
+            return self._cargar()[1].get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def por_nombre(self, nombre: str):
+        """Instancia por nombre, sin distinguir mayúsculas (equivale a nombre__iexact)."""
+        return self._cargar()[2].get((nombre or "").casefold())
+
+    def nombres(self) -> list:
+        return [o.nombre for o in self.todos()]
+
+    def ids_por_nombre(self) -> dict:
+        return {o.nombre: o.pk for o in self.todos()}
+
+    def choice_field(self, **kwargs):
+        return CatalogoChoiceField(self, **kwargs)
+
+
+estados = Catalogo(EstadoCita)
+ubicaciones = Catalogo(Ubicacion)
+especialidades = Catalogo(Especialidad)
+
+CATALOGOS = (estados, ubicaciones, especialidades)
+
+
+# =========================
+#  CAMPO DE FORMULARIO
+# =========================
+
+class CatalogoChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.catalogo.todos():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.catalogo.todos()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.catalogo.todos())
+
+
+class CatalogoChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField que arma las opciones y valida el valor contra el catálogo en
+    memoria: renderizar y validar el formulario no hace consultas.
+    """
+    iterator = CatalogoChoiceIterator
+
+    def __init__(self, catalogo: Catalogo, **kwargs):
+        self.catalogo = catalogo
+        super().__init__(queryset=catalogo.model._default_manager.order_by(*catalogo.orden), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.catalogo.model):
+            return value
+        obj = self.catalogo.get(value)
+        if obj is None:
+            raise ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+        return obj
@@ -1,42 +1,73 @@
-from django.db import transaction
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from core.models import Agenda, Cita, EstadoCita, AuditoriaCita, Paciente
+from core.auditoria import registro_auditoria, registrar_auditoria
+from core import catalogos, salas
 
-@transaction.atomic
-def asignar_cita(agenda_id: int, paciente: Paciente, estado: EstadoCita, usuario, motivo: str | None = None) -> Cita:
-    # Lock del slot para evitar carreras
+@registro_auditoria
+def asignar_cita(agenda_id: int, paciente: Paciente, estado: EstadoCita, usuario, motivo: str | None = None,
+                 sobrecupo: bool = False) -> Cita:
+    # Lock del slot para evitar carreras (también serializa los sobrecupos del bloque)
     slot = Agenda.objects.select_for_update().get(pk=agenda_id)
-    if hasattr(slot, "cita"):
+    pacientes = list(slot.citas.values_list("paciente_id", flat=True))
+    if pacientes and not sobrecupo:
         raise ValidationError("Este horario ya fue asignado.")
+    if pacientes:
+        if len(pacientes) > slot.sobrecupo_max:
+            raise ValidationError("Este horario no admite más sobrecupos.")
+        if paciente.id in pacientes:
+            raise ValidationError("El paciente ya tiene una cita en este horario.")
+    else:
+        # La sala no puede tener más citas presenciales simultáneas que su capacidad
+        # (el sobrecupo comparte la sala de la cita titular)
+        salas.verificar_sala(slot)
 
     cita = Cita.objects.create(
         agenda=slot,
         paciente=paciente,
         estado=estado,
         motivo=motivo or "",
+        sobrecupo=bool(pacientes),
         creado_por=usuario,
     )
-    AuditoriaCita.objects.create(
-        cita=cita,
+    registrar_auditoria(
+        cita,
+        AuditoriaCita.Accion.CREAR,
+        detalle={"motivo": motivo or "", "paciente_id": paciente.id, "estado": estado.nombre,
+                 "sobrecupo": cita.sobrecupo},
         usuario=usuario,
-        accion=AuditoriaCita.Accion.CREAR,
-        detalle={"motivo": motivo or "", "paciente_id": paciente.id, "estado": estado.nombre},
     )
     return cita
 
-@transaction.atomic
+@registro_auditoria
 def cancelar_cita(cita_id: int, usuario):
     cita = Cita.objects.select_related("agenda", "paciente").get(pk=cita_id)
-    AuditoriaCita.objects.create(
-        cita=cita,
+    registrar_auditoria(
+        cita.pk,
+        AuditoriaCita.Accion.CANCELAR,
+        detalle={"paciente_id": cita.paciente_id, "sobrecupo": cita.sobrecupo},
         usuario=usuario,
-        accion=AuditoriaCita.Accion.CANCELAR,
-        detalle={"paciente_id": cita.paciente_id},
     )
-    # Eliminar la cita => el slot queda libre
+    if cita.sobrecupo:
+        cita.delete()
+        return
+    # Eliminar la cita titular => el slot queda libre, salvo que haya sobrecupo:
+    # el sobrecupo más antiguo pasa a ser la cita titular
+    Agenda.objects.select_for_update().filter(pk=cita.agenda_id).first()
     cita.delete()
+    siguiente = (Cita.objects.filter(agenda_id=cita.agenda_id, sobrecupo=True)
+                 .order_by("creado_en", "pk").first())
+    if siguiente is not None:
+        siguiente.sobrecupo = False
+        siguiente.save(update_fields=["sobrecupo", "actualizado_en"])
+        registrar_auditoria(
+            siguiente,
+            AuditoriaCita.Accion.ACTUALIZAR,
+            detalle={"sobrecupo": {"antes": True, "despues": False}},
+            usuario=usuario,
+        )
 
-@transaction.atomic
+@registro_auditoria
 def cambiar_estado(cita_id: int, nuevo_estado: EstadoCita, usuario):
     cita = Cita.objects.select_related("agenda", "paciente").get(pk=cita_id)
     anterior = cita.estado
@@ -44,15 +75,15 @@ def cambiar_estado(cita_id: int, nuevo_estado: EstadoCita, usuario):
         return cita  # sin cambios
     cita.estado = nuevo_estado
     cita.save(update_fields=["estado"])
-    AuditoriaCita.objects.create(
-        cita=cita,
-        usuario=usuario,
-        accion=AuditoriaCita.Accion.CAMBIAR_ESTADO,
+    registrar_auditoria(
+        cita,
+        AuditoriaCita.Accion.CAMBIAR_ESTADO,
         detalle={"antes": getattr(anterior, "nombre", None), "despues": nuevo_estado.nombre},
+        usuario=usuario,
     )
     return cita
 
-@transaction.atomic
+@registro_auditoria
 def pro_actualizar_cita_estado_y_nota(*, cita_id: int, nuevo_estado: EstadoCita, nota: str, usuario):
     """
     Cambia el estado y/o la nota de una cita y registra auditoría.
@@ -74,11 +105,50 @@ def pro_actualizar_cita_estado_y_nota(*, cita_id: int, nuevo_estado: EstadoCita,
 
     if cambios:
         cita.save(update_fields=["estado", "nota", "actualizado_en"])
-        AuditoriaCita.objects.create(
-            cita=cita,
-            usuario=usuario,
-            accion=AuditoriaCita.Accion.ACTUALIZAR,
-            detalle=cambios,
-        )
+        registrar_auditoria(cita, AuditoriaCita.Accion.ACTUALIZAR, detalle=cambios, usuario=usuario)
+
+    return cita
+
+
+@registro_auditoria
+def cambiar_estados_en_lote(cambios: dict, usuario) -> int:
+    """
+    Aplica {cita_id: EstadoCita} en una sola transacción:
+    - bloquea las citas involucradas,
+    - un UPDATE por estado destino (no uno por cita),
+    - la auditoría sale en un único INSERT al cerrar el bloque.
+    Las citas que ya tienen el estado pedido (o que no existen) se omiten.
+    Devuelve la cantidad de citas modificadas.
+    """
+    if not cambios:
+        return 0
+
+    actuales = dict(
+        Cita.objects.select_for_update()
+        .filter(pk__in=list(cambios))
+        .values_list("pk", "estado_id")
+    )
+
+    por_estado = {}
+    for cita_id, estado in cambios.items():
+        if cita_id in actuales and actuales[cita_id] != estado.id:
+            por_estado.setdefault(estado, []).append(cita_id)
+
+    ahora = timezone.now()
+    total = 0
+    for estado, ids in por_estado.items():
+        total += Cita.objects.filter(pk__in=ids).update(estado=estado, actualizado_en=ahora)
+        for cita_id in ids:
+            anterior = catalogos.estados.get(actuales[cita_id])
+            registrar_auditoria(
+                cita_id,
+                AuditoriaCita.Accion.CAMBIAR_ESTADO,
+                detalle={"antes": getattr(anterior, "nombre", None), "despues": estado.nombre, "lote": True},
+                usuario=usuario,
+            )
+    return total
+
 
-    return cita
\ No newline at end of file
+def cambiar_estado_en_lote(cita_ids, nuevo_estado: EstadoCita, usuario) -> int:
+    """Atajo: lleva todas las citas indicadas al mismo estado."""
+    return cambiar_estados_en_lote({cid: nuevo_estado for cid in cita_ids}, usuario)
@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, FloatField, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import catalogos, riesgo
+from core.citas import cambiar_estado_en_lote
+from core.models import Cita, ContactoCita
+
+# =========================
+#  LISTA DE LLAMADAS DE CONFIRMACIÓN (recepción)
+# =========================
+# Citas Pendiente de los próximos N días, con su último intento de contacto, en UNA
+# consulta (subconsultas correlacionadas sobre contactos_cita por el índice de cita).
+# Orden: riesgo de ausencia (mayor primero; sin puntaje al final), hora y id.
+# Paginación por keyset sobre ese mismo orden: el cursor es la última fila mostrada.
+
+PENDIENTE, CONFIRMADA = "Pendiente", "Confirmada"
+SIN_PUNTAJE = -1.0
+
+
+class FilaConfirmacion:
+    """Una cita por confirmar lista para la plantilla."""
+    __slots__ = ("id", "inicio", "fin", "paciente", "rut", "telefono", "profesional",
+                 "riesgo", "ultimo_resultado", "ultimo_contacto", "intentos")
+
+    def __init__(self, id, inicio, fin, nombres, apellidos, rut, telefono, prof_nombre, prof_apellido,
+                 riesgo, ultimo_resultado, ultimo_contacto, intentos):
+        self.id = id
+        self.inicio = timezone.localtime(inicio)
+        self.fin = timezone.localtime(fin)
+        self.paciente = f"{nombres} {apellidos}".strip()
+        self.rut = rut
+        self.telefono = telefono
+        self.profesional = f"{prof_nombre} {prof_apellido}"
+        self.riesgo = None if riesgo == SIN_PUNTAJE else riesgo
+        self.ultimo_resultado = ultimo_resultado
+        self.ultimo_contacto = timezone.localtime(ultimo_contacto) if ultimo_contacto else None
+        self.intentos = intentos or 0
+
+    @property
+    def ultimo_resultado_display(self):
+        return ContactoCita.Resultado(self.ultimo_resultado).label if self.ultimo_resultado else ""
+
+
+CAMPOS = (
+    "pk", "agenda__inicio", "agenda__fin",
+    "paciente__nombres", "paciente__apellidos", "paciente__rut", "paciente__telefono",
+    "agenda__profesional__nombre", "agenda__profesional__apellido",
+    "riesgo_orden", "ultimo_resultado", "ultimo_contacto", "intentos",
+)
+
+
+def por_confirmar(dias: int, profesional_id=None, desde=None):
+    """Queryset anotado de las citas Pendiente con atención en [desde, desde + dias)."""
+    desde = desde or timezone.now()
+    pendiente = catalogos.estados.por_nombre(PENDIENTE)
+    qs = Cita.objects.filter(
+        estado_id=getattr(pendiente, "pk", None),
+        agenda__inicio__gte=desde, agenda__inicio__lt=desde + timedelta(days=dias),
+    )
+    if profesional_id:
+        qs = qs.filter(agenda__profesional_id=profesional_id)
+
+    contactos = ContactoCita.objects.filter(cita_id=OuterRef("pk")).order_by("-fecha_contacto", "-pk")
+    return qs.annotate(
+        riesgo_orden=Coalesce("riesgo__puntaje", Value(SIN_PUNTAJE), output_field=FloatField()),
+        ultimo_resultado=Subquery(contactos.values("resultado")[:1]),
+        ultimo_contacto=Subquery(contactos.values("fecha_contacto")[:1]),
+        intentos=Subquery(
+            contactos.order_by().values("cita_id").annotate(c=Count("pk")).values("c"),
+            output_field=IntegerField(),
+        ),
+    )
+
+
+# --- keyset ---
+def cursor_de(fila: FilaConfirmacion) -> str:
+    r = SIN_PUNTAJE if fila.riesgo is None else fila.riesgo
+    return f"{r!r}_{fila.inicio.isoformat()}_{fila.id}"
+
+
+def _leer_cursor(cursor: str):
+    try:
+        r, inicio, pk = cursor.split("_")
+        inicio = parse_datetime(inicio)
+        return (float(r), inicio, int(pk)) if inicio else None
+    except ValueError:
+        return None
+
+
+def pagina(qs, cursor: str | None = None, tamano: int = 50):
+    """(filas, cursor_siguiente) en orden (-riesgo, inicio, id), sin OFFSET."""
+    posicion = _leer_cursor(cursor) if cursor else None
+    if posicion:
+        r, inicio, pk = posicion
+        qs = qs.filter(
+            Q(riesgo_orden__lt=r)
+            | Q(riesgo_orden=r, agenda__inicio__gt=inicio)
+            | Q(riesgo_orden=r, agenda__inicio=inicio, pk__gt=pk)
+        )
+    filas = [FilaConfirmacion(*row) for row in
+             qs.order_by("-riesgo_orden", "agenda__inicio", "pk").values_list(*CAMPOS)[:tamano + 1]]
+    siguiente = cursor_de(filas[tamano - 1]) if len(filas) > tamano else None
+    return filas[:tamano], siguiente
+
+
+def puntuar_faltantes(dias: int, profesional_id=None) -> int:
+    """Puntúa las citas de la lista que aún no tienen puntaje (recién agendadas)."""
+    return riesgo.puntuar_citas(por_confirmar(dias, profesional_id).filter(riesgo__isnull=True))
+
+
+# --- registro en lote ---
+@transaction.atomic
+def registrar_contactos(resultados: dict, canal: str, usuario, descripcion: str = "") -> dict:
+    """
+    {cita_id: resultado} -> un ContactoCita por cita en un solo INSERT. Las confirmadas
+    pasan a estado Confirmada (UPDATE en lote con auditoría) y el resto se vuelve a
+    puntuar, porque el último contacto es una de las variables del riesgo.
+    """
+    validos = set(Cita.objects.filter(pk__in=list(resultados)).values_list("pk", flat=True))
+    contactos = [
+        ContactoCita(cita_id=cid, usuario=usuario, canal=canal, resultado=resultado,
+                     descripcion=descripcion or None)
+        for cid, resultado in resultados.items() if cid in validos
+    ]
+    ContactoCita.objects.bulk_create(contactos)
+
+    confirmadas = [c.cita_id for c in contactos if c.resultado == ContactoCita.Resultado.CONFIRMADO]
+    estado = catalogos.estados.por_nombre(CONFIRMADA)
+    n_confirmadas = cambiar_estado_en_lote(confirmadas, estado, usuario) if confirmadas and estado else 0
+
+    ya_confirmadas = set(confirmadas)
+    otras = [c.cita_id for c in contactos if c.cita_id not in ya_confirmadas]
+    if otras:
+        riesgo.puntuar_citas(Cita.objects.filter(pk__in=otras))
+    return {"registrados": len(contactos), "confirmadas": n_confirmadas}
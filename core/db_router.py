@@ -0,0 +1,65 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# =========================
+#  RÉPLICA DE LECTURA
+# =========================
+# Las vistas de solo lectura (listados, dashboards, KPIs) se marcan con
+# @lectura_replica (core/decorators.py): mientras corren, las lecturas van al alias
+# de réplica. Todo lo demás (escrituras, select_for_update de asignar_cita, sesiones)
+# sigue en "default". Sin réplica configurada el router no cambia nada.
+
+ALIAS_REPLICA = "replica"
+CLAVE_SESION = "_leer_primario_hasta"   # timestamp hasta el cual la sesión lee del primario
+
+_lectura = ContextVar("lectura_db", default=None)
+
+
+def replica_disponible() -> bool:
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+@contextmanager
+def leer_desde_replica():
+    """Dentro del bloque, las lecturas del ORM van a la réplica (si existe)."""
+    token = _lectura.set(ALIAS_REPLICA if replica_disponible() else None)
+    try:
+        yield
+    finally:
+        _lectura.reset(token)
+
+
+def marcar_escritura(session):
+    """Read-your-writes: tras una escritura, la sesión lee del primario por REPLICA_STICKY_SEGUNDOS."""
+    session[CLAVE_SESION] = time.time() + getattr(settings, "REPLICA_STICKY_SEGUNDOS", 15)
+
+
+async def amarcar_escritura(session):
+    await session.aset(CLAVE_SESION, time.time() + getattr(settings, "REPLICA_STICKY_SEGUNDOS", 15))
+
+
+def debe_leer_primario(session) -> bool:
+    return session.get(CLAVE_SESION, 0) > time.time()
+
+
+async def adebe_leer_primario(session) -> bool:
+    return await session.aget(CLAVE_SESION, 0) > time.time()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _lectura.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica y primario tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación, no por migrate
+        return db != ALIAS_REPLICA
@@ -1,10 +1,12 @@
 from django.contrib.auth.decorators import login_required
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from .utils import user_has_role
 from django.shortcuts import redirect
 from django.urls import reverse
 from core.models import Paciente
 from django.contrib import messages
+from core.db_router import adebe_leer_primario, debe_leer_primario, leer_desde_replica
 
 
 def role_required(nombre_rol):
@@ -23,6 +25,8 @@ def role_required(nombre_rol):
 
             # Si el usuario tiene el rol solicitado o es Administrador, dejar pasar
             if user_has_role(user, nombre_rol) or user_has_role(user, "Administrador"):
+                # Panel en el que se está (clave de los fragmentos {% cache %} de las plantillas)
+                request.rol_panel = nombre_rol
                 return view_func(request, *args, **kwargs)
 
             # Si no tiene permiso, mensaje y redirección a página bonita
@@ -52,3 +56,48 @@ def paciente_login_required(view_func):
         return view_func(request, *args, **kwargs)
 
     return _wrapped
+
+
+def apaciente_login_required(view_func):
+    """Versión async de paciente_login_required (sesión y ORM async, sin hilos extra)."""
+    @wraps(view_func)
+    async def _wrapped(request, *args, **kwargs):
+        pid = await request.session.aget("paciente_id")
+        if not pid:
+            return redirect(f"{reverse('login_paciente')}?next={request.path}")
+
+        paciente = await Paciente.objects.filter(pk=pid, is_active=True).afirst()
+        if paciente is None:
+            await request.session.apop("paciente_id", None)
+            return redirect(reverse("login_paciente"))
+
+        request.paciente = paciente
+        return await view_func(request, *args, **kwargs)
+
+    return _wrapped
+
+
+def lectura_replica(view_func):
+    """
+    Para vistas de solo lectura: en GET/HEAD las consultas van a la réplica.
+    Si la sesión escribió hace poco (ver LecturaPrimarioTrasEscrituraMiddleware)
+    se sigue leyendo del primario, para que el usuario vea sus propios cambios.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _awrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or await adebe_leer_primario(request.session):
+                return await view_func(request, *args, **kwargs)
+            with leer_desde_replica():
+                return await view_func(request, *args, **kwargs)
+
+        return _awrapped
+
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD") or debe_leer_primario(request.session):
+            return view_func(request, *args, **kwargs)
+        with leer_desde_replica():
+            return view_func(request, *args, **kwargs)
+
+    return _wrapped
@@ -0,0 +1,99 @@
+import hashlib
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from core import cache_aside
+from core.models import Profesional
+
+# =========================
+#  DIRECTORIO PÚBLICO DE PROFESIONALES
+# =========================
+# La página pública /profesionales/ no necesita datos al segundo: se arma desde un
+# listado de profesionales activos guardado en caché y el HTML de la grilla se
+# cachea por (especialidad, búsqueda). Todas las claves llevan un número de versión
+# que se incrementa al guardar/borrar un Profesional o una Especialidad (core/signals.py),
+# así una edición deja obsoleto todo el directorio de una sola vez.
+
+CLAVE_VERSION = "directorio:version"
+PLANTILLA_GRILLA = "core/html/_profesionales_grilla.html"
+
+
+def _ttl():
+    return getattr(settings, "DIRECTORIO_TTL", 600)
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin tildes: 'Muñoz Peña' -> 'munoz pena'."""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).casefold().strip()
+
+
+def version() -> int:
+    v = cache.get(CLAVE_VERSION)
+    if v is None:
+        cache.add(CLAVE_VERSION, 1, timeout=None)
+        v = cache.get(CLAVE_VERSION, 1)
+    return v
+
+
+def invalidar(**kwargs):
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 1, timeout=None)
+
+
+def roster() -> list[dict]:
+    """Profesionales activos (dicts planos, ya ordenados) con su clave de búsqueda."""
+    return cache_aside.obtener_o_calcular(f"directorio:v{version()}:roster", _cargar_roster, _ttl())
+
+
+def _cargar_roster() -> list[dict]:
+    # Siempre desde el primario: tras invalidar(), una réplica atrasada dejaría datos
+    # viejos en la clave nueva durante todo el TTL
+    return [
+        {
+            "id": p["id"],
+            "nombre": p["nombre"],
+            "apellido": p["apellido"],
+            "especialidad_id": p["especialidad_id"],
+            "especialidad": {"nombre": p["especialidad__nombre"]},
+            "email": p["email"],
+            "telefono": p["telefono"],
+            "busqueda": normalizar(f'{p["nombre"]} {p["apellido"]}'),
+        }
+        for p in (
+            Profesional.objects.using("default").filter(activo=True)
+            .order_by("apellido", "nombre")
+            .values("id", "nombre", "apellido", "especialidad_id",
+                    "especialidad__nombre", "email", "telefono")
+        )
+    ]
+
+
+def filtrar(esp_id: int | None, q: str = "") -> list[dict]:
+    """Filtro en memoria por especialidad y por texto (sin distinguir tildes ni mayúsculas)."""
+    qn = normalizar(q)
+    return [
+        p for p in roster()
+        if (esp_id is None or p["especialidad_id"] == esp_id)
+        and (not qn or qn in p["busqueda"])
+    ]
+
+
+def grilla_html(esp_id: int | None, q: str = "") -> str:
+    """HTML de la grilla de tarjetas, cacheado por (versión, especialidad, búsqueda)."""
+    qn = normalizar(q)
+    digest = hashlib.sha1(qn.encode()).hexdigest()[:16]
+    clave = f"directorio:v{version()}:grilla:{esp_id or 0}:{digest}"
+    return cache_aside.obtener_o_calcular(
+        clave,
+        lambda: render_to_string(PLANTILLA_GRILLA, {
+            "profesionales": filtrar(esp_id, qn),
+            "filtrado_por_esp": esp_id is not None,
+        }),
+        _ttl(),
+    )
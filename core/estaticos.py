@@ -0,0 +1,155 @@
+import gzip
+import json
+import mimetypes
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:          # opcional: sin brotli solo se generan .gz
+    brotli = None
+
+# =========================
+#  ARCHIVOS ESTÁTICOS (build + servido)
+# =========================
+# Build (deploy):
+#   python manage.py generar_variantes_imagenes   # WebP/JPEG redimensionados (Pillow)
+#   python manage.py vendorizar_assets            # Chart.js y otros a core/static/core/vendor
+#   python manage.py collectstatic --noinput      # nombres con hash + .gz/.br precomprimidos
+# Servido: servir_estatico entrega desde STATIC_ROOT la versión comprimida que acepte el
+# navegador, con caché de un año (immutable) para los nombres con hash.
+
+COMPRIMIBLES = (".css", ".js", ".mjs", ".svg", ".json", ".map", ".txt", ".xml", ".ico")
+_CON_HASH = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+CARPETA_VARIANTES = "variantes"
+INDICE_VARIANTES = f"core/img/{CARPETA_VARIANTES}/indice.json"
+
+
+# --- storage: ManifestStaticFilesStorage + precompresión ---
+class ManifestComprimidoStorage(ManifestStaticFilesStorage):
+    """Nombres con hash de contenido (manifest) y, junto a cada texto, su .gz y .br."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        procesados = set()
+        for original, procesado, hecho in super().post_process(paths, dry_run, **options):
+            if hecho and procesado:
+                procesados.add(procesado)
+            yield original, procesado, hecho
+        if dry_run:
+            return
+        for nombre in sorted(procesados):
+            if nombre.endswith(COMPRIMIBLES):
+                self._comprimir(nombre)
+
+    def _comprimir(self, nombre):
+        ruta = Path(self.path(nombre))
+        datos = ruta.read_bytes()
+        variantes = [(".gz", gzip.compress(datos, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variantes.append((".br", brotli.compress(datos, quality=11)))
+        for sufijo, comprimido in variantes:
+            if len(comprimido) < len(datos):
+                ruta.with_name(ruta.name + sufijo).write_bytes(comprimido)
+
+
+# --- servido con cabeceras de caché largas ---
+def _cache_control(nombre: str) -> str:
+    if _CON_HASH.search(nombre):
+        return f"public, max-age={settings.ESTATICOS_MAX_AGE}, immutable"
+    return f"public, max-age={settings.ESTATICOS_MAX_AGE_SIN_HASH}"
+
+
+def servir_estatico(request, ruta):
+    """
+    Sirve STATIC_ROOT/ruta (tras collectstatic). Prefiere .br o .gz según Accept-Encoding,
+    responde 304 con If-Modified-Since y marca los archivos con hash como immutable.
+    """
+    try:
+        completa = safe_join(settings.STATIC_ROOT, ruta)
+    except ValueError:
+        raise Http404
+    if not os.path.isfile(completa):
+        raise Http404
+
+    aceptadas = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    archivo, codificacion = completa, None
+    for sufijo, nombre_cod in ((".br", "br"), (".gz", "gzip")):
+        if nombre_cod in aceptadas and os.path.isfile(completa + sufijo):
+            archivo, codificacion = completa + sufijo, nombre_cod
+            break
+
+    estado = os.stat(archivo)
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), estado.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        tipo, _ = mimetypes.guess_type(completa)
+        response = FileResponse(open(archivo, "rb"), content_type=tipo or "application/octet-stream")
+        if codificacion:
+            response["Content-Encoding"] = codificacion
+    response["Last-Modified"] = http_date(estado.st_mtime)
+    response["Cache-Control"] = _cache_control(ruta)
+    response["Vary"] = "Accept-Encoding"
+    return response
+
+
+# --- variantes de imágenes ---
+def nombre_variante(ruta: str, ancho: int, extension: str) -> str:
+    """core/img/cosam_1.jpeg -> core/img/variantes/cosam_1-960.webp"""
+    carpeta, archivo = os.path.split(ruta)
+    base = os.path.splitext(archivo)[0]
+    return f"{carpeta}/{CARPETA_VARIANTES}/{base}-{ancho}.{extension}"
+
+
+def _leer_indice() -> dict:
+    # Tras collectstatic está en STATIC_ROOT; en desarrollo, en la carpeta static de la app
+    try:
+        with staticfiles_storage.open(INDICE_VARIANTES) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        pass
+    encontrado = finders.find(INDICE_VARIANTES)
+    if encontrado:
+        with open(encontrado, encoding="utf-8") as fh:
+            return json.load(fh)
+    return {}
+
+
+@lru_cache(maxsize=1)
+def indice_variantes() -> dict:
+    """{ruta_original: [[ancho, extension], ...]} escrito por generar_variantes_imagenes."""
+    return _leer_indice()
+
+
+def variantes_de(ruta: str) -> list[tuple[int, str]]:
+    """Variantes generadas para la imagen (vacío si falta el build: se usa la original)."""
+    return [tuple(v) for v in indice_variantes().get(ruta, [])]
+
+
+# --- librerías de terceros servidas desde la app ---
+# nombre -> (ruta en static, URL de origen fijada a una versión)
+VENDOR = {
+    "chartjs": ("core/vendor/chart.umd.min.js",
+                "https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"),
+}
+
+
+@lru_cache(maxsize=None)
+def url_vendor(nombre: str) -> str:
+    """URL local (con hash tras collectstatic) si el archivo fue vendorizado; si no, la del CDN."""
+    ruta, origen = VENDOR[nombre]
+    try:
+        if staticfiles_storage.exists(ruta) or finders.find(ruta):
+            return staticfiles_storage.url(ruta)
+    except ValueError:        # falta en el manifest: collectstatic anterior al vendorizado
+        pass
+    return origen
@@ -2,7 +2,8 @@ from django import forms
 from django.contrib.auth.forms import PasswordResetForm, SetPasswordForm
 from django.core.exceptions import ValidationError
 import re
-from .models import Paciente, PlantillaAtencion, Ubicacion, Agenda, EstadoCita
+from .models import Paciente, PlantillaAtencion, Agenda
+from . import catalogos
 import string
 from datetime import date
 from django.db.models.functions import Replace, Upper
@@ -440,8 +441,8 @@ class ProfesionalHorarioForm(forms.Form):
                                           widget=forms.NumberInput(attrs={"class":"form-control"}))
     modalidad = forms.ChoiceField(choices=Agenda.Modalidad.choices, initial=Agenda.Modalidad.PRESENCIAL,
                                   widget=forms.Select(attrs={"class":"form-select"}))
-    ubicacion = forms.ModelChoiceField(queryset=Ubicacion.objects.all(), label="Ubicación",
-                                       widget=forms.Select(attrs={"class":"form-select"}))
+    ubicacion = catalogos.ubicaciones.choice_field(label="Ubicación",
+                                                   widget=forms.Select(attrs={"class":"form-select"}))
 
     def clean(self):
         cleaned = super().clean()
@@ -462,6 +463,26 @@ class ProfesionalHorarioForm(forms.Form):
         b = int(self.cleaned_data["dia_fin"])
         return list(range(a, b+1)) if a <= b else list(range(a, 7)) + list(range(0, b+1))
 
+class TramoHorarioForm(forms.Form):
+    """Un tramo del horario semanal (editor de horario, JSON): un día, una ventana, una sala."""
+    dia_semana = forms.TypedChoiceField(choices=PlantillaAtencion.DiaSemana.choices, coerce=int)
+    hora_inicio = forms.TimeField()
+    hora_fin = forms.TimeField()
+    duracion_minutos = forms.IntegerField(min_value=5, max_value=240)
+    modalidad = forms.ChoiceField(choices=Agenda.Modalidad.choices)
+    ubicacion = catalogos.ubicaciones.choice_field()
+
+    def clean(self):
+        cleaned = super().clean()
+        hi, hf, dur = cleaned.get("hora_inicio"), cleaned.get("hora_fin"), cleaned.get("duracion_minutos")
+        if hi and hf:
+            if hf <= hi:
+                self.add_error("hora_fin", "La hora de fin debe ser posterior a la de inicio.")
+            elif dur and (hf.hour * 60 + hf.minute) - (hi.hour * 60 + hi.minute) < dur:
+                self.add_error("duracion_minutos", "La ventana no alcanza para un bloque de esa duración.")
+        return cleaned
+
+
 RUT_RE = re.compile(r"[^0-9Kk]")  # para limpiar puntos y guion
 
 class AsignarCitaForm(forms.Form):
@@ -469,9 +490,8 @@ class AsignarCitaForm(forms.Form):
         label="RUT del paciente",
         widget=forms.TextInput(attrs={"class": "form-control", "placeholder": "12.345.678-9"})
     )
-    estado = forms.ModelChoiceField(
+    estado = catalogos.estados.choice_field(
         label="Estado",
-        queryset=EstadoCita.objects.all().order_by("nombre"),
         widget=forms.Select(attrs={"class": "form-select"})
     )
     motivo = forms.CharField(
@@ -495,15 +515,13 @@ class AsignarCitaForm(forms.Form):
         return rut
 
 class CambiarEstadoCitaForm(forms.Form):
-    estado = forms.ModelChoiceField(
+    estado = catalogos.estados.choice_field(
         label="Nuevo estado",
-        queryset=EstadoCita.objects.all().order_by("nombre"),
         widget=forms.Select(attrs={"class": "form-select"})
     )
 
 class ProCitaEstadoNotaForm(forms.Form):
-    estado = forms.ModelChoiceField(
-        queryset=EstadoCita.objects.all().order_by("nombre"),
+    estado = catalogos.estados.choice_field(
         widget=forms.Select(attrs={"class": "form-select"}),
         label="Estado"
     )
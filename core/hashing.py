@@ -0,0 +1,92 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+# =========================
+#  HASHING DE CONTRASEÑAS DE PACIENTES
+# =========================
+# Hashear/verificar es CPU puro (PBKDF2/Argon2 tardan decenas de ms a propósito).
+# Todo pasa por un pool acotado de hilos: las vistas async esperan sin bloquear el
+# event loop y, en WSGI, un pico de logins no puede ocupar más de HASHING_HILOS núcleos
+# a la vez. El costo se ajusta en settings (PASSWORD_HASHER, PBKDF2_ITERACIONES,
+# ARGON2_*); al verificar un hash con parámetros viejos se re-hashea con los actuales.
+
+_pool = None
+
+
+def _ejecutor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        hilos = getattr(settings, "HASHING_HILOS", None) or min(4, os.cpu_count() or 1)
+        _pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="hashing")
+    return _pool
+
+
+# --- hashers con costo configurable (se registran en settings.PASSWORD_HASHERS) ---
+class PBKDF2Configurable(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 con iteraciones desde settings (mismo algoritmo: hashes compatibles)."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, "PBKDF2_ITERACIONES", hashers.PBKDF2PasswordHasher.iterations)
+
+
+class Argon2Configurable(hashers.Argon2PasswordHasher):
+    """Argon2id (requiere argon2-cffi) con costos desde settings."""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, "ARGON2_TIME_COST", hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, "ARGON2_MEMORY_COST", hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, "ARGON2_PARALLELISM", hashers.Argon2PasswordHasher.parallelism)
+
+
+# --- API síncrona (pasa por el pool para acotar la concurrencia) ---
+def hashear(raw_password: str) -> str:
+    return _ejecutor().submit(hashers.make_password, raw_password).result()
+
+
+def _verificar(raw_password: str, encoded: str) -> tuple[bool, bool]:
+    # El setter solo registra el pedido: re-hashear dentro del pool podría esperar por el mismo pool
+    pedido = []
+    ok = hashers.check_password(raw_password, encoded, setter=lambda raw: pedido.append(True))
+    return ok, bool(pedido)
+
+
+def verificar(raw_password: str, encoded: str, setter=None) -> bool:
+    """
+    Verifica `raw_password` contra `encoded`. Si el hash usa un hasher o costo que
+    ya no es el preferido y la clave es correcta, llama setter(raw_password) para re-hashear.
+    """
+    if not encoded:
+        return False
+    ok, requiere_rehash = _ejecutor().submit(_verificar, raw_password, encoded).result()
+    if ok and requiere_rehash and setter:
+        setter(raw_password)
+    return ok
+
+
+# --- API async (para vistas async: no bloquea el event loop) ---
+async def ahashear(raw_password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_ejecutor(), hashers.make_password, raw_password)
+
+
+async def averificar(raw_password: str, encoded: str) -> tuple[bool, bool]:
+    """
+    Devuelve (valida, requiere_rehash). El re-hash lo decide quien llama (p.ej. con
+    ahashear + asave), porque aquí no se toca el ORM.
+    """
+    if not encoded:
+        return False, False
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_ejecutor(), _verificar, raw_password, encoded)
@@ -0,0 +1,131 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from core import catalogos
+from core.auditoria import registro_auditoria
+from core.citas import asignar_cita
+from core.models import Agenda, Cita, ListaEspera
+
+logger = logging.getLogger(__name__)
+
+# =========================
+#  LISTA DE ESPERA: RELLENO AUTOMÁTICO DE BLOQUES LIBERADOS
+# =========================
+# Al borrarse una cita (cancelación) se dispara, después del commit, rellenar_bloque():
+#   1. el bloque debe seguir libre y empezar en más de LISTA_ESPERA_ANTICIPACION minutos;
+#   2. se busca la mejor inscripción activa compatible en dos consultas con LIMIT 1 sobre
+#      los índices parciales (por profesional y por especialidad, ordenados por prioridad
+#      y antigüedad): día/horario preferido, vigencia y sin otra cita que se cruce;
+#   3. se agenda con asignar_cita (mismo lock y auditoría que recepción), se marca la
+#      inscripción como asignada y se avisa al paciente por correo.
+# Costo por cancelación: un puñado de consultas indexadas, sin importar el largo de la lista.
+
+
+def _candidatas(slot: Agenda, excluir_paciente_id=None):
+    inicio, fin = timezone.localtime(slot.inicio), timezone.localtime(slot.fin)
+    ocupado = Cita.objects.filter(
+        paciente_id=OuterRef("paciente_id"),
+        agenda__inicio__lt=slot.fin,
+        agenda__fin__gt=slot.inicio,
+    )
+    qs = (ListaEspera.objects
+          .filter(estado=ListaEspera.Estado.ACTIVA)
+          .annotate(dia_ok=F("dias").bitand(1 << inicio.weekday()))
+          .filter(dia_ok__gt=0)
+          .filter(Q(hora_desde__isnull=True) | Q(hora_desde__lte=inicio.time()))
+          .filter(Q(hora_hasta__isnull=True) | Q(hora_hasta__gte=fin.time()))
+          .filter(Q(vigente_hasta__isnull=True) | Q(vigente_hasta__gte=inicio.date()))
+          .exclude(Exists(ocupado))
+          .order_by("-prioridad", "creado_en"))
+    if excluir_paciente_id:
+        qs = qs.exclude(paciente_id=excluir_paciente_id)
+    return qs
+
+
+def mejor_inscripcion(slot: Agenda, excluir_paciente_id=None, bloquear=False):
+    """
+    La inscripción activa que debe recibir el bloque (o None): primero se compara la mejor
+    que pidió a ese profesional con la mejor de "cualquier profesional" de su especialidad.
+    Con bloquear=True se toman con SELECT ... FOR UPDATE SKIP LOCKED (dos cancelaciones
+    simultáneas no eligen a la misma persona).
+    """
+    base = _candidatas(slot, excluir_paciente_id)
+    if bloquear:
+        base = base.select_for_update(skip_locked=True, of=("self",))
+    opciones = [
+        base.filter(profesional_id=slot.profesional_id).first(),
+        base.filter(profesional__isnull=True, especialidad_id=slot.profesional.especialidad_id).first(),
+    ]
+    opciones = [o for o in opciones if o is not None]
+    if not opciones:
+        return None
+    return min(opciones, key=lambda o: (-o.prioridad, o.creado_en))
+
+
+def rellenar_bloque(agenda_id: int, excluir_paciente_id=None, usuario=None) -> Cita | None:
+    """Asigna el bloque liberado a la mejor inscripción de la lista de espera (si hay)."""
+    margen = timezone.now() + timedelta(minutes=settings.LISTA_ESPERA_ANTICIPACION)
+    slot = (Agenda.objects.select_related("profesional")
+            .filter(pk=agenda_id, cita__isnull=True, inicio__gt=margen)
+            .first())
+    if slot is None:
+        return None
+    estado = catalogos.estados.por_nombre(settings.LISTA_ESPERA_ESTADO)
+    if estado is None:
+        logger.warning("Lista de espera: no existe el estado %r", settings.LISTA_ESPERA_ESTADO)
+        return None
+
+    with registro_auditoria():
+        inscripcion = mejor_inscripcion(slot, excluir_paciente_id, bloquear=True)
+        if inscripcion is None:
+            return None
+        try:
+            # asignar_cita abre su propio savepoint: si falla, solo se deshace lo suyo
+            cita = asignar_cita(slot.pk, inscripcion.paciente, estado, usuario,
+                                motivo="Asignada desde lista de espera")
+        except ValidationError:
+            return None          # otro proceso tomó el bloque entremedio
+        ListaEspera.objects.filter(pk=inscripcion.pk).update(
+            estado=ListaEspera.Estado.ASIGNADA, cita=cita, asignada_en=timezone.now()
+        )
+
+    transaction.on_commit(lambda: _avisar(cita), robust=True)
+    return cita
+
+
+def _avisar(cita: Cita):
+    paciente = cita.paciente
+    if not paciente.email:
+        return
+    inicio = timezone.localtime(cita.agenda.inicio)
+    send_mail(
+        subject="Se liberó una hora para usted - MiHora Lampa",
+        message=(
+            f"Hola {paciente.nombre_completo()},\n\n"
+            f"Estaba en lista de espera y le asignamos una hora con {cita.agenda.profesional}\n"
+            f"el {inicio:%d/%m/%Y} a las {inicio:%H:%M}.\n\n"
+            "Si no puede asistir, por favor avise al COSAM para liberarla."
+        ),
+        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+        recipient_list=[paciente.email],
+        fail_silently=True,
+    )
+
+
+# --- disparador (conectado en core/signals.py) ---
+def al_borrar_cita(sender, instance, **kwargs):
+    """post_delete de Cita: el relleno corre tras el commit, fuera de la transacción que cancela."""
+    if not getattr(settings, "LISTA_ESPERA_ACTIVA", True):
+        return
+    agenda_id, paciente_id = instance.agenda_id, instance.paciente_id
+    transaction.on_commit(
+        lambda: rellenar_bloque(agenda_id, excluir_paciente_id=paciente_id),
+        robust=True,
+    )
@@ -0,0 +1,76 @@
+"""
+Utilidades compartidas por los comandos bench_*: datos sintéticos dentro de una
+transacción que siempre se revierte (no deja rastros en la BD).
+"""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Agenda, Cita, Especialidad, EstadoCita, Paciente, Profesional, Ubicacion
+
+
+class _Descartar(Exception):
+    pass
+
+
+@contextmanager
+def transaccion_descartable(using=None):
+    """Ejecuta el bloque en una transacción que se revierte siempre al salir."""
+    try:
+        with transaction.atomic(using=using):
+            yield
+            raise _Descartar
+    except _Descartar:
+        pass
+
+
+@contextmanager
+def cronometro(resultado: dict, clave: str):
+    t0 = time.perf_counter()
+    yield
+    resultado[clave] = time.perf_counter() - t0
+
+
+def crear_datos_sinteticos(n_citas: int, *, n_profesionales: int = 5, dias: int = 1, inicio=None):
+    """
+    Crea profesionales, agendas consecutivas de 30 min y una cita por agenda.
+    Devuelve dict con las instancias base y la lista de citas.
+    """
+    sufijo = timezone.now().strftime("%H%M%S%f")
+    esp = Especialidad.objects.create(nombre=f"Bench {sufijo}")
+    ubic = Ubicacion.objects.create(nombre=f"Box bench {sufijo}")
+    estados = {
+        nombre: EstadoCita.objects.get_or_create(nombre=nombre)[0]
+        for nombre in ("Pendiente", "Confirmada", "Atendida", "Ausente", "Cancelada")
+    }
+    profs = Profesional.objects.bulk_create([
+        Profesional(nombre=f"Prof{i}", apellido=f"Bench{sufijo}", especialidad=esp)
+        for i in range(n_profesionales)
+    ])
+    pacientes = Paciente.objects.bulk_create([
+        Paciente(rut=f"B{sufijo[-6:]}{i}", nombres="Paciente", apellidos=f"Bench {i}")
+        for i in range(n_citas)
+    ])
+
+    inicio = inicio or timezone.now().replace(minute=0, second=0, microsecond=0)
+    por_prof_dia = max(1, n_citas // (n_profesionales * dias))
+    agendas = []
+    for i in range(n_citas):
+        prof = profs[i % n_profesionales]
+        k = i // n_profesionales
+        dia, bloque = divmod(k, por_prof_dia)
+        ini = inicio + timedelta(days=dia, minutes=30 * bloque)
+        agendas.append(Agenda(profesional=prof, ubicacion=ubic, inicio=ini, fin=ini + timedelta(minutes=30)))
+    agendas = Agenda.objects.bulk_create(agendas)
+
+    citas = Cita.objects.bulk_create([
+        Cita(agenda=a, paciente=p, estado=estados["Pendiente"])
+        for a, p in zip(agendas, pacientes)
+    ])
+    return {
+        "especialidad": esp, "ubicacion": ubic, "estados": estados,
+        "profesionales": profs, "pacientes": pacientes, "agendas": agendas, "citas": citas,
+    }
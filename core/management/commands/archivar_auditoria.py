@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.auditoria import archivar_anteriores_a, asegurar_particiones, corte_por_retencion, directorio_archivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Archiva en JSONL comprimido los meses de auditoría de citas más antiguos que la retención "
+        "y crea las particiones de los próximos meses. Ejecutar mensualmente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meses", type=int,
+            default=getattr(settings, "AUDITORIA_RETENCION_MESES", 12),
+            help="Meses completos que se mantienen en la base de datos (además del actual).",
+        )
+        parser.add_argument(
+            "--adelante", type=int, default=3,
+            help="Meses futuros para los que se crean particiones por adelantado.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Solo muestra qué meses se archivarían.")
+
+    def handle(self, *args, **opts):
+        corte = corte_por_retencion(opts["meses"])
+        self.stdout.write(f"Archivando meses anteriores a {corte:%Y-%m} en {directorio_archivo()}")
+
+        for mes, filas in archivar_anteriores_a(corte, dry_run=opts["dry_run"]):
+            if filas is None:
+                self.stdout.write(f"  {mes:%Y-%m}: (dry-run)")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"  {mes:%Y-%m}: {filas} filas archivadas"))
+
+        if not opts["dry_run"]:
+            creadas = asegurar_particiones(meses_adelante=opts["adelante"])
+            for nombre in creadas:
+                self.stdout.write(f"  partición creada: {nombre}")
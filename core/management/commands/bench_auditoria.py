@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.auditoria import registro_auditoria
+from core.citas import cambiar_estado
+
+from ._bench import crear_datos_sinteticos, cronometro, transaccion_descartable
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara los viajes a la BD al cambiar el estado de N citas con un INSERT de auditoría "
+        "por evento versus el registro en lote (registro_auditoria). No deja datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--n", type=int, default=200, help="Cantidad de citas.")
+
+    def _medir(self, citas, estado, en_lote: bool):
+        tiempos = {}
+        with CaptureQueriesContext(connection) as ctx, cronometro(tiempos, "t"):
+            bloque = registro_auditoria() if en_lote else transaction.atomic()
+            with bloque:
+                for c in citas:
+                    cambiar_estado(cita_id=c.pk, nuevo_estado=estado, usuario=None)
+        inserts = sum(1 for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "auditoria_citas"'))
+        return len(ctx.captured_queries), inserts, tiempos["t"]
+
+    def handle(self, *args, **opts):
+        n = opts["n"]
+        with transaccion_descartable():
+            datos = crear_datos_sinteticos(n)
+            estados = datos["estados"]
+            citas = datos["citas"]
+
+            fila = "{:<26}{:>10}{:>14}{:>12}"
+            self.stdout.write(fila.format("modo", "queries", "INSERT audit", "ms"))
+            for nombre, estado, en_lote in (
+                ("INSERT por evento", estados["Confirmada"], False),
+                ("registro_auditoria", estados["Atendida"], True),
+            ):
+                total, inserts, t = self._medir(citas, estado, en_lote)
+                self.stdout.write(fila.format(nombre, total, inserts, f"{t * 1000:.1f}"))
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+
+from core.models import Profesional
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide requests por segundo con y sin conexiones persistentes. Simula el ciclo de un "
+        "request (request_started -> consulta -> request_finished), que es donde Django abre, "
+        "reutiliza o cierra la conexión según CONN_MAX_AGE. Usar contra una BD local, p.ej.: "
+        "DB_HOST=localhost DB_PORT=5432 DB_SSLMODE=disable python manage.py bench_conexiones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests por hilo.")
+        parser.add_argument("--hilos", type=int, default=4, help="Hilos concurrentes (como workers).")
+
+    def _ciclo(self, n):
+        for _ in range(n):
+            request_started.send(sender=self.__class__)
+            try:
+                Profesional.objects.filter(activo=True).count()
+            finally:
+                request_finished.send(sender=self.__class__)
+        connection.close()
+
+    def _medir(self, n, hilos):
+        abiertas = []
+        contar = lambda **kwargs: abiertas.append(1)
+        connection_created.connect(contar, weak=False)
+        try:
+            trabajadores = [threading.Thread(target=self._ciclo, args=(n,)) for _ in range(hilos)]
+            t0 = time.perf_counter()
+            for t in trabajadores:
+                t.start()
+            for t in trabajadores:
+                t.join()
+            t = time.perf_counter() - t0
+        finally:
+            connection_created.disconnect(contar)
+        return n * hilos / t, len(abiertas)
+
+    def handle(self, *args, **opts):
+        n, hilos = opts["requests"], opts["hilos"]
+        ajustes = connections["default"].settings_dict
+        originales = {k: ajustes.get(k) for k in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS")}
+        connection.close()
+
+        modos = [
+            ("sin persistencia", {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False}),
+            ("persistente", {"CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": False}),
+            ("persistente + health", {"CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True}),
+        ]
+        if "pool" in ajustes.get("OPTIONS", {}):
+            # El pool se arma una vez por proceso con la configuración de settings (DB_POOL=1)
+            modos = [("pool psycopg", {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False})]
+
+        self.stdout.write(f"BD: {ajustes['HOST']}:{ajustes['PORT']}  hilos={hilos}  requests/hilo={n}")
+        fila = "{:<24}{:>12}{:>18}"
+        self.stdout.write(fila.format("modo", "req/s", "conexiones nuevas"))
+        try:
+            for nombre, valores in modos:
+                ajustes.update(valores)
+                rps, abiertas = self._medir(n, hilos)
+                self.stdout.write(fila.format(nombre, f"{rps:.0f}", abiertas))
+        finally:
+            ajustes.update(originales)
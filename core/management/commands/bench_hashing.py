@@ -0,0 +1,57 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide logins por segundo (verificación de contraseña) por núcleo y en paralelo, "
+        "para PBKDF2 con distintas iteraciones y Argon2 (si argon2-cffi está instalado)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--n", type=int, default=20, help="Verificaciones por configuración.")
+        parser.add_argument("--hilos", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--iteraciones", type=int, nargs="*", default=[870000, 600000, 390000])
+
+    def _medir(self, n, hilos):
+        encoded = hashers.make_password("Clave-de-prueba-123")
+        hashers.check_password("Clave-de-prueba-123", encoded)  # calentar
+
+        t0 = time.perf_counter()
+        for _ in range(n):
+            hashers.check_password("Clave-de-prueba-123", encoded)
+        serie = time.perf_counter() - t0
+
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            t0 = time.perf_counter()
+            list(pool.map(lambda _: hashers.check_password("Clave-de-prueba-123", encoded), range(n * hilos)))
+            paralelo = time.perf_counter() - t0
+        return serie / n * 1000, n / serie, n * hilos / paralelo
+
+    def handle(self, *args, **opts):
+        n, hilos = opts["n"], opts["hilos"]
+        configs = [
+            (f"pbkdf2 {it}", {"PASSWORD_HASHERS": ["core.hashing.PBKDF2Configurable"], "PBKDF2_ITERACIONES": it})
+            for it in opts["iteraciones"]
+        ]
+        try:
+            import argon2  # noqa: F401
+            configs.append(("argon2id (defecto)", {"PASSWORD_HASHERS": ["core.hashing.Argon2Configurable"]}))
+            configs.append(("argon2id t=1 m=64MiB p=2", {
+                "PASSWORD_HASHERS": ["core.hashing.Argon2Configurable"],
+                "ARGON2_TIME_COST": 1, "ARGON2_MEMORY_COST": 65536, "ARGON2_PARALLELISM": 2,
+            }))
+        except ImportError:
+            self.stdout.write("argon2-cffi no instalado: se omite Argon2.")
+
+        fila = "{:<26}{:>12}{:>16}{:>20}"
+        self.stdout.write(fila.format("hasher", "ms/login", "logins/s/núcleo", f"logins/s ({hilos} hilos)"))
+        for nombre, ajustes in configs:
+            with override_settings(**ajustes):
+                ms, por_nucleo, paralelo = self._medir(n, hilos)
+            self.stdout.write(fila.format(nombre, f"{ms:.1f}", f"{por_nucleo:.1f}", f"{paralelo:.1f}"))
@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.test import RequestFactory
+
+PANELES = [
+    ("admin/kpis.html", "Recepción"),
+    ("admin/recepcion/home.html", "Recepción"),
+    ("admin/recepcion/listado_agendas.html", "Recepción"),
+    ("admin/recepcion/listado_paciente.html", "Recepción"),
+    ("admin/profesional/home.html", "Profesional"),
+    ("admin/profesional/agendas.html", "Profesional"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide por plantilla del panel: compilar sin caché de plantillas, obtenerla del loader "
+        "cacheado y renderizarla (con los fragmentos {% cache %} ya calientes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--n", type=int, default=200, help="Repeticiones por medición.")
+        parser.add_argument("--usuario", help="username para request.user (por defecto el primero).")
+
+    def _ms(self, fn, n):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - t0) / n * 1000
+
+    def handle(self, *args, **opts):
+        n = opts["n"]
+        User = get_user_model()
+        usuario = (User.objects.get(username=opts["usuario"]) if opts["usuario"]
+                   else User.objects.order_by("pk").first())
+
+        backend = engines["django"]
+        engine = backend.engine
+        cargador = engine.template_loaders[0]       # cached.Loader (el de Django por defecto desde 4.1)
+        rf = RequestFactory()
+
+        fila = "{:<40}{:>14}{:>14}{:>16}"
+        self.stdout.write(fila.format("plantilla", "compilar ms", "loader ms", "render ms"))
+        for nombre, rol in PANELES:
+            def compilar():
+                cargador.reset()
+                engine.get_template(nombre)
+
+            compilar_ms = self._ms(compilar, n)
+            engine.get_template(nombre)
+            loader_ms = self._ms(lambda: engine.get_template(nombre), n)
+
+            request = rf.get("/panel/")
+            request.user = usuario
+            request.rol_panel = rol
+            plantilla = backend.get_template(nombre)
+            plantilla.render({}, request)            # llena los fragmentos en caché
+            render_ms = self._ms(lambda: plantilla.render({}, request), n)
+
+            self.stdout.write(fila.format(nombre, f"{compilar_ms:.3f}", f"{loader_ms:.4f}", f"{render_ms:.3f}"))
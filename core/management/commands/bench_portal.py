@@ -0,0 +1,111 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Paciente
+from core.sesiones import motor_para_ruta
+
+
+class Command(BaseCommand):
+    help = (
+        "Generador de carga para el portal de pacientes: N conexiones concurrentes (keep-alive) "
+        "pidiendo una URL durante X segundos; reporta req/s, latencias y errores. Levantar el "
+        "servidor aparte y comparar, p.ej.:\n"
+        "  ASGI: uvicorn MiHora_Lampa.asgi:application --port 8001 --workers 2\n"
+        "  WSGI: gunicorn MiHora_Lampa.wsgi:application --bind :8002 --workers 2 --threads 4\n"
+        "  python manage.py bench_portal --base http://127.0.0.1:8001 --concurrencia 10 50 200"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base", default="http://127.0.0.1:8000")
+        parser.add_argument("--ruta", default="/paciente/mis-citas/")
+        parser.add_argument("--concurrencia", type=int, nargs="+", default=[10, 50, 100])
+        parser.add_argument("--duracion", type=float, default=10.0, help="Segundos por nivel.")
+        parser.add_argument("--paciente", type=int, help="id de paciente (por defecto el primero activo).")
+
+    def _cookie_sesion(self, ruta, paciente_id):
+        # Sesión real en el motor y cookie que el servidor usa para esa ruta (misma BD/caché)
+        store_cls, cookie = motor_para_ruta(ruta)
+        store = store_cls()
+        store["paciente_id"] = paciente_id
+        store.save()
+        return f"{cookie}={store.session_key}"
+
+    async def _cliente(self, host, port, peticion, hasta, latencias, errores):
+        reader = writer = None
+        while time.perf_counter() < hasta:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                t0 = time.perf_counter()
+                writer.write(peticion)
+                await writer.drain()
+                cabecera = await reader.readuntil(b"\r\n\r\n")
+                estado = int(cabecera.split(b" ", 2)[1])
+                largo = 0
+                cerrar = False
+                for linea in cabecera.split(b"\r\n")[1:]:
+                    nombre, _, valor = linea.partition(b":")
+                    if nombre.lower() == b"content-length":
+                        largo = int(valor)
+                    elif nombre.lower() == b"connection" and valor.strip().lower() == b"close":
+                        cerrar = True
+                await reader.readexactly(largo)
+                latencias.append(time.perf_counter() - t0)
+                if estado >= 400:
+                    errores.append(estado)
+                if cerrar:
+                    writer.close()
+                    writer = None
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                errores.append(type(e).__name__)
+                if writer is not None:
+                    writer.close()
+                writer = None
+                await asyncio.sleep(0.05)
+        if writer is not None:
+            writer.close()
+
+    async def _nivel(self, host, port, peticion, n, duracion):
+        latencias, errores = [], []
+        hasta = time.perf_counter() + duracion
+        await asyncio.gather(*[
+            self._cliente(host, port, peticion, hasta, latencias, errores) for _ in range(n)
+        ])
+        return latencias, errores
+
+    def handle(self, *args, **opts):
+        url = urlsplit(opts["base"])
+        host, port = url.hostname, url.port or 80
+        paciente = (Paciente.objects.filter(pk=opts["paciente"]) if opts["paciente"]
+                    else Paciente.objects.filter(is_active=True, debe_cambiar_password=False)).first()
+        if paciente is None:
+            raise CommandError("No hay un paciente activo (sin cambio de clave pendiente) para la sesión.")
+
+        peticion = (
+            f"GET {opts['ruta']} HTTP/1.1\r\n"
+            f"Host: {url.netloc}\r\n"
+            f"Cookie: {self._cookie_sesion(opts['ruta'], paciente.pk)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode()
+
+        fila = "{:>12}{:>10}{:>10}{:>10}{:>10}{:>10}"
+        self.stdout.write(f"{opts['base']}{opts['ruta']}  ({opts['duracion']:.0f}s por nivel)")
+        self.stdout.write(fila.format("conexiones", "req/s", "p50 ms", "p95 ms", "max ms", "errores"))
+        for n in opts["concurrencia"]:
+            latencias, errores = asyncio.run(self._nivel(host, port, peticion, n, opts["duracion"]))
+            if not latencias:
+                self.stdout.write(fila.format(n, 0, "-", "-", "-", len(errores)))
+                continue
+            ms = sorted(x * 1000 for x in latencias)
+            self.stdout.write(fila.format(
+                n,
+                f"{len(ms) / opts['duracion']:.0f}",
+                f"{statistics.median(ms):.0f}",
+                f"{ms[int(len(ms) * 0.95) - 1]:.0f}",
+                f"{ms[-1]:.0f}",
+                len(errores),
+            ))
@@ -0,0 +1,83 @@
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core import proyecciones
+from core.models import Agenda, Cita
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el listado de agendas de recepción armado con instancias de modelo "
+        "(select_related + prefetch de Cita/Paciente/EstadoCita) contra la proyección liviana "
+        "(values_list + filas con __slots__): tiempo, memoria pico y consultas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="yyyy-mm-dd (por defecto hoy).")
+        parser.add_argument("--dias", type=int, default=7, help="Días del rango a listar.")
+        parser.add_argument("--repeticiones", type=int, default=3)
+
+    def _con_modelos(self, desde, hasta):
+        ini, fin = proyecciones._limites(desde, hasta)
+        qs = (Agenda.objects
+              .filter(inicio__gte=ini, inicio__lt=fin)
+              .select_related("profesional", "ubicacion", "profesional__especialidad")
+              .order_by("inicio", "profesional__apellido", "profesional__nombre")
+              .prefetch_related(Prefetch("citas", queryset=Cita.objects.select_related("paciente", "estado"))))
+        agendas = list(qs)
+        # Lo que imprimía la plantilla por fila
+        for a in agendas:
+            (a.inicio, a.fin, a.profesional.nombre, a.profesional.apellido,
+             a.profesional.especialidad.nombre, a.get_modalidad_display(), a.ubicacion.nombre)
+            for cita in a.citas.all():
+                cita.id, cita.estado.nombre, cita.paciente.nombre_completo()
+        return agendas
+
+    def _con_proyeccion(self, desde, hasta):
+        filas = proyecciones.bloques_recepcion(desde, hasta)
+        for f in filas:
+            f.inicio, f.fin, f.profesional, f.especialidad, f.modalidad_display, f.ubicacion
+            if f.cita_id:
+                f.cita_id, f.estado, f.paciente
+        return filas
+
+    def _medir(self, fn, desde, hasta, repeticiones):
+        fn(desde, hasta)  # calentar (conexión, caché de consultas de PostgreSQL)
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            fn(desde, hasta)
+            tiempos.append(time.perf_counter() - t0)
+
+        with CaptureQueriesContext(connection) as ctx:
+            tracemalloc.start()
+            filas = fn(desde, hasta)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return len(filas), min(tiempos) * 1000, pico / 1024, len(ctx.captured_queries)
+
+    def handle(self, *args, **opts):
+        desde = parse_date(opts["desde"] or "") or timezone.localdate()
+        hasta = desde + timedelta(days=opts["dias"])
+        self.stdout.write(f"Agendas entre {desde} y {hasta - timedelta(days=1)}")
+
+        fila = "{:<22}{:>10}{:>12}{:>14}{:>11}"
+        self.stdout.write(fila.format("variante", "filas", "ms (mejor)", "pico KiB", "consultas"))
+        resultados = {}
+        for nombre, fn in (("modelos + prefetch", self._con_modelos),
+                           ("proyección", self._con_proyeccion)):
+            n, ms, kib, consultas = self._medir(fn, desde, hasta, opts["repeticiones"])
+            resultados[nombre] = (ms, kib)
+            self.stdout.write(fila.format(nombre, n, f"{ms:.1f}", f"{kib:.0f}", consultas))
+
+        (ms_m, kib_m), (ms_p, kib_p) = resultados.values()
+        if ms_p and kib_p:
+            self.stdout.write(f"Proyección: {ms_m / ms_p:.1f}x más rápida, {kib_m / kib_p:.1f}x menos memoria.")
@@ -0,0 +1,70 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.middleware import SesionPorRutaMiddleware
+from core.sesiones import motor_para_ruta
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el costo por request de la sesión del portal de pacientes (SesionPorRutaMiddleware) "
+        "con distintos motores: consultas a la BD y microsegundos por request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--n", type=int, default=500, help="Requests simulados por motor.")
+        parser.add_argument("--escrituras", type=int, default=10,
+                            help="Cada cuántos requests se modifica la sesión (0 = nunca).")
+        parser.add_argument("--ruta", default="/paciente/mis-citas/")
+
+    def _vista(self, escribir_cada):
+        contador = {"n": 0}
+
+        def vista(request):
+            contador["n"] += 1
+            request.session.get("paciente_id")
+            if escribir_cada and contador["n"] % escribir_cada == 0:
+                request.session["ultima_visita"] = time.time()
+            return HttpResponse("ok")
+        return vista
+
+    def handle(self, *args, **opts):
+        n, ruta = opts["n"], opts["ruta"]
+        motores = [
+            ("db", "django.contrib.sessions.backends.db"),
+            ("cached_db", "django.contrib.sessions.backends.cached_db"),
+            ("cookie firmada", "core.sesiones"),
+        ]
+        rf = RequestFactory()
+        fila = "{:<18}{:>14}{:>14}{:>12}"
+        self.stdout.write(fila.format("motor", "consultas/req", "µs/req", "cookie (B)"))
+        for nombre, engine in motores:
+            with override_settings(SESION_PACIENTES_ENGINE=engine):
+                store_cls, cookie = motor_para_ruta(ruta)
+                store = store_cls()
+                store["paciente_id"] = 1
+                store.save()
+                valor = store.session_key
+                middleware = SesionPorRutaMiddleware(self._vista(opts["escrituras"]))
+                cache.clear()
+
+                with CaptureQueriesContext(connection) as ctx:
+                    t0 = time.perf_counter()
+                    for _ in range(n):
+                        request = rf.get(ruta)
+                        request.COOKIES[cookie] = valor
+                        response = middleware(request)
+                        if cookie in response.cookies:
+                            valor = response.cookies[cookie].value
+                    t = time.perf_counter() - t0
+                store_cls(valor).delete()
+
+            self.stdout.write(fila.format(
+                nombre, f"{len(ctx.captured_queries) / n:.2f}", f"{t / n * 1e6:.0f}", len(valor)
+            ))
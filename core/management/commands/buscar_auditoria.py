@@ -0,0 +1,42 @@
+import json
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.auditoria import buscar_auditoria
+
+
+def _fecha(valor, opcion):
+    if not valor:
+        return None
+    d = parse_date(valor)
+    if d is None:
+        raise CommandError(f"{opcion}: fecha inválida (use YYYY-MM-DD).")
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+class Command(BaseCommand):
+    help = "Busca en el historial de auditoría de citas (BD + meses archivados). Imprime JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cita", type=int)
+        parser.add_argument("--usuario", type=int)
+        parser.add_argument("--accion")
+        parser.add_argument("--desde", help="YYYY-MM-DD (incluido)")
+        parser.add_argument("--hasta", help="YYYY-MM-DD (excluido)")
+        parser.add_argument("--solo-bd", action="store_true", help="No leer los archivos comprimidos.")
+
+    def handle(self, *args, **opts):
+        registros = buscar_auditoria(
+            cita_id=opts["cita"],
+            usuario_id=opts["usuario"],
+            accion=opts["accion"],
+            desde=_fecha(opts["desde"], "--desde"),
+            hasta=_fecha(opts["hasta"], "--hasta"),
+            incluir_archivo=not opts["solo_bd"],
+        )
+        for r in registros:
+            self.stdout.write(json.dumps(r, cls=DjangoJSONEncoder, ensure_ascii=False))
@@ -0,0 +1,135 @@
+import csv
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.models import ExcepcionAgenda
+
+# Feriados de fecha fija (mes, día, motivo)
+FIJOS = [
+    (1, 1, "Año Nuevo"),
+    (5, 1, "Día Nacional del Trabajo"),
+    (5, 21, "Día de las Glorias Navales"),
+    (7, 16, "Día de la Virgen del Carmen"),
+    (8, 15, "Asunción de la Virgen"),
+    (9, 18, "Independencia Nacional"),
+    (9, 19, "Día de las Glorias del Ejército"),
+    (11, 1, "Día de Todas las Iglesias"),
+    (12, 8, "Inmaculada Concepción"),
+    (12, 25, "Navidad"),
+]
+
+
+def _pascua(anio: int) -> date:
+    """Domingo de Pascua (algoritmo anónimo gregoriano)."""
+    a, b, c = anio % 19, anio // 100, anio % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    dia = (h + l - 7 * m + 114) % 31 + 1
+    return date(anio, mes, dia)
+
+
+def _trasladable(d: date) -> date:
+    """Ley 19.668: martes a jueves -> lunes de esa semana; viernes -> lunes siguiente."""
+    wd = d.weekday()
+    if wd in (1, 2, 3):
+        return d - timedelta(days=wd)
+    if wd == 4:
+        return d + timedelta(days=3)
+    return d
+
+
+def _iglesias_evangelicas(anio: int) -> date:
+    """Ley 20.299: 31 de octubre; si cae martes pasa al viernes anterior, si cae miércoles al siguiente."""
+    d = date(anio, 10, 31)
+    if d.weekday() == 1:
+        return d - timedelta(days=4)
+    if d.weekday() == 2:
+        return d + timedelta(days=2)
+    return d
+
+
+def feriados_del_anio(anio: int) -> list[tuple[date, str]]:
+    """Feriados nacionales calculables; los de decreto (p.ej. Pueblos Indígenas) van por --archivo."""
+    pascua = _pascua(anio)
+    feriados = [(date(anio, m, d), motivo) for m, d, motivo in FIJOS]
+    feriados += [
+        (pascua - timedelta(days=2), "Viernes Santo"),
+        (pascua - timedelta(days=1), "Sábado Santo"),
+        (_trasladable(date(anio, 6, 29)), "San Pedro y San Pablo"),
+        (_trasladable(date(anio, 10, 12)), "Encuentro de Dos Mundos"),
+        (_iglesias_evangelicas(anio), "Día de las Iglesias Evangélicas y Protestantes"),
+    ]
+    return sorted(feriados)
+
+
+def _leer_archivo(ruta: str) -> list[tuple[date, str]]:
+    """CSV con columnas fecha (yyyy-mm-dd) y motivo; las líneas vacías o con # se ignoran."""
+    feriados = []
+    with open(ruta, encoding="utf-8") as fh:
+        for n, fila in enumerate(csv.reader(fh), start=1):
+            if not fila or not fila[0].strip() or fila[0].startswith("#"):
+                continue
+            fecha = parse_date(fila[0].strip())
+            if fecha is None:
+                if n == 1:
+                    continue          # encabezado
+                raise CommandError(f"{ruta}:{n}: fecha inválida {fila[0]!r}")
+            motivo = fila[1].strip() if len(fila) > 1 else "Feriado"
+            feriados.append((fecha, motivo))
+    return feriados
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga los feriados nacionales del año como excepciones de agenda de todo el COSAM "
+        "(día local completo). Es idempotente: los ya cargados se omiten. Al crearse, cada "
+        "feriado borra los slots libres de ese día. P.ej.: python manage.py cargar_feriados --anio 2026"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--anio", type=int, action="append",
+                            help="Año a cargar (repetible). Por defecto el actual y el siguiente.")
+        parser.add_argument("--archivo", help="CSV adicional fecha,motivo (feriados por decreto).")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        hoy = timezone.localdate()
+        anios = opts["anio"] or [hoy.year, hoy.year + 1]
+        feriados = [f for anio in anios for f in feriados_del_anio(anio)]
+        if opts["archivo"]:
+            feriados += _leer_archivo(opts["archivo"])
+
+        feriados = sorted(set(feriados))
+
+        tz = timezone.get_current_timezone()
+        creados = 0
+        with transaction.atomic():
+            for fecha, motivo in feriados:
+                inicio = timezone.make_aware(datetime.combine(fecha, time.min), tz)
+                fin = timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min), tz)
+                if opts["dry_run"]:
+                    self.stdout.write(f"{fecha:%d/%m/%Y}  {motivo}")
+                    continue
+                _, creado = ExcepcionAgenda.objects.get_or_create(
+                    tipo=ExcepcionAgenda.Tipo.FERIADO,
+                    inicio=inicio,
+                    profesional=None,
+                    ubicacion=None,
+                    defaults={"fin": fin, "motivo": motivo},
+                )
+                creados += creado
+
+        if not opts["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"{creados} feriados nuevos ({len(feriados) - creados} ya existían)."
+            ))
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.citas import cambiar_estado_en_lote
+from core.models import Cita, EstadoCita
+
+
+class Command(BaseCommand):
+    help = (
+        "Cierre automático: lleva a --destino (por defecto 'Ausente') las citas que siguen en "
+        "--origen (por defecto 'Pendiente') cuando su bloque terminó hace más de --margen-horas. "
+        "Pensado para correr al final del día (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--origen", default="Pendiente", help="Estado que se considera sin cerrar.")
+        parser.add_argument("--destino", default="Ausente", help="Estado que se asigna.")
+        parser.add_argument("--margen-horas", type=int, default=2,
+                            help="Horas desde el fin del bloque antes de cerrarlo.")
+        parser.add_argument("--dias", type=int, default=7,
+                            help="Solo revisa bloques de los últimos N días.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        try:
+            origen = EstadoCita.objects.get(nombre__iexact=opts["origen"])
+            destino = EstadoCita.objects.get(nombre__iexact=opts["destino"])
+        except EstadoCita.DoesNotExist as e:
+            raise CommandError(f"Estado no encontrado: {e}")
+
+        limite = timezone.now() - timedelta(hours=opts["margen_horas"])
+        ids = list(
+            Cita.objects
+            .filter(
+                estado=origen,
+                agenda__fin__lte=limite,
+                agenda__fin__gte=limite - timedelta(days=opts["dias"]),
+            )
+            .values_list("pk", flat=True)
+        )
+
+        if opts["dry_run"]:
+            self.stdout.write(f"{len(ids)} citas en '{origen.nombre}' pasarían a '{destino.nombre}'.")
+            return
+
+        n = cambiar_estado_en_lote(ids, destino, usuario=None)
+        self.stdout.write(self.style.SUCCESS(
+            f"{n} citas pasaron de '{origen.nombre}' a '{destino.nombre}'."
+        ))
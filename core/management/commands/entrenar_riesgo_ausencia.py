@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core import riesgo
+from core.proyecciones import _limites
+
+
+class Command(BaseCommand):
+    help = (
+        "Entrena el modelo de riesgo de ausencia (regresión logística en NumPy) con las citas "
+        "pasadas Atendida/Ausente y puntúa las próximas RIESGO_DIAS_ADELANTE días. "
+        "Pensado para correr semanalmente (cron), p.ej.: 0 4 * * 1 python manage.py entrenar_riesgo_ausencia"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hasta", help="yyyy-mm-dd: entrena solo con citas anteriores (por defecto ahora).")
+        parser.add_argument("--validacion", type=float, default=0.2,
+                            help="Fracción más reciente del historial usada para validar.")
+        parser.add_argument("--sin-puntuar", action="store_true", help="No puntuar las próximas citas.")
+
+    def handle(self, *args, **opts):
+        if not riesgo.disponible():
+            raise CommandError("Falta numpy (pip install numpy).")
+        hasta = None
+        if opts["hasta"]:
+            fecha = parse_date(opts["hasta"])
+            if fecha is None:
+                raise CommandError("--hasta debe ser yyyy-mm-dd.")
+            hasta = _limites(fecha, fecha)[0]
+
+        try:
+            modelo = riesgo.entrenar(hasta=hasta, validacion=opts["validacion"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        m = modelo.metricas
+        self.stdout.write(self.style.SUCCESS(
+            f"Modelo {modelo.pk}: {modelo.muestras} citas, tasa de ausencia {m['tasa_ausencia']:.1%}"
+            + (f", AUC validación {m['auc']:.3f}, log-loss {m['log_loss']:.3f}" if m.get("auc") else "")
+        ))
+        pesos = sorted(zip(riesgo.VARIABLES, modelo.parametros["pesos"]), key=lambda v: -abs(v[1]))
+        for nombre, peso in pesos[:6]:
+            self.stdout.write(f"  {nombre:<24}{peso:+.3f}")
+
+        if not opts["sin_puntuar"]:
+            n = riesgo.puntuar_proximas(settings.RIESGO_DIAS_ADELANTE, desde=timezone.now())
+            self.stdout.write(f"{n} citas próximas puntuadas.")
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageOps
+
+from core.estaticos import CARPETA_VARIANTES, INDICE_VARIANTES, nombre_variante
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera variantes redimensionadas (WebP + formato original optimizado) de las imágenes "
+        "de core/static/core/img y el índice que usa {% imagen_responsive %}. Correr antes de "
+        "collectstatic en cada deploy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--anchos", type=int, nargs="+", default=list(settings.IMAGENES_ANCHOS))
+        parser.add_argument("--calidad", type=int, default=80, help="Calidad WebP/JPEG (1-100).")
+        parser.add_argument("--min-kb", type=int, default=32,
+                            help="Ignora imágenes más chicas que esto (logos, íconos).")
+
+    def handle(self, *args, **opts):
+        static_dir = Path(apps.get_app_config("core").path) / "static"
+        carpeta = static_dir / "core" / "img"
+        destino = carpeta / CARPETA_VARIANTES
+        destino.mkdir(exist_ok=True)
+
+        indice = {}
+        antes = despues = 0
+        for origen in sorted(carpeta.iterdir()):
+            if origen.suffix.lower() not in (".jpg", ".jpeg", ".png") or origen.stat().st_size < opts["min_kb"] * 1024:
+                continue
+            ruta = origen.relative_to(static_dir).as_posix()
+            with Image.open(origen) as im:
+                im = ImageOps.exif_transpose(im)
+                con_alfa = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+                im = im.convert("RGBA" if con_alfa else "RGB")
+                respaldo = "png" if con_alfa else "jpg"
+
+                # Anchos pedidos menores al original + el ancho original (nunca se agranda)
+                anchos = sorted({a for a in opts["anchos"] if a < im.width} | {im.width})
+                variantes = []
+                for ancho in anchos:
+                    alto = round(im.height * ancho / im.width)
+                    copia = im if ancho == im.width else im.resize((ancho, alto), Image.LANCZOS)
+                    for ext in ("webp", respaldo):
+                        salida = static_dir / nombre_variante(ruta, ancho, ext)
+                        if ext == "webp":
+                            copia.save(salida, "WEBP", quality=opts["calidad"], method=6)
+                        elif ext == "jpg":
+                            copia.save(salida, "JPEG", quality=opts["calidad"], optimize=True, progressive=True)
+                        else:
+                            copia.save(salida, "PNG", optimize=True)
+                        variantes.append([ancho, ext])
+                        if ancho == im.width:
+                            despues += salida.stat().st_size if ext == "webp" else 0
+
+            antes += origen.stat().st_size
+            indice[ruta] = variantes
+            self.stdout.write(f"{ruta}: {', '.join(f'{a}.{e}' for a, e in variantes)}")
+
+        (static_dir / INDICE_VARIANTES).write_text(json.dumps(indice, indent=1, sort_keys=True), encoding="utf-8")
+        if antes:
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(indice)} imágenes: {antes / 1024:.0f} KiB originales -> "
+                f"{despues / 1024:.0f} KiB en WebP a tamaño completo."
+            ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.cache_aside import metricas_compartidas, tasa_aciertos
+
+
+class Command(BaseCommand):
+    help = "Muestra hits/misses acumulados (todos los workers) de las claves cache-aside por prefijo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("prefijos", nargs="*", default=["directorio", "kpis"])
+
+    def handle(self, *args, **opts):
+        datos = metricas_compartidas(opts["prefijos"])
+        fila = "{:<14}{:>8}{:>8}{:>10}{:>8}{:>9}"
+        self.stdout.write(fila.format("prefijo", "hit", "miss", "refresco", "espera", "% hit"))
+        for p in opts["prefijos"]:
+            hit, miss = datos[f"{p}:hit"], datos[f"{p}:miss"]
+            self.stdout.write(fila.format(
+                p, hit, miss, datos[f"{p}:refresco"], datos[f"{p}:espera"], tasa_aciertos(hit, miss)
+            ))
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import sobrecupo
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula cuántos sobrecupos conviene permitir por franja (profesional, hora) según la "
+        "ausencia histórica y reporta la utilización esperada. Con --aplicar deja el resultado "
+        "en los bloques de los próximos días. P.ej. cada lunes: "
+        "0 6 * * 1 python manage.py politica_sobrecupo --aplicar"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--semanas", type=int, default=26, help="Historial a considerar.")
+        parser.add_argument("--dias", type=int, default=14, help="Bloques futuros a los que se aplica.")
+        parser.add_argument("--profesional", type=int, help="Solo este profesional (id).")
+        parser.add_argument("--aplicar", action="store_true", help="Actualiza Agenda.sobrecupo_max.")
+
+    def handle(self, *args, **opts):
+        filas = sobrecupo.politica(opts["semanas"], opts["dias"], opts["profesional"])
+        if not filas:
+            self.stdout.write("No hay bloques en el período.")
+            return
+
+        self.stdout.write(f"{'Profesional':<28} {'Hora':>4} {'Citas':>6} {'Ausencia':>9} {'Extra':>5} "
+                          f"{'Uso actual':>10} {'Con sobrecupo':>13} {'Desborde':>8} {'Bloques':>7}")
+        for f in filas:
+            self.stdout.write(
+                f"{str(f.profesional)[:28]:<28} {f.hora:>4} {f.citas:>6} {f.tasa:>9.1%} {f.extra:>5} "
+                f"{f.utilizacion_actual:>10.1%} {f.utilizacion:>13.1%} {f.desborde:>8.2f} {f.bloques:>7}"
+            )
+
+        bloques = sum(f.bloques for f in filas)
+        actual = sum(f.utilizacion_actual * f.bloques for f in filas)
+        ganancia = sum(f.atenciones_extra for f in filas)
+        desbordes = sum(f.desborde * f.bloques for f in filas)
+        con_extra = sum(f.bloques for f in filas if f.extra)
+        self.stdout.write(self.style.SUCCESS(
+            f"Utilización esperada: {actual / bloques:.1%} -> {(actual + ganancia) / bloques:.1%} "
+            f"(+{ganancia:.0f} atenciones en {bloques} bloques, {con_extra} con sobrecupo; "
+            f"{desbordes:.0f} pacientes esperarían de más). "
+            f"Costo de desborde: {settings.SOBRECUPO_COSTO_DESBORDE}, máx. {settings.SOBRECUPO_MAX_POR_BLOQUE} por bloque."
+        ))
+
+        if opts["aplicar"]:
+            n = sobrecupo.aplicar(filas, opts["dias"])
+            self.stdout.write(self.style.SUCCESS(f"{n} bloques quedaron con sobrecupo."))
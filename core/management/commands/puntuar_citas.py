@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import riesgo
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el puntaje de riesgo de ausencia de las citas abiertas de los próximos días "
+        "(toma en cuenta los contactos registrados desde la última vez). "
+        "P.ej. cada hora: 0 * * * * python manage.py puntuar_citas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=settings.RIESGO_DIAS_ADELANTE)
+
+    def handle(self, *args, **opts):
+        if not riesgo.disponible():
+            raise CommandError("Falta numpy (pip install numpy).")
+        if riesgo.modelo_vigente()[0] is None:
+            raise CommandError("No hay modelo entrenado: python manage.py entrenar_riesgo_ausencia")
+        t0 = time.perf_counter()
+        n = riesgo.puntuar_proximas(opts["dias"], desde=timezone.now())
+        self.stdout.write(self.style.SUCCESS(
+            f"{n} citas puntuadas en {(time.perf_counter() - t0) * 1000:.0f} ms."
+        ))
@@ -0,0 +1,44 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import PacienteResetToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra en lotes los tokens de recuperación de contraseña vencidos o ya usados "
+        "(con --gracia-horas de margen, para poder revisar un uso reciente). "
+        "Pensado para correr a diario (cron), p.ej.: 30 3 * * * python manage.py purgar_tokens_reset"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--gracia-horas", type=int, default=24,
+                            help="Solo borra tokens vencidos/usados hace más de N horas.")
+        parser.add_argument("--lote", type=int, default=1000, help="Filas por DELETE.")
+        parser.add_argument("--pausa", type=float, default=0.0,
+                            help="Segundos de pausa entre lotes (para no cargar la BD).")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        corte = timezone.now() - timedelta(hours=opts["gracia_horas"])
+        candidatos = PacienteResetToken.objects.filter(Q(expires_at__lt=corte) | Q(used_at__lt=corte))
+
+        if opts["dry_run"]:
+            self.stdout.write(f"{candidatos.count()} tokens se borrarían.")
+            return
+
+        total = 0
+        while True:
+            ids = list(candidatos.order_by("pk").values_list("pk", flat=True)[:opts["lote"]])
+            if not ids:
+                break
+            borrados, _ = PacienteResetToken.objects.filter(pk__in=ids).delete()
+            total += borrados
+            if opts["pausa"]:
+                time.sleep(opts["pausa"])
+
+        self.stdout.write(self.style.SUCCESS(f"{total} tokens borrados."))
@@ -0,0 +1,35 @@
+import urllib.request
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from core.estaticos import VENDOR
+
+
+class Command(BaseCommand):
+    help = (
+        "Descarga las librerías de terceros (core.estaticos.VENDOR, versiones fijas) a "
+        "core/static para servirlas con hash y caché larga en vez de pedirlas al CDN."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("nombres", nargs="*", help="Por defecto todas.")
+        parser.add_argument("--timeout", type=int, default=30)
+
+    def handle(self, *args, **opts):
+        static_dir = Path(apps.get_app_config("core").path) / "static"
+        nombres = opts["nombres"] or list(VENDOR)
+        for nombre in nombres:
+            if nombre not in VENDOR:
+                raise CommandError(f"'{nombre}' no está en VENDOR ({', '.join(VENDOR)}).")
+            ruta, origen = VENDOR[nombre]
+            try:
+                with urllib.request.urlopen(origen, timeout=opts["timeout"]) as resp:
+                    contenido = resp.read()
+            except OSError as e:
+                raise CommandError(f"No se pudo descargar {origen}: {e}")
+            destino = static_dir / ruta
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            destino.write_bytes(contenido)
+            self.stdout.write(f"{nombre}: {origen} -> {ruta} ({len(contenido) / 1024:.0f} KiB)")
@@ -1,40 +1,139 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+import time
+from django.conf import settings
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.exceptions import SessionInterrupted
+from django.contrib.sessions.middleware import SessionMiddleware
 from django.shortcuts import redirect
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
 from django.urls import reverse
+from django.utils.decorators import sync_and_async_middleware
 from core.models import Paciente, Profesional, PlantillaAtencion
 from core.utils import user_has_role
+from core.db_router import amarcar_escritura, marcar_escritura, replica_disponible
+from core.sesiones import motor_para_ruta
+
+# Los middlewares propios son híbridos (sync + async): bajo ASGI las vistas async del
+# portal de pacientes no pagan un salto a hilo por cada middleware.
+
+class SesionPorRutaMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware que elige motor y cookie según la ruta (ver core/sesiones.py):
+    el portal de pacientes no toca la BD para la sesión; el personal usa cached_db.
+    """
+
+    def process_request(self, request):
+        store, cookie = motor_para_ruta(request.path)
+        request._cookie_sesion = cookie
+        request.session = store(request.COOKIES.get(cookie))
+
+    def process_response(self, request, response):
+        # Igual que SessionMiddleware.process_response, pero con la cookie de la zona
+        cookie = getattr(request, "_cookie_sesion", settings.SESSION_COOKIE_NAME)
+        try:
+            accessed = request.session.accessed
+            modified = request.session.modified
+            empty = request.session.is_empty()
+        except AttributeError:
+            return response
+
+        if cookie in request.COOKIES and empty:
+            response.delete_cookie(
+                cookie,
+                path=settings.SESSION_COOKIE_PATH,
+                domain=settings.SESSION_COOKIE_DOMAIN,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+            )
+            patch_vary_headers(response, ("Cookie",))
+            return response
+
+        if accessed:
+            patch_vary_headers(response, ("Cookie",))
+        if (modified or settings.SESSION_SAVE_EVERY_REQUEST) and not empty and response.status_code < 500:
+            if request.session.get_expire_at_browser_close():
+                max_age = expires = None
+            else:
+                max_age = request.session.get_expiry_age()
+                expires = http_date(time.time() + max_age)
+            try:
+                request.session.save()
+            except UpdateError:
+                raise SessionInterrupted(
+                    "La sesión se eliminó antes de terminar el request "
+                    "(p.ej. cierre de sesión en otra pestaña)."
+                )
+            response.set_cookie(
+                cookie,
+                request.session.session_key,
+                max_age=max_age,
+                expires=expires,
+                domain=settings.SESSION_COOKIE_DOMAIN,
+                path=settings.SESSION_COOKIE_PATH,
+                secure=settings.SESSION_COOKIE_SECURE or None,
+                httponly=settings.SESSION_COOKIE_HTTPONLY or None,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+            )
+        return response
+
 
 class PacienteForcePasswordChangeMiddleware:
     """
     Si el paciente tiene 'debe_cambiar_password=True', lo obliga a ir a cambiar la contraseña
     antes de acceder a cualquier página del portal de pacientes (excepto la propia página de cambio, login y logout).
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
-    def __call__(self, request):
-        pid = request.session.get("paciente_id")
-        path = request.path
-
+    def _excluidas(self):
         # Rutas excluidas para evitar bucle
         try:
-            cambio_url = reverse("cambiar_password")
-            login_url  = reverse("login_paciente")
-            logout_url = reverse("logout_paciente")
+            return reverse("cambiar_password"), reverse("login_paciente"), reverse("logout_paciente")
         except Exception:
             # Durante el arranque de servidor/colección de URLs
+            return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        pid = request.session.get("paciente_id")
+        excluidas = self._excluidas()
+        if excluidas is None:
             return self.get_response(request)
 
-        if pid and path not in (cambio_url, login_url, logout_url):
+        if pid and request.path not in excluidas:
             try:
                 p = Paciente.objects.get(pk=pid, is_active=True)
                 if p.debe_cambiar_password:
                     # Redirige siempre a cambiar password si debe hacerlo
-                    return redirect(cambio_url)
+                    return redirect(excluidas[0])
             except Paciente.DoesNotExist:
                 request.session.pop("paciente_id", None)
 
         return self.get_response(request)
 
+    async def __acall__(self, request):
+        pid = await request.session.aget("paciente_id")
+        excluidas = self._excluidas()
+        if excluidas is None:
+            return await self.get_response(request)
+
+        if pid and request.path not in excluidas:
+            debe = await (Paciente.objects.filter(pk=pid, is_active=True)
+                          .values_list("debe_cambiar_password", flat=True).afirst())
+            if debe is None:
+                await request.session.apop("paciente_id", None)
+            elif debe:
+                return redirect(excluidas[0])
+
+        return await self.get_response(request)
+
 EXEMPT_PATH_PREFIXES = (
     "/admin", "/static", "/media",
     "/ingreso", "/salir", "/cuenta", "/cambiar-password",
@@ -42,41 +141,93 @@ EXEMPT_PATH_PREFIXES = (
     "/panel/recepcion",  # recepción no debe ser forzada al setup
 )
 
-def ensure_prof_setup_middleware(get_response):
-    def middleware(request):
-        user = getattr(request, "user", None)
-        path = request.path
+def _redireccion_setup_profesional(request):
+    """Redirect al setup si es un profesional sin plantillas activas; None en otro caso."""
+    user = getattr(request, "user", None)
 
-        # 1) Excepciones por prefijo (admin, estáticos, recepción, etc.)
-        if any(path.startswith(p) for p in EXEMPT_PATH_PREFIXES):
-            return get_response(request)
+    # 2) URL del setup (por name, con fallback correcto)
+    try:
+        setup_url = reverse("pro_setup_horario")  # -> /panel/profesional/disponibilidad/
+    except Exception:
+        setup_url = "/panel/profesional/disponibilidad/"
 
-        # 2) URL del setup (por name, con fallback correcto)
+    # 3) Evitar loop (GET o POST del propio setup)
+    if request.path.startswith(setup_url):
+        return None
+
+    # 4) Solo si está autenticado y ES profesional
+    if user and user.is_authenticated:
+        # Opcional: salir rápido si NO tiene rol Profesional
+        if not user_has_role(user, "Profesional"):
+            return None
+
+        # 5) Tiene perfil de profesional activo?
         try:
-            setup_url = reverse("pro_setup_horario")  # -> /panel/profesional/disponibilidad/
-        except Exception:
-            setup_url = "/panel/profesional/disponibilidad/"
+            prof = Profesional.objects.get(usuario=user, activo=True)
+        except Profesional.DoesNotExist:
+            return None
 
-        # 3) Evitar loop (GET o POST del propio setup)
-        if path.startswith(setup_url):
+        # 6) ¿Tiene plantillas activas? Si no, forzar setup
+        tiene = PlantillaAtencion.objects.filter(profesional=prof, activo=True).exists()
+        if not tiene:
+            return redirect(setup_url)
+    return None
+
+
+@sync_and_async_middleware
+def ensure_prof_setup_middleware(get_response):
+    # 1) Excepciones por prefijo (admin, estáticos, recepción, portal de pacientes...)
+    def exento(request):
+        return any(request.path.startswith(p) for p in EXEMPT_PATH_PREFIXES)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not exento(request):
+                respuesta = await sync_to_async(_redireccion_setup_profesional)(request)
+                if respuesta is not None:
+                    return respuesta
+            return await get_response(request)
+    else:
+        def middleware(request):
+            if not exento(request):
+                respuesta = _redireccion_setup_profesional(request)
+                if respuesta is not None:
+                    return respuesta
             return get_response(request)
+    return middleware
 
-        # 4) Solo si está autenticado y ES profesional
-        if user and user.is_authenticated:
-            # Opcional: salir rápido si NO tiene rol Profesional
-            if not user_has_role(user, "Profesional"):
-                return get_response(request)
 
-            # 5) Tiene perfil de profesional activo?
-            try:
-                prof = Profesional.objects.get(usuario=user, activo=True)
-            except Profesional.DoesNotExist:
-                return get_response(request)
+class LecturaPrimarioTrasEscrituraMiddleware:
+    """
+    Tras un POST/PUT/PATCH/DELETE marca la sesión para que, por unos segundos,
+    las vistas con @lectura_replica lean del primario (la réplica puede ir atrasada).
+    """
+    METODOS_ESCRITURA = ("POST", "PUT", "PATCH", "DELETE")
 
-            # 6) ¿Tiene plantillas activas? Si no, forzar setup
-            tiene = PlantillaAtencion.objects.filter(profesional=prof, activo=True).exists()
-            if not tiene:
-                return redirect(setup_url)
+    sync_capable = True
+    async_capable = True
 
-        return get_response(request)
-    return middleware
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _debe_marcar(self, request):
+        session = getattr(request, "session", None)
+        # Solo sesiones que ya existen o que el request creó (login): un POST anónimo no abre sesión
+        return (request.method in self.METODOS_ESCRITURA and replica_disponible()
+                and session is not None and bool(session.session_key or session.modified))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self._debe_marcar(request):
+            marcar_escritura(request.session)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._debe_marcar(request):
+            await amarcar_escritura(request.session)
+        return response
@@ -0,0 +1,96 @@
+from datetime import date, datetime, time
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+TABLA = "auditoria_citas"
+INDICES = {
+    "auditoria_c_cita_id_a04a3f_idx": "cita_id",
+    "auditoria_c_usuario_0a4fc7_idx": "usuario_id",
+    "auditoria_c_creado__05bfce_idx": "creado_en",
+}
+
+
+def _sumar_meses(d, meses):
+    total = d.year * 12 + (d.month - 1) + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _limite(d):
+    return datetime.combine(d, time.min).replace(tzinfo=ZoneInfo(settings.TIME_ZONE)).isoformat()
+
+
+def particionar(apps, schema_editor):
+    """
+    Convierte auditoria_citas en una tabla particionada por rango mensual de creado_en.
+    Solo PostgreSQL; en otros motores la tabla queda igual (el archivado borra por rango).
+    """
+    conn = schema_editor.connection
+    if conn.vendor != "postgresql":
+        return
+
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    tabla_user = User._meta.db_table
+    pk_user = User._meta.pk.column
+
+    with conn.cursor() as cur:
+        cur.execute(f'LOCK TABLE "{TABLA}" IN ACCESS EXCLUSIVE MODE')
+        cur.execute(f'SELECT MIN(creado_en), MAX(id) FROM "{TABLA}"')
+        minimo, max_id = cur.fetchone()
+
+        cur.execute(f'ALTER TABLE "{TABLA}" RENAME TO "{TABLA}_old"')
+        cur.execute(f'CREATE SEQUENCE "{TABLA}_part_id_seq" AS bigint')
+        cur.execute(f"SELECT setval('\"{TABLA}_part_id_seq\"', %s, false)", [(max_id or 0) + 1])
+        cur.execute(
+            f'CREATE TABLE "{TABLA}" (LIKE "{TABLA}_old" INCLUDING DEFAULTS INCLUDING STORAGE) '
+            f"PARTITION BY RANGE (creado_en)"
+        )
+        cur.execute(f'ALTER TABLE "{TABLA}" ALTER COLUMN id SET DEFAULT nextval(\'"{TABLA}_part_id_seq"\')')
+        cur.execute(f'ALTER SEQUENCE "{TABLA}_part_id_seq" OWNED BY "{TABLA}".id')
+        cur.execute(f'ALTER TABLE "{TABLA}" ADD PRIMARY KEY (id, creado_en)')
+
+        # Particiones: desde el mes del registro más antiguo hasta 3 meses adelante
+        hoy = date.today().replace(day=1)
+        mes = minimo.astimezone(ZoneInfo(settings.TIME_ZONE)).date().replace(day=1) if minimo else hoy
+        while mes <= _sumar_meses(hoy, 3):
+            cur.execute(
+                f'CREATE TABLE "{TABLA}_y{mes.year}m{mes.month:02d}" PARTITION OF "{TABLA}" '
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [_limite(mes), _limite(_sumar_meses(mes, 1))],
+            )
+            mes = _sumar_meses(mes, 1)
+        cur.execute(f'CREATE TABLE "{TABLA}_default" PARTITION OF "{TABLA}" DEFAULT')
+
+        cur.execute(f'INSERT INTO "{TABLA}" SELECT * FROM "{TABLA}_old"')
+        cur.execute(f'DROP TABLE "{TABLA}_old"')
+
+        # Mismos nombres que los índices del modelo (se propagan a cada partición)
+        for nombre, columna in INDICES.items():
+            cur.execute(f'CREATE INDEX "{nombre}" ON "{TABLA}" ("{columna}")')
+
+        # La FK se agrega al final para que no queden chequeos diferidos pendientes al indexar
+        cur.execute(
+            f'ALTER TABLE "{TABLA}" ADD CONSTRAINT "{TABLA}_usuario_id_fk" '
+            f'FOREIGN KEY (usuario_id) REFERENCES "{tabla_user}" ("{pk_user}") '
+            f"DEFERRABLE INITIALLY DEFERRED"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_cita_nota'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditoriacita',
+            name='cita',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='auditoria', to='core.cita'),
+        ),
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
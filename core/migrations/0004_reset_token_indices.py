@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_auditoria_particionada'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pacienteresettoken',
+            index=models.Index(condition=models.Q(('used_at__isnull', True)), fields=['paciente', 'expires_at'], name='reset_token_vigentes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pacienteresettoken',
+            index=models.Index(fields=['expires_at'], name='reset_token_expira_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:20
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+TABLA = "core_paciente"
+INDICES = {
+    "paciente_apellidos_pref_idx": "apellidos",
+    "paciente_nombres_pref_idx": "nombres",
+    "paciente_email_pref_idx": "email",
+}
+
+
+def crear_indices(apps, schema_editor):
+    """text_pattern_ops solo existe en PostgreSQL; en otros motores la búsqueda funciona sin índice."""
+    conn = schema_editor.connection
+    if conn.vendor != "postgresql":
+        return
+    with conn.cursor() as cur:
+        for nombre, columna in INDICES.items():
+            cur.execute(
+                f'CREATE INDEX IF NOT EXISTS "{nombre}" ON "{TABLA}" (UPPER("{columna}") text_pattern_ops)'
+            )
+
+
+def borrar_indices(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor != "postgresql":
+        return
+    with conn.cursor() as cur:
+        for nombre in INDICES:
+            cur.execute(f'DROP INDEX IF EXISTS "{nombre}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_reset_token_indices'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(crear_indices, borrar_indices),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='paciente',
+                    index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('apellidos'), name='text_pattern_ops'), name='paciente_apellidos_pref_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='paciente',
+                    index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('nombres'), name='text_pattern_ops'), name='paciente_nombres_pref_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='paciente',
+                    index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='text_pattern_ops'), name='paciente_email_pref_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_paciente_busqueda_prefijo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListaEspera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dias', models.PositiveSmallIntegerField(default=127)),
+                ('hora_desde', models.TimeField(blank=True, null=True)),
+                ('hora_hasta', models.TimeField(blank=True, null=True)),
+                ('vigente_hasta', models.DateField(blank=True, null=True)),
+                ('prioridad', models.SmallIntegerField(default=0)),
+                ('estado', models.CharField(choices=[('activa', 'Activa'), ('asignada', 'Asignada'), ('cancelada', 'Cancelada')], default='activa', max_length=20)),
+                ('nota', models.CharField(blank=True, max_length=255, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('asignada_en', models.DateTimeField(blank=True, null=True)),
+                ('cita', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.cita')),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('especialidad', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='listas_espera', to='core.especialidad')),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listas_espera', to='core.paciente')),
+                ('profesional', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='listas_espera', to='core.profesional')),
+            ],
+            options={
+                'verbose_name': 'Inscripción en lista de espera',
+                'verbose_name_plural': 'Lista de espera',
+                'db_table': 'lista_espera',
+                'indexes': [models.Index(condition=models.Q(('estado', 'activa'), ('profesional__isnull', False)), fields=['profesional', '-prioridad', 'creado_en'], name='espera_prof_activa_idx'), models.Index(condition=models.Q(('estado', 'activa'), ('profesional__isnull', True)), fields=['especialidad', '-prioridad', 'creado_en'], name='espera_esp_activa_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado', 'activa')), fields=('paciente', 'especialidad'), name='uk_espera_activa_paciente')],
+            },
+        ),
+    ]
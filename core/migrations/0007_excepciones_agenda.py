@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_lista_espera'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcepcionAgenda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('feriado', 'Feriado'), ('licencia', 'Licencia / vacaciones'), ('cierre', 'Cierre de ubicación'), ('bloqueo', 'Bloqueo')], default='bloqueo', max_length=20)),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField()),
+                ('motivo', models.CharField(blank=True, max_length=255, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('profesional', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='excepciones', to='core.profesional')),
+                ('ubicacion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='excepciones', to='core.ubicacion')),
+            ],
+            options={
+                'verbose_name': 'Excepción de agenda',
+                'verbose_name_plural': 'Excepciones de agenda',
+                'db_table': 'excepciones_agenda',
+                'indexes': [models.Index(fields=['inicio', 'fin'], name='excepciones_inicio_bf325d_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('fin__gt', models.F('inicio'))), name='ck_excepcion_rango'), models.UniqueConstraint(condition=models.Q(('profesional__isnull', True), ('ubicacion__isnull', True)), fields=('tipo', 'inicio'), name='uk_excepcion_general')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:35
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_excepciones_agenda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ubicacion',
+            name='capacidad',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddIndex(
+            model_name='agenda',
+            index=models.Index(fields=['ubicacion', 'inicio'], name='agendas_ubicaci_7a7605_idx'),
+        ),
+    ]
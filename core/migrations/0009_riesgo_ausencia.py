@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_ubicacion_capacidad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModeloRiesgo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parametros', models.JSONField()),
+                ('metricas', models.JSONField(blank=True, default=dict)),
+                ('muestras', models.PositiveIntegerField(default=0)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Modelo de riesgo de ausencia',
+                'verbose_name_plural': 'Modelos de riesgo de ausencia',
+                'db_table': 'modelos_riesgo',
+                'ordering': ['-creado_en'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PuntajeRiesgoCita',
+            fields=[
+                ('cita', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='riesgo', serialize=False, to='core.cita')),
+                ('puntaje', models.FloatField()),
+                ('calculado_en', models.DateTimeField(auto_now=True)),
+                ('modelo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='puntajes', to='core.modeloriesgo')),
+            ],
+            options={
+                'verbose_name': 'Puntaje de riesgo',
+                'verbose_name_plural': 'Puntajes de riesgo',
+                'db_table': 'puntajes_riesgo_cita',
+                'indexes': [models.Index(fields=['-puntaje', 'cita'], name='riesgo_puntaje_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_riesgo_ausencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agenda',
+            name='sobrecupo_max',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cita',
+            name='sobrecupo',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='cita',
+            name='agenda',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='citas', related_query_name='cita', to='core.agenda'),
+        ),
+        migrations.AddConstraint(
+            model_name='cita',
+            constraint=models.UniqueConstraint(condition=models.Q(('sobrecupo', False)), fields=('agenda',), name='uk_cita_agenda_titular'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_sobrecupo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorIntentos',
+            fields=[
+                ('clave', models.CharField(max_length=120, primary_key=True, serialize=False)),
+                ('n', models.PositiveIntegerField(default=0)),
+                ('expira', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Contador de intentos',
+                'verbose_name_plural': 'Contadores de intentos',
+                'db_table': 'ratelimit_contadores',
+                'indexes': [models.Index(fields=['expira'], name='ratelimit_c_expira_8856fa_idx')],
+            },
+        ),
+    ]
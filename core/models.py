@@ -1,7 +1,10 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import OpClass
+from django.core.validators import MinValueValidator
+from django.db.models.functions import Upper
 from django.utils import timezone
-from django.contrib.auth.hashers import make_password, check_password
+from core import hashing
 
 # =========================
 #  ROLES (RBAC simple)
@@ -102,6 +105,8 @@ class Ubicacion(models.Model):
 
     # Ej: "Box 1", "Box 2", "Sala grupal"
     nombre = models.CharField(max_length=120, unique=True)
+    # Bloques presenciales simultáneos que admite (un Box = 1)
+    capacidad = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
 
     def __str__(self):
         return self.nombre
@@ -140,6 +145,8 @@ class Agenda(models.Model):
         indexes = [
             models.Index(fields=["inicio"]),
             models.Index(fields=["profesional", "inicio", "fin"]),
+            # Conflictos y ocupación por sala
+            models.Index(fields=["ubicacion", "inicio"]),
         ]
         constraints = [
             models.UniqueConstraint(fields=["profesional", "inicio", "fin"], name="uk_agenda_prof_inicio_fin"),
@@ -151,6 +158,8 @@ class Agenda(models.Model):
     fin = models.DateTimeField()
     modalidad = models.CharField(max_length=20, choices=Modalidad.choices, default=Modalidad.PRESENCIAL)
     observaciones = models.CharField(max_length=255, blank=True, null=True)
+    # Citas extra permitidas sobre la titular (0 = sin sobrecupo). Lo fija `politica_sobrecupo`.
+    sobrecupo_max = models.PositiveSmallIntegerField(default=0)
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
@@ -187,16 +196,37 @@ class Paciente(models.Model):
     class Meta:
         verbose_name = "Paciente"
         verbose_name_plural = "Pacientes"
-        indexes = [models.Index(fields=["rut"])]
+        indexes = [
+            models.Index(fields=["rut"]),
+            # Búsqueda por prefijo del admin (istartswith -> UPPER(col) LIKE 'X%')
+            models.Index(OpClass(Upper("apellidos"), name="text_pattern_ops"), name="paciente_apellidos_pref_idx"),
+            models.Index(OpClass(Upper("nombres"), name="text_pattern_ops"), name="paciente_nombres_pref_idx"),
+            models.Index(OpClass(Upper("email"), name="text_pattern_ops"), name="paciente_email_pref_idx"),
+        ]
 
     # Helpers
     def set_password(self, raw_password: str):
-        self.password = make_password(raw_password)
+        self.password = hashing.hashear(raw_password)
 
     def check_password(self, raw_password: str) -> bool:
         if not self.password:
             return False
-        return check_password(raw_password, self.password)
+
+        def rehash(raw):
+            # Hash con hasher/costo anterior: se actualiza al verificar (sin otro round-trip del usuario)
+            self.set_password(raw)
+            if self.pk:
+                Paciente.objects.filter(pk=self.pk).update(password=self.password)
+
+        return hashing.verificar(raw_password, self.password, setter=rehash)
+
+    async def acheck_password(self, raw_password: str) -> bool:
+        """Igual que check_password, para vistas async (hash en el pool, ORM async)."""
+        ok, requiere_rehash = await hashing.averificar(raw_password, self.password)
+        if ok and requiere_rehash and self.pk:
+            self.password = await hashing.ahashear(raw_password)
+            await Paciente.objects.filter(pk=self.pk).aupdate(password=self.password)
+        return ok
 
     def nombre_completo(self):
         return f"{self.nombres} {self.apellidos}".strip()
@@ -218,9 +248,17 @@ class Cita(models.Model):
             models.Index(fields=["agenda"]),
             models.Index(fields=["paciente"]),
         ]
+        constraints = [
+            # Una sola cita titular por bloque; las demás solo como sobrecupo
+            models.UniqueConstraint(
+                fields=["agenda"], condition=models.Q(sobrecupo=False), name="uk_cita_agenda_titular"
+            ),
+        ]
 
     paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name="citas")
-    agenda = models.OneToOneField(Agenda, on_delete=models.CASCADE, related_name="cita")  # <- OneToOne
+    # FK (no OneToOne) por los sobrecupos; las consultas siguen usando `cita__...` desde Agenda
+    agenda = models.ForeignKey(Agenda, on_delete=models.CASCADE, related_name="citas", related_query_name="cita")
+    sobrecupo = models.BooleanField(default=False)
     estado = models.ForeignKey(EstadoCita, on_delete=models.PROTECT, related_name="citas")
 
     motivo = models.CharField(max_length=255, blank=True, null=True)
@@ -260,7 +298,14 @@ class AuditoriaCita(models.Model):
             models.Index(fields=["creado_en"]),
         ]
 
-    cita = models.ForeignKey(Cita, on_delete=models.CASCADE, related_name="auditoria")
+    # Sin FK real: el historial debe sobrevivir a la cita (p.ej. CANCELAR borra la cita)
+    # y la tabla se particiona por mes en PostgreSQL (ver core/auditoria.py).
+    cita = models.ForeignKey(
+        Cita,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="auditoria"
+    )
     usuario = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -337,6 +382,23 @@ class PacienteResetToken(models.Model):
     used_at = models.DateTimeField(null=True, blank=True)
     expires_at = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            # Tokens vivos de un paciente (invalidación al pedir uno nuevo)
+            models.Index(
+                fields=["paciente", "expires_at"],
+                condition=models.Q(used_at__isnull=True),
+                name="reset_token_vigentes_idx",
+            ),
+            # Purga de vencidos por rango de fecha
+            models.Index(fields=["expires_at"], name="reset_token_expira_idx"),
+        ]
+
+    @classmethod
+    def vigentes(cls, ahora=None):
+        """Tokens no usados y no expirados (la validez se resuelve en SQL)."""
+        return cls.objects.filter(used_at__isnull=True, expires_at__gte=ahora or timezone.now())
+
     def is_valid(self):
         now = timezone.now()
         return self.used_at is None and now <= self.expires_at
@@ -392,3 +454,208 @@ class PlantillaAtencion(models.Model):
 
     def __str__(self):
         return f"{self.profesional} - {self.get_dia_semana_display()} {self.hora_inicio:%H:%M}-{self.hora_fin:%H:%M} ({self.duracion_minutos}m)"
+
+
+# =========================
+#  EXCEPCIONES DE AGENDA (feriados, licencias, cierres)
+# =========================
+
+class ExcepcionAgenda(models.Model):
+    """
+    Rango [inicio, fin) sin atención. El alcance lo dan las FKs:
+    sin profesional ni ubicación = todo el COSAM (feriado); con profesional = su licencia
+    o vacaciones; con ubicación = cierre de ese box/sala.
+    """
+    class Tipo(models.TextChoices):
+        FERIADO = "feriado", "Feriado"
+        LICENCIA = "licencia", "Licencia / vacaciones"
+        CIERRE = "cierre", "Cierre de ubicación"
+        BLOQUEO = "bloqueo", "Bloqueo"
+
+    class Meta:
+        db_table = "excepciones_agenda"
+        verbose_name = "Excepción de agenda"
+        verbose_name_plural = "Excepciones de agenda"
+        indexes = [
+            models.Index(fields=["inicio", "fin"]),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(fin__gt=models.F("inicio")), name="ck_excepcion_rango"),
+            # cargar_feriados es idempotente: un feriado general por tipo y fecha de inicio
+            models.UniqueConstraint(
+                fields=["tipo", "inicio"],
+                condition=models.Q(profesional__isnull=True, ubicacion__isnull=True),
+                name="uk_excepcion_general",
+            ),
+        ]
+
+    tipo = models.CharField(max_length=20, choices=Tipo.choices, default=Tipo.BLOQUEO)
+    profesional = models.ForeignKey(
+        Profesional, on_delete=models.CASCADE, null=True, blank=True, related_name="excepciones"
+    )
+    ubicacion = models.ForeignKey(
+        Ubicacion, on_delete=models.CASCADE, null=True, blank=True, related_name="excepciones"
+    )
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField()
+    motivo = models.CharField(max_length=255, blank=True, null=True)
+
+    creado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.inicio and self.fin and self.fin <= self.inicio:
+            raise ValidationError("El fin debe ser posterior al inicio.")
+
+    def __str__(self):
+        alcance = self.profesional or self.ubicacion or "Todo el COSAM"
+        return f"{self.get_tipo_display()} · {alcance} · {timezone.localtime(self.inicio):%d/%m/%Y %H:%M}"
+
+
+# =========================
+#  LISTA DE ESPERA (relleno de bloques liberados)
+# =========================
+
+class ListaEspera(models.Model):
+    class Estado(models.TextChoices):
+        ACTIVA = "activa", "Activa"
+        ASIGNADA = "asignada", "Asignada"
+        CANCELADA = "cancelada", "Cancelada"
+
+    # dias: máscara de bits con lunes = 1, martes = 2, ... domingo = 64 (127 = cualquier día)
+    TODOS_LOS_DIAS = 127
+
+    class Meta:
+        db_table = "lista_espera"
+        verbose_name = "Inscripción en lista de espera"
+        verbose_name_plural = "Lista de espera"
+        indexes = [
+            # El matcher recorre estos índices en orden (prioridad, antigüedad) y se detiene
+            # en la primera inscripción compatible: nunca lee toda la lista.
+            models.Index(
+                fields=["profesional", "-prioridad", "creado_en"],
+                condition=models.Q(estado="activa", profesional__isnull=False),
+                name="espera_prof_activa_idx",
+            ),
+            models.Index(
+                fields=["especialidad", "-prioridad", "creado_en"],
+                condition=models.Q(estado="activa", profesional__isnull=True),
+                name="espera_esp_activa_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["paciente", "especialidad"],
+                condition=models.Q(estado="activa"),
+                name="uk_espera_activa_paciente",
+            ),
+        ]
+
+    paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name="listas_espera")
+    especialidad = models.ForeignKey(Especialidad, on_delete=models.PROTECT, related_name="listas_espera")
+    # Vacío = cualquier profesional de la especialidad
+    profesional = models.ForeignKey(
+        Profesional, on_delete=models.PROTECT, null=True, blank=True, related_name="listas_espera"
+    )
+
+    # Ventana preferida (vacío = sin restricción)
+    dias = models.PositiveSmallIntegerField(default=TODOS_LOS_DIAS)
+    hora_desde = models.TimeField(null=True, blank=True)
+    hora_hasta = models.TimeField(null=True, blank=True)
+    vigente_hasta = models.DateField(null=True, blank=True)
+
+    prioridad = models.SmallIntegerField(default=0)  # mayor = antes
+    estado = models.CharField(max_length=20, choices=Estado.choices, default=Estado.ACTIVA)
+    nota = models.CharField(max_length=255, blank=True, null=True)
+
+    cita = models.ForeignKey(Cita, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    creado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+    asignada_en = models.DateTimeField(null=True, blank=True)
+
+    @staticmethod
+    def mascara_dias(dias) -> int:
+        """[0, 2, 4] (lunes, miércoles, viernes; como PlantillaAtencion.DiaSemana) -> 21"""
+        return sum(1 << int(d) for d in set(dias)) or ListaEspera.TODOS_LOS_DIAS
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.profesional_id and self.profesional.especialidad_id != self.especialidad_id:
+            raise ValidationError("El profesional no pertenece a la especialidad indicada.")
+        if self.hora_desde and self.hora_hasta and self.hora_hasta <= self.hora_desde:
+            raise ValidationError("La hora hasta debe ser posterior a la hora desde.")
+
+    def __str__(self):
+        return f"{self.paciente} · {self.especialidad} ({self.get_estado_display()})"
+
+
+# =========================
+#  RIESGO DE AUSENCIA (modelo entrenado + puntajes por cita)
+# =========================
+
+class ModeloRiesgo(models.Model):
+    """Regresión logística entrenada por `entrenar_riesgo_ausencia`; se usa la más reciente."""
+
+    class Meta:
+        db_table = "modelos_riesgo"
+        verbose_name = "Modelo de riesgo de ausencia"
+        verbose_name_plural = "Modelos de riesgo de ausencia"
+        ordering = ["-creado_en"]
+
+    # {"variables": [...], "medias": [...], "desvios": [...], "pesos": [...], "sesgo": x, "tasa_base": p}
+    parametros = models.JSONField()
+    # {"auc": ..., "log_loss": ..., "tasa_ausencia": ...} sobre el período de validación
+    metricas = models.JSONField(default=dict, blank=True)
+    muestras = models.PositiveIntegerField(default=0)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        auc = self.metricas.get("auc")
+        return f"Modelo {self.pk} · {timezone.localtime(self.creado_en):%d/%m/%Y %H:%M}" + (f" · AUC {auc:.2f}" if auc else "")
+
+
+class PuntajeRiesgoCita(models.Model):
+    """Probabilidad estimada de ausencia de una cita próxima (se recalcula en lote)."""
+
+    class Meta:
+        db_table = "puntajes_riesgo_cita"
+        verbose_name = "Puntaje de riesgo"
+        verbose_name_plural = "Puntajes de riesgo"
+        indexes = [
+            models.Index(fields=["-puntaje", "cita"], name="riesgo_puntaje_idx"),
+        ]
+
+    cita = models.OneToOneField(Cita, on_delete=models.CASCADE, primary_key=True, related_name="riesgo")
+    puntaje = models.FloatField()
+    modelo = models.ForeignKey(ModeloRiesgo, on_delete=models.CASCADE, related_name="puntajes")
+    calculado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cita {self.cita_id}: {self.puntaje:.0%}"
+
+
+# =========================
+#  LÍMITE DE INTENTOS (contadores)
+# =========================
+
+class ContadorIntentos(models.Model):
+    """Intentos por (regla, identificador, ventana); ver core/ratelimit.py."""
+    class Meta:
+        db_table = "ratelimit_contadores"
+        verbose_name = "Contador de intentos"
+        verbose_name_plural = "Contadores de intentos"
+        indexes = [
+            models.Index(fields=["expira"]),
+        ]
+
+    clave = models.CharField(max_length=120, primary_key=True)
+    n = models.PositiveIntegerField(default=0)
+    expira = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.clave}: {self.n}"
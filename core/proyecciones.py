@@ -0,0 +1,193 @@
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.text import slugify
+
+from core.models import Agenda
+
+# =========================
+#  PROYECCIONES LIVIANAS DE AGENDA
+# =========================
+# Los listados de agenda solo imprimen unos pocos campos por bloque. En vez de
+# instanciar Agenda + Cita + Paciente + EstadoCita por fila (y un prefetch por vista),
+# se trae una sola consulta con values_list (LEFT JOIN a la cita) y cada fila queda
+# en un objeto con __slots__. Las plantillas usan los mismos nombres de siempre.
+
+_MODALIDADES = dict(Agenda.Modalidad.choices)
+
+
+class FilaBloque:
+    """Un bloque de agenda (y su cita, si tiene) listo para la plantilla."""
+    __slots__ = ("id", "inicio", "fin", "modalidad", "ubicacion", "cita_id", "estado", "paciente",
+                 "sobrecupo", "sobrecupo_max", "sobrecupos")
+
+    def __init__(self, id, inicio, fin, modalidad, ubicacion, cita_id, estado, paciente,
+                 sobrecupo=False, sobrecupo_max=0):
+        self.id = id
+        self.inicio = inicio
+        self.fin = fin
+        self.modalidad = modalidad
+        self.ubicacion = ubicacion
+        self.cita_id = cita_id
+        self.estado = estado
+        self.paciente = paciente
+        self.sobrecupo = bool(sobrecupo)          # la cita de esta fila es un sobrecupo
+        self.sobrecupo_max = sobrecupo_max
+        self.sobrecupos = 0                       # sobrecupos ya agendados en el bloque (ver _contar_sobrecupos)
+
+    @property
+    def modalidad_display(self):
+        return _MODALIDADES.get(self.modalidad, self.modalidad)
+
+    @property
+    def estado_slug(self):
+        return slugify(self.estado or "") or "default"
+
+    @property
+    def libre(self):
+        return self.cita_id is None
+
+    @property
+    def admite_sobrecupo(self):
+        return self.sobrecupos < (self.sobrecupo_max or 0)
+
+
+class FilaBloqueRecepcion(FilaBloque):
+    """Bloque del listado de recepción: agrega profesional y especialidad."""
+    __slots__ = ("profesional", "especialidad")
+
+    def __init__(self, profesional, especialidad, *args):
+        super().__init__(*args)
+        self.profesional = profesional
+        self.especialidad = especialidad
+
+
+class Dia:
+    """Bloques de un día (ya ordenados) con sus totales (los sobrecupos no cuentan como bloque)."""
+    __slots__ = ("fecha", "bloques", "total", "ocupados")
+
+    def __init__(self, fecha):
+        self.fecha = fecha
+        self.bloques = []
+        self.total = 0
+        self.ocupados = 0
+
+    @property
+    def libres(self):
+        return self.total - self.ocupados
+
+
+# --- rangos ---
+MODOS = ("dia", "semana", "mes")
+
+
+def rango_para(fecha: date, modo: str) -> tuple[date, date]:
+    """[desde, hasta) en fechas locales según el modo."""
+    if modo == "semana":
+        desde = fecha - timedelta(days=fecha.weekday())
+        return desde, desde + timedelta(days=7)
+    if modo == "mes":
+        desde = fecha.replace(day=1)
+        siguiente = (desde + timedelta(days=32)).replace(day=1)
+        return desde, siguiente
+    return fecha, fecha + timedelta(days=1)
+
+
+def _limites(desde: date, hasta: date):
+    tz = timezone.get_current_timezone()
+    return (timezone.make_aware(datetime.combine(desde, time.min), tz),
+            timezone.make_aware(datetime.combine(hasta, time.min), tz))
+
+
+# --- consultas ---
+CAMPOS_BLOQUE = (
+    "id", "inicio", "fin", "modalidad", "ubicacion__nombre",
+    "cita__id", "cita__estado__nombre", "cita__paciente__nombres", "cita__paciente__apellidos",
+    "cita__sobrecupo", "sobrecupo_max",
+)
+# Un bloque con sobrecupo sale una vez por cita (la titular primero)
+ORDEN_CITAS = ("cita__sobrecupo", "cita__id")
+
+
+def _campos(row) -> tuple:
+    """Fila de CAMPOS_BLOQUE -> argumentos de FilaBloque (horas locales, paciente armado)."""
+    aid, ini, fin, modalidad, ubic, cita_id, estado, nombres, apellidos, sobrecupo, sobrecupo_max = row
+    paciente = f"{nombres or ''} {apellidos or ''}".strip() if cita_id else None
+    return (aid, timezone.localtime(ini), timezone.localtime(fin),
+            modalidad, ubic, cita_id, estado, paciente, sobrecupo, sobrecupo_max)
+
+
+def _contar_sobrecupos(filas: list) -> list:
+    """
+    Anota en cada fila cuántos sobrecupos tiene su bloque. Las filas traen una por cita,
+    así que basta contarlas (sin otra consulta).
+    """
+    por_bloque = {}
+    for f in filas:
+        if f.sobrecupo:
+            por_bloque[f.id] = por_bloque.get(f.id, 0) + 1
+    if por_bloque:
+        for f in filas:
+            f.sobrecupos = por_bloque.get(f.id, 0)
+    return filas
+
+
+def bloques_profesional(profesional_id: int, desde: date, hasta: date) -> list[FilaBloque]:
+    """Todos los bloques del profesional en [desde, hasta) con una sola consulta."""
+    ini, fin = _limites(desde, hasta)
+    rows = (Agenda.objects
+            .filter(profesional_id=profesional_id, inicio__gte=ini, inicio__lt=fin)
+            .order_by("inicio", *ORDEN_CITAS)
+            .values_list(*CAMPOS_BLOQUE))
+    return _contar_sobrecupos([FilaBloque(*_campos(r)) for r in rows.iterator(chunk_size=2000)])
+
+
+CAMPOS_RECEPCION = (
+    "profesional__nombre", "profesional__apellido", "profesional__especialidad__nombre",
+) + CAMPOS_BLOQUE
+
+
+def bloques_recepcion(desde: date, hasta: date, profesional_id=None, estado: str = "todos") -> list[FilaBloqueRecepcion]:
+    """
+    Bloques de todos los profesionales (o de uno) en [desde, hasta), una sola consulta.
+    `estado` (libres | ocupados) se filtra en SQL en vez de recorrer los objetos.
+    """
+    ini, fin = _limites(desde, hasta)
+    qs = Agenda.objects.filter(inicio__gte=ini, inicio__lt=fin)
+    if profesional_id:
+        qs = qs.filter(profesional_id=profesional_id)
+    if estado == "libres":
+        qs = qs.filter(cita__isnull=True)
+    elif estado == "ocupados":
+        qs = qs.filter(cita__isnull=False)
+    rows = (qs.order_by("inicio", "profesional__apellido", "profesional__nombre", *ORDEN_CITAS)
+            .values_list(*CAMPOS_RECEPCION))
+
+    return _contar_sobrecupos([FilaBloqueRecepcion(f"{r[0]} {r[1]}", r[2], *_campos(r[3:]))
+                               for r in rows.iterator(chunk_size=2000)])
+
+
+def agrupar_por_dia(bloques, desde: date, hasta: date) -> list[Dia]:
+    """
+    Una pasada sobre los bloques (ordenados por inicio) repartiéndolos por fecha local.
+    Incluye todos los días del rango, aunque no tengan bloques.
+    """
+    dias = []
+    por_fecha = {}
+    d = desde
+    while d < hasta:
+        por_fecha[d] = dia = Dia(d)
+        dias.append(dia)
+        d += timedelta(days=1)
+
+    for b in bloques:
+        dia = por_fecha.get(b.inicio.date())
+        if dia is None:
+            continue
+        dia.bloques.append(b)
+        if b.sobrecupo:
+            continue
+        dia.total += 1
+        if b.cita_id is not None:
+            dia.ocupados += 1
+    return dias
@@ -0,0 +1,168 @@
+import hashlib
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import wraps
+from typing import Callable
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.shortcuts import render
+
+from core.forms import normaliza_rut
+from core.models import ContadorIntentos
+
+# =========================
+#  LÍMITE DE INTENTOS (VENTANA DESLIZANTE)
+# =========================
+# Cada regla cuenta intentos en ventanas fijas de `ventana` segundos y estima la
+# ventana deslizante como: actual + anterior * (parte de la anterior que aún cae
+# dentro de los últimos `ventana` segundos). El incremento tiene que ser atómico entre
+# workers: con Redis se usa cache.add + cache.incr; con cualquier otra caché (archivo/BD
+# hacen leer-y-escribir) el contador va en la tabla ratelimit_contadores con un solo
+# INSERT ... ON CONFLICT DO UPDATE SET n = n + 1 RETURNING n (RATELIMIT_ALMACEN).
+# El decorador corta ANTES de ejecutar la vista: sin consultas ni hashing de contraseñas.
+
+
+@dataclass(frozen=True)
+class Regla:
+    nombre: str                                  # "ip", "rut", ... (parte de la clave)
+    clave: Callable[[object], str | None]        # request -> identificador (None = no aplica)
+    limite: int                                  # intentos permitidos por ventana
+    ventana: int                                 # segundos
+
+
+def ip_cliente(request) -> str:
+    if getattr(settings, "RATELIMIT_CONFIAR_PROXY", False):
+        reenviada = request.META.get("HTTP_X_FORWARDED_FOR", "")
+        if reenviada:
+            return reenviada.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "desconocida")
+
+
+def rut_enviado(request) -> str | None:
+    rut = normaliza_rut(request.POST.get("rut", ""))
+    return rut or None
+
+
+def token_de_url(request) -> str | None:
+    match = getattr(request, "resolver_match", None)
+    return match.kwargs.get("token") if match else None
+
+
+def _clave(regla: Regla, ambito: str, valor: str, n_ventana: int) -> str:
+    # El valor se guarda hasheado: la caché no debe tener RUTs ni tokens en claro
+    digest = hashlib.sha256(valor.encode()).hexdigest()[:24]
+    return f"rl:{ambito}:{regla.nombre}:{digest}:{n_ventana}"
+
+
+_TABLA = ContadorIntentos._meta.db_table
+_SQL_INCREMENTAR = f"""
+    INSERT INTO {_TABLA} (clave, n, expira) VALUES (%s, 1, %s)
+    ON CONFLICT (clave) DO UPDATE SET n = {_TABLA}.n + 1
+    RETURNING n
+"""
+
+
+def _en_cache() -> bool:
+    return getattr(settings, "RATELIMIT_ALMACEN", "bd") == "cache"
+
+
+def _incrementar(clave: str, ventana: int, ahora: float) -> int:
+    if _en_cache():
+        cache.add(clave, 0, timeout=ventana * 2)
+        try:
+            return cache.incr(clave)
+        except ValueError:        # expiró/desalojada entre add e incr
+            cache.set(clave, 1, timeout=ventana * 2)
+            return 1
+
+    momento = datetime.fromtimestamp(ahora, dt_timezone.utc)
+    with connection.cursor() as cur:
+        cur.execute(_SQL_INCREMENTAR, [clave, momento + timedelta(seconds=ventana * 2)])
+        n = cur.fetchone()[0]
+    if n == 1:
+        # Primera vez de esta clave en la ventana: se barren las vencidas (índice por expira)
+        ContadorIntentos.objects.filter(expira__lt=momento).delete()
+    return n
+
+
+def _leer(clave: str) -> int:
+    if _en_cache():
+        return cache.get(clave, 0)
+    return ContadorIntentos.objects.using("default").filter(clave=clave).values_list("n", flat=True).first() or 0
+
+
+def registrar_intento(regla: Regla, ambito: str, valor: str) -> tuple[bool, int]:
+    """Suma un intento. Devuelve (permitido, segundos para reintentar)."""
+    ahora = time.time()
+    n_ventana = int(ahora // regla.ventana)
+
+    n = _incrementar(_clave(regla, ambito, valor, n_ventana), regla.ventana, ahora)
+    anterior = _leer(_clave(regla, ambito, valor, n_ventana - 1))
+
+    transcurrido = (ahora % regla.ventana) / regla.ventana
+    estimado = n + anterior * (1 - transcurrido)
+    if estimado <= regla.limite:
+        return True, 0
+
+    # Tiempo hasta que el peso de la ventana anterior baje lo suficiente (o hasta la próxima)
+    if anterior and n <= regla.limite:
+        fraccion = 1 - (regla.limite - n) / anterior
+        reintentar = (fraccion - transcurrido) * regla.ventana
+    else:
+        reintentar = (1 - transcurrido) * regla.ventana
+    return False, max(1, math.ceil(reintentar))
+
+
+def limitar_intentos(*reglas: Regla, metodos=("POST",), ambito: str | None = None):
+    """
+    Decorador: si alguna regla supera su límite responde 429 sin ejecutar la vista.
+    Solo cuenta los métodos indicados (por defecto POST: mostrar el formulario es libre).
+    """
+    def decorator(view_func):
+        nombre_ambito = ambito or view_func.__name__
+
+        def _evaluar(request):
+            """None si se permite; si no, la respuesta 429."""
+            if request.method not in metodos or not getattr(settings, "RATELIMIT_ACTIVO", True):
+                return None
+            espera = 0
+            for regla in reglas:
+                valor = regla.clave(request)
+                if not valor:
+                    continue
+                permitido, segundos = registrar_intento(regla, nombre_ambito, valor)
+                if not permitido:
+                    espera = max(espera, segundos)
+            if not espera:
+                return None
+            response = render(request, "paciente/demasiados_intentos.html",
+                              {"minutos": math.ceil(espera / 60)}, status=429)
+            response["Retry-After"] = str(espera)
+            return response
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _awrapped(request, *args, **kwargs):
+                if request.method in metodos:
+                    # Los contadores (BD/Redis) son bloqueantes: se consultan en un hilo
+                    rechazo = await sync_to_async(_evaluar)(request)
+                    if rechazo is not None:
+                        return rechazo
+                return await view_func(request, *args, **kwargs)
+
+            return _awrapped
+
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            rechazo = _evaluar(request)
+            if rechazo is not None:
+                return rechazo
+            return view_func(request, *args, **kwargs)
+
+        return _wrapped
+    return decorator
@@ -0,0 +1,292 @@
+import logging
+from datetime import timedelta
+
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+
+from core import catalogos
+from core.models import Cita, ContactoCita, ModeloRiesgo, PuntajeRiesgoCita
+
+try:
+    import numpy as np
+except ImportError:          # opcional: sin numpy no hay puntajes (la lista se ordena por hora)
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# =========================
+#  RIESGO DE AUSENCIA (NumPy)
+# =========================
+# Entrenamiento (offline): python manage.py entrenar_riesgo_ausencia
+#   citas pasadas Atendida/Ausente -> matriz de variables -> regresión logística con
+#   descenso de gradiente (L2), validada en el último 20% del período.
+# Puntaje (en lote): puntuar_citas(qs) arma la matriz de las citas en 3 consultas
+#   (citas + último contacto, historial agregado por paciente) y guarda
+#   PuntajeRiesgoCita con un solo INSERT ... ON CONFLICT.
+
+AUSENTE, ATENDIDA, CANCELADA = "Ausente", "Atendida", "Cancelada"
+ABIERTOS = ("Pendiente", "Confirmada")      # citas que todavía pueden terminar en ausencia
+
+VARIABLES = (
+    "tasa_ausencia", "tasa_cancelacion", "log_historial", "primera_vez", "log_anticipacion",
+    "lunes", "martes", "miercoles", "jueves", "viernes", "sabado",
+    "franja_manana", "franja_tarde",
+    "contacto_confirmado", "contacto_rechazado", "contacto_sin_respuesta", "log_intentos",
+)
+_SUAVIZADO = 2.0        # citas "virtuales" con la tasa base para pacientes con poco historial
+
+
+def disponible() -> bool:
+    return np is not None
+
+
+# --- variables ---
+def matriz(n_prev, aus_prev, canc_prev, anticipacion_dias, dia_iso, hora, ultimo, intentos, tasa_base):
+    """
+    Arreglos de largo n (uno por cita) -> matriz (n, len(VARIABLES)).
+    `ultimo` es el resultado del último contacto antes de la cita ("" si no hubo).
+    """
+    n_prev = np.asarray(n_prev, dtype=float)
+    anticipacion = np.clip(np.asarray(anticipacion_dias, dtype=float), 0, None)
+    dia_iso = np.asarray(dia_iso)
+    hora = np.asarray(hora)
+    ultimo = np.asarray(ultimo, dtype=object)
+    columnas = [
+        (np.asarray(aus_prev) + _SUAVIZADO * tasa_base) / (n_prev + _SUAVIZADO),
+        np.asarray(canc_prev) / (n_prev + 1),
+        np.log1p(n_prev),
+        n_prev == 0,
+        np.log1p(anticipacion),
+        *(dia_iso == d for d in range(1, 7)),       # domingo queda como base
+        hora < 12,
+        hora >= 15,
+        ultimo == ContactoCita.Resultado.CONFIRMADO,
+        ultimo == ContactoCita.Resultado.RECHAZADO,
+        ultimo == ContactoCita.Resultado.SIN_RESPUESTA,
+        np.log1p(np.asarray(intentos, dtype=float)),
+    ]
+    return np.column_stack(columnas).astype(float)
+
+
+def _ultimo_contacto(hasta="agenda__inicio"):
+    """Subconsultas: resultado del último contacto de la cita e intentos, antes de `hasta`."""
+    contactos = ContactoCita.objects.filter(cita_id=OuterRef("pk"), fecha_contacto__lt=OuterRef(hasta))
+    ultimo = Subquery(contactos.order_by("-fecha_contacto").values("resultado")[:1])
+    intentos = Subquery(
+        contactos.order_by().values("cita_id").annotate(c=Count("pk")).values("c"),
+        output_field=IntegerField(),
+    )
+    return ultimo, intentos
+
+
+def _ids_estado(*nombres):
+    return {nombre: getattr(catalogos.estados.por_nombre(nombre), "pk", None) for nombre in nombres}
+
+
+# --- regresión logística ---
+def _sigmoide(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def ajustar(X, y, l2=1e-2, iteraciones=600, paso=0.5):
+    """Descenso de gradiente sobre X estandarizada. Devuelve (medias, desvios, pesos, sesgo)."""
+    medias = X.mean(axis=0)
+    desvios = X.std(axis=0)
+    desvios[desvios == 0] = 1.0
+    Z = (X - medias) / desvios
+    n, k = Z.shape
+    pesos = np.zeros(k)
+    sesgo = float(np.log((y.mean() + 1e-6) / (1 - y.mean() + 1e-6)))
+    for _ in range(iteraciones):
+        error = _sigmoide(Z @ pesos + sesgo) - y
+        pesos -= paso * (Z.T @ error / n + l2 * pesos)
+        sesgo -= paso * error.mean()
+    return medias, desvios, pesos, sesgo
+
+
+def auc(y, p) -> float | None:
+    """Área bajo la curva ROC por rangos (Mann-Whitney)."""
+    positivos = int(y.sum())
+    negativos = len(y) - positivos
+    if not positivos or not negativos:
+        return None
+    orden = np.argsort(p, kind="mergesort")
+    rangos = np.empty(len(p))
+    rangos[orden] = np.arange(1, len(p) + 1)
+    return float((rangos[y == 1].sum() - positivos * (positivos + 1) / 2) / (positivos * negativos))
+
+
+def log_loss(y, p) -> float:
+    p = np.clip(p, 1e-9, 1 - 1e-9)
+    return float(-(y * np.log(p) + (1 - y) * np.log(1 - p)).mean())
+
+
+# --- entrenamiento ---
+def datos_entrenamiento(hasta=None):
+    """
+    (X, y, tasa_base) de las citas pasadas con resultado Atendida/Ausente, en orden de
+    fecha. El historial de cada cita son solo las citas ANTERIORES del mismo paciente
+    (sumas acumuladas por paciente con NumPy, sin mirar el futuro).
+    """
+    hasta = hasta or timezone.now()
+    ids = _ids_estado(AUSENTE, ATENDIDA, CANCELADA)
+    if ids[AUSENTE] is None or ids[ATENDIDA] is None:
+        raise ValueError("Faltan los estados Ausente/Atendida en el catálogo.")
+    finales = [i for i in ids.values() if i is not None]
+
+    ultimo, intentos = _ultimo_contacto()
+    filas = list(Cita.objects
+                 .filter(agenda__inicio__lt=hasta, estado_id__in=finales)
+                 .annotate(dia=ExtractIsoWeekDay("agenda__inicio"), hora=ExtractHour("agenda__inicio"),
+                           ultimo=ultimo, intentos=intentos)
+                 .values_list("paciente_id", "agenda__inicio", "creado_en", "estado_id",
+                              "dia", "hora", "ultimo", "intentos"))
+    if not filas:
+        return np.empty((0, len(VARIABLES))), np.empty(0), 0.0
+
+    paciente, inicio, creado, estado, dia, hora, ult, intent = zip(*filas)
+    paciente = np.asarray(paciente)
+    inicio_s = np.array([d.timestamp() for d in inicio])
+    creado_s = np.array([d.timestamp() for d in creado])
+    estado = np.asarray(estado)
+
+    orden = np.lexsort((inicio_s, paciente))
+    paciente, inicio_s, creado_s, estado = paciente[orden], inicio_s[orden], creado_s[orden], estado[orden]
+    dia, hora = np.asarray(dia)[orden], np.asarray(hora)[orden]
+    ult = np.array([u or "" for u in ult], dtype=object)[orden]
+    intent = np.array([i or 0 for i in intent])[orden]
+
+    aus = (estado == ids[AUSENTE]).astype(float)
+    canc = (estado == ids[CANCELADA]).astype(float) if ids[CANCELADA] else np.zeros(len(estado))
+
+    # Acumulados ANTERIORES dentro de cada paciente
+    posicion = np.arange(len(paciente))
+    es_inicio = np.r_[True, paciente[1:] != paciente[:-1]]
+    inicio_grupo = np.maximum.accumulate(np.where(es_inicio, posicion, 0))
+    n_prev = posicion - inicio_grupo
+
+    def previos(v):
+        acum = np.cumsum(v) - v
+        return acum - acum[inicio_grupo]
+
+    aus_prev, canc_prev = previos(aus), previos(canc)
+
+    # Solo se aprende de Atendida/Ausente (las canceladas solo aportan historial)
+    etiquetada = estado != ids[CANCELADA] if ids[CANCELADA] else np.ones(len(estado), dtype=bool)
+    tasa_base = float(aus[etiquetada].mean())
+    X = matriz(n_prev, aus_prev, canc_prev, (inicio_s - creado_s) / 86400, dia, hora, ult, intent, tasa_base)
+
+    cronologico = np.argsort(inicio_s[etiquetada], kind="mergesort")
+    return X[etiquetada][cronologico], aus[etiquetada][cronologico], tasa_base
+
+
+def entrenar(hasta=None, validacion=0.2) -> ModeloRiesgo:
+    """Entrena, valida en el tramo más reciente y guarda el modelo ajustado con todos los datos."""
+    X, y, tasa_base = datos_entrenamiento(hasta)
+    if len(y) < 50 or y.min() == y.max():
+        raise ValueError(f"Historial insuficiente para entrenar ({len(y)} citas con resultado).")
+
+    corte = int(len(y) * (1 - validacion))
+    metricas = {"tasa_ausencia": round(float(y.mean()), 4)}
+    if 0 < corte < len(y):
+        medias, desvios, pesos, sesgo = ajustar(X[:corte], y[:corte])
+        p = _sigmoide(((X[corte:] - medias) / desvios) @ pesos + sesgo)
+        metricas.update({"auc": auc(y[corte:], p), "log_loss": log_loss(y[corte:], p),
+                         "validacion": len(y) - corte})
+
+    medias, desvios, pesos, sesgo = ajustar(X, y)
+    return ModeloRiesgo.objects.create(
+        parametros={
+            "variables": list(VARIABLES),
+            "medias": medias.tolist(),
+            "desvios": desvios.tolist(),
+            "pesos": pesos.tolist(),
+            "sesgo": sesgo,
+            "tasa_base": tasa_base,
+        },
+        metricas=metricas,
+        muestras=len(y),
+    )
+
+
+# --- puntaje ---
+_modelo_cache = {}
+
+
+def modelo_vigente():
+    """(ModeloRiesgo, arrays) del modelo más reciente; los arrays se arman una vez por proceso."""
+    modelo = ModeloRiesgo.objects.only("pk").order_by("-creado_en").first()
+    if modelo is None:
+        return None, None
+    if _modelo_cache.get("pk") != modelo.pk:
+        par = ModeloRiesgo.objects.get(pk=modelo.pk).parametros
+        if par.get("variables") != list(VARIABLES):
+            logger.warning("Modelo de riesgo %s con otras variables: reentrenar.", modelo.pk)
+            return None, None
+        _modelo_cache.update(pk=modelo.pk, arrays=(
+            np.asarray(par["medias"]), np.asarray(par["desvios"]), np.asarray(par["pesos"]),
+            float(par["sesgo"]), float(par["tasa_base"]),
+        ))
+    return modelo, _modelo_cache["arrays"]
+
+
+def puntuar_citas(citas) -> int:
+    """
+    Calcula y guarda el puntaje de las citas del queryset (p.ej. las de mañana).
+    Devuelve cuántas se puntuaron (0 si no hay numpy o modelo).
+    """
+    if np is None:
+        return 0
+    modelo, arrays = modelo_vigente()
+    if modelo is None:
+        return 0
+    medias, desvios, pesos, sesgo, tasa_base = arrays
+    ahora = timezone.now()
+
+    ultimo, intentos = _ultimo_contacto()
+    filas = list(citas
+                 .annotate(dia=ExtractIsoWeekDay("agenda__inicio"), hora=ExtractHour("agenda__inicio"),
+                           ultimo=ultimo, intentos=intentos)
+                 .values_list("pk", "paciente_id", "agenda__inicio", "creado_en", "dia", "hora", "ultimo", "intentos"))
+    if not filas:
+        return 0
+    cita_id, paciente, inicio, creado, dia, hora, ult, intent = zip(*filas)
+
+    # Historial de esos pacientes (todo lo anterior a hoy), agregado en SQL
+    ids = _ids_estado(AUSENTE, ATENDIDA, CANCELADA)
+    historial = {
+        pid: (n, a, c) for pid, n, a, c in
+        Cita.objects
+        .filter(paciente_id__in=set(paciente), agenda__inicio__lt=ahora,
+                estado_id__in=[i for i in ids.values() if i is not None])
+        .values("paciente_id")
+        .annotate(n=Count("pk"),
+                  a=Count("pk", filter=Q(estado_id=ids[AUSENTE])),
+                  c=Count("pk", filter=Q(estado_id=ids[CANCELADA])))
+        .values_list("paciente_id", "n", "a", "c")
+    }
+    n_prev, aus_prev, canc_prev = (np.array([historial.get(p, (0, 0, 0))[k] for p in paciente]) for k in range(3))
+    anticipacion = np.array([(i - c).total_seconds() for i, c in zip(inicio, creado)]) / 86400
+
+    X = matriz(n_prev, aus_prev, canc_prev, anticipacion, dia, hora,
+               [u or "" for u in ult], [i or 0 for i in intent], tasa_base)
+    p = _sigmoide(((X - medias) / desvios) @ pesos + sesgo)
+
+    PuntajeRiesgoCita.objects.bulk_create(
+        [PuntajeRiesgoCita(cita_id=c, puntaje=float(v), modelo=modelo) for c, v in zip(cita_id, p)],
+        update_conflicts=True, unique_fields=["cita"], update_fields=["puntaje", "modelo", "calculado_en"],
+    )
+    return len(cita_id)
+
+
+def citas_por_puntuar(desde, hasta):
+    """Citas aún abiertas (Pendiente/Confirmada) con atención en [desde, hasta)."""
+    return (Cita.objects
+            .filter(agenda__inicio__gte=desde, agenda__inicio__lt=hasta,
+                    estado__nombre__in=ABIERTOS))
+
+
+def puntuar_proximas(dias: int, desde=None) -> int:
+    desde = desde or timezone.now()
+    return puntuar_citas(citas_por_puntuar(desde, desde + timedelta(days=dias)))
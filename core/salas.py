@@ -0,0 +1,157 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.utils import timezone
+
+from core.models import Agenda, Cita, Ubicacion
+from core.proyecciones import _limites
+
+# =========================
+#  SALAS: CAPACIDAD Y CONFLICTOS POR UBICACIÓN
+# =========================
+# Cada ubicación (Box, sala grupal) admite a la vez `capacidad` bloques presenciales;
+# las teleconsultas y los sobrecupos (comparten el bloque de la titular) no ocupan sala.
+# - Generación: indice_salas() carga una vez los bloques presenciales de los demás
+#   profesionales en el rango y cada slot se revisa con búsqueda binaria por sala.
+# - Reserva: verificar_sala() bloquea la fila de la ubicación (serializa las reservas
+#   de esa sala) y revisa cuántas citas presenciales coinciden con el bloque.
+
+
+def max_simultaneos(intervalos, inicio, fin) -> int:
+    """Máximo de intervalos que coinciden en algún instante de [inicio, fin)."""
+    eventos = []
+    for ini, ter in intervalos:
+        if ini < fin and ter > inicio:
+            eventos.append((max(ini, inicio), 1))
+            eventos.append((min(ter, fin), -1))
+    # A igual instante, los que terminan (-1) salen antes de los que empiezan
+    eventos.sort()
+    actual = maximo = 0
+    for _, delta in eventos:
+        actual += delta
+        maximo = max(maximo, actual)
+    return maximo
+
+
+class OcupacionSala:
+    """Bloques presenciales de una sala ordenados por inicio (índice de intervalos)."""
+    __slots__ = ("capacidad", "inicios", "fines", "duracion_max")
+
+    def __init__(self, capacidad, intervalos=()):
+        ordenados = sorted(intervalos)
+        self.capacidad = capacidad
+        self.inicios = [ini for ini, _ in ordenados]
+        self.fines = [fin for _, fin in ordenados]
+        self.duracion_max = max((fin - ini for ini, fin in ordenados), default=timedelta(0))
+
+    def simultaneos(self, inicio, fin) -> int:
+        # Solo pueden cruzarse los bloques que empiezan en (inicio - duracion_max, fin)
+        desde = bisect_right(self.inicios, inicio - self.duracion_max)
+        hasta = bisect_left(self.inicios, fin)
+        return max_simultaneos(
+            ((self.inicios[k], self.fines[k]) for k in range(desde, hasta)), inicio, fin
+        )
+
+    def libre(self, inicio, fin) -> bool:
+        return self.simultaneos(inicio, fin) < self.capacidad
+
+
+def indice_salas(desde, hasta, excluir_profesional_id=None) -> dict[int, OcupacionSala]:
+    """
+    {ubicacion_id: OcupacionSala} con los bloques presenciales que se cruzan con
+    [desde, hasta), en una sola consulta. Las salas sin bloques no aparecen (están libres).
+    """
+    qs = Agenda.objects.filter(
+        modalidad=Agenda.Modalidad.PRESENCIAL, inicio__lt=hasta, fin__gt=desde,
+    )
+    if excluir_profesional_id:
+        qs = qs.exclude(profesional_id=excluir_profesional_id)
+
+    capacidades, intervalos = {}, {}
+    for ubicacion_id, capacidad, ini, fin in qs.values_list("ubicacion_id", "ubicacion__capacidad", "inicio", "fin"):
+        capacidades[ubicacion_id] = capacidad
+        intervalos.setdefault(ubicacion_id, []).append((ini, fin))
+    return {u: OcupacionSala(capacidades[u], ivs) for u, ivs in intervalos.items()}
+
+
+def verificar_sala(slot: Agenda):
+    """
+    Al reservar un bloque presencial: ValidationError si en algún momento del bloque la sala
+    ya tiene `capacidad` citas presenciales en curso. Debe llamarse dentro de la transacción
+    de la reserva.
+    """
+    if slot.modalidad != Agenda.Modalidad.PRESENCIAL:
+        return
+    sala = Ubicacion.objects.select_for_update().get(pk=slot.ubicacion_id)
+    cruzadas = (Cita.objects
+                .filter(sobrecupo=False, agenda__ubicacion_id=sala.pk,
+                        agenda__modalidad=Agenda.Modalidad.PRESENCIAL,
+                        agenda__inicio__lt=slot.fin, agenda__fin__gt=slot.inicio)
+                .exclude(agenda_id=slot.pk)
+                .values_list("agenda__inicio", "agenda__fin"))
+    if max_simultaneos(cruzadas, slot.inicio, slot.fin) >= sala.capacidad:
+        raise ValidationError(f"{sala.nombre} ya está ocupada en ese horario.")
+
+
+# =========================
+#  OCUPACIÓN POR SALA Y HORA
+# =========================
+
+_SQL_OCUPACION = f"""
+    SELECT u.id, u.nombre, u.capacidad, EXTRACT(HOUR FROM h.hora)::int AS hora,
+           SUM(EXTRACT(EPOCH FROM LEAST(a.fin_l, h.hora + INTERVAL '1 hour') - GREATEST(a.ini_l, h.hora))) / 60,
+           COALESCE(SUM(EXTRACT(EPOCH FROM LEAST(a.fin_l, h.hora + INTERVAL '1 hour') - GREATEST(a.ini_l, h.hora)))
+                    FILTER (WHERE c.id IS NOT NULL), 0) / 60
+      FROM (SELECT id, ubicacion_id, inicio AT TIME ZONE %(tz)s AS ini_l, fin AT TIME ZONE %(tz)s AS fin_l
+              FROM {Agenda._meta.db_table}
+             WHERE inicio >= %(desde)s AND inicio < %(hasta)s AND modalidad = %(presencial)s) a
+      JOIN {Ubicacion._meta.db_table} u ON u.id = a.ubicacion_id
+      LEFT JOIN {Cita._meta.db_table} c ON c.agenda_id = a.id AND NOT c.sobrecupo
+     CROSS JOIN LATERAL generate_series(date_trunc('hour', a.ini_l), a.fin_l - INTERVAL '1 microsecond',
+                                        INTERVAL '1 hour') AS h(hora)
+     GROUP BY u.id, u.nombre, u.capacidad, 4
+     ORDER BY u.nombre, 4
+"""
+
+
+def dias_habiles(desde: date, hasta: date) -> int:
+    """Días de lunes a viernes en [desde, hasta)."""
+    semanas, resto = divmod((hasta - desde).days, 7)
+    return semanas * 5 + sum(1 for k in range(resto) if (desde + timedelta(days=k)).weekday() < 5)
+
+
+def ocupacion_por_hora(desde: date, hasta: date) -> dict:
+    """
+    Minutos programados y ocupados (con cita) por sala y hora local en [desde, hasta),
+    con una sola consulta agregada: cada bloque presencial se reparte entre las horas
+    que cubre. El porcentaje es sobre capacidad × 60 min × días hábiles del rango.
+    La consulta es de PostgreSQL (generate_series, LATERAL, FILTER): en otro motor el
+    reporte sale vacío con soportado=False.
+    """
+    dias = dias_habiles(desde, hasta) or 1
+    if connection.vendor != "postgresql":
+        return {"horas": [], "salas": [], "dias": dias, "soportado": False}
+
+    ini, fin = _limites(desde, hasta)
+    with connection.cursor() as cur:
+        cur.execute(_SQL_OCUPACION, {
+            "tz": timezone.get_current_timezone_name(),
+            "desde": ini, "hasta": fin,
+            "presencial": Agenda.Modalidad.PRESENCIAL,
+        })
+        filas = cur.fetchall()
+
+    horas = sorted({f[3] for f in filas})
+    salas = {}
+    for uid, nombre, capacidad, hora, programado, ocupado in filas:
+        sala = salas.setdefault(uid, {"nombre": nombre, "capacidad": capacidad, "celdas": {}})
+        disponible = capacidad * 60 * dias
+        sala["celdas"][hora] = {
+            "programado": round(100 * float(programado) / disponible),
+            "ocupado": round(100 * float(ocupado) / disponible),
+        }
+    for sala in salas.values():
+        sala["celdas"] = [sala["celdas"].get(h) for h in horas]
+    return {"horas": horas, "salas": list(salas.values()), "dias": dias, "soportado": True}
@@ -0,0 +1,41 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends import signed_cookies
+
+# =========================
+#  SESIONES SEGÚN LA ZONA DEL SITIO
+# =========================
+# Personal (panel, admin, ingreso): SESION_STAFF_ENGINE (cached_db por defecto: la sesión
+# se lee de la caché y la BD queda como respaldo). Portal de pacientes y páginas públicas:
+# SESION_PACIENTES_ENGINE (cookie firmada por defecto: solo guarda paciente_id y algunas
+# marcas, no hace consultas ni escrituras en la BD). Cada zona usa su propia cookie.
+
+PREFIJOS_STAFF = ("/panel", "/admin", "/ingreso", "/salir", "/entrar", "/cuenta", "/acceso-denegado")
+
+
+class SessionStore(signed_cookies.SessionStore):
+    """Cookie firmada con duración propia para pacientes (SESION_PACIENTES_EDAD)."""
+
+    def get_session_cookie_age(self):
+        return getattr(settings, "SESION_PACIENTES_EDAD", settings.SESSION_COOKIE_AGE)
+
+
+def es_zona_staff(path: str) -> bool:
+    return path.startswith(PREFIJOS_STAFF)
+
+
+def motor_para_ruta(path: str):
+    """(clase SessionStore, nombre de cookie) que corresponde a la ruta."""
+    if es_zona_staff(path):
+        return _store(settings.SESION_STAFF_ENGINE), settings.SESSION_COOKIE_NAME
+    return _store(settings.SESION_PACIENTES_ENGINE), settings.SESION_PACIENTES_COOKIE
+
+
+_stores = {}
+
+
+def _store(engine: str):
+    if engine not in _stores:
+        _stores[engine] = import_module(engine).SessionStore
+    return _stores[engine]
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+
+from core import agendas, catalogos, directorio, lista_espera
+from core.models import Cita, Especialidad, ExcepcionAgenda, Profesional
+
+
+def conectar():
+    # Catálogos en memoria: cualquier alta/cambio/baja invalida la copia del proceso
+    for cat in catalogos.CATALOGOS:
+        uid = f"catalogo-{cat.model._meta.label_lower}"
+        post_save.connect(cat.invalidar, sender=cat.model, weak=False, dispatch_uid=f"{uid}-save")
+        post_delete.connect(cat.invalidar, sender=cat.model, weak=False, dispatch_uid=f"{uid}-delete")
+
+    # Directorio público: una edición de profesionales o especialidades cambia la versión
+    for model in (Profesional, Especialidad):
+        uid = f"directorio-{model._meta.label_lower}"
+        post_save.connect(directorio.invalidar, sender=model, weak=False, dispatch_uid=f"{uid}-save")
+        post_delete.connect(directorio.invalidar, sender=model, weak=False, dispatch_uid=f"{uid}-delete")
+
+    # Lista de espera: una cita borrada (cancelación) libera su bloque
+    post_delete.connect(lista_espera.al_borrar_cita, sender=Cita, weak=False,
+                        dispatch_uid="lista-espera-cita-delete")
+
+    # Excepciones de agenda: al crearlas se borran los slots libres que cubren;
+    # al acortarlas o borrarlas se regenera lo que quedó disponible
+    post_save.connect(agendas.al_guardar_excepcion, sender=ExcepcionAgenda, weak=False,
+                      dispatch_uid="excepcion-agenda-save")
+    post_delete.connect(agendas.al_borrar_excepcion, sender=ExcepcionAgenda, weak=False,
+                        dispatch_uid="excepcion-agenda-delete")
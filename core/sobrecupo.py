@@ -0,0 +1,164 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+
+from core import catalogos
+from core.models import Agenda, Cita, Profesional
+
+# =========================
+#  SOBRECUPO SEGÚN AUSENTISMO HISTÓRICO
+# =========================
+# Franja = (profesional, hora local). Con una consulta agregada sobre las citas cerradas
+# (Atendida/Ausente) se obtiene la tasa de ausencia de cada franja, suavizada hacia la del
+# profesional cuando hay poco historial.
+# Con tasa p y n pacientes citados al mismo bloque (cada uno falta con prob. p):
+#   - el bloque se usa si llega al menos uno:      U(n) = 1 - p^n
+#   - pacientes que esperan de más (desborde):     E(n) = n(1 - p) - U(n)
+# Conviene citar uno más mientras lo que se gana en uso supera el costo del desborde
+# (SOBRECUPO_COSTO_DESBORDE, en bloques): p^n > c / (1 + c).
+# aplicar() deja el resultado en Agenda.sobrecupo_max de los bloques futuros; recepción
+# agenda el sobrecupo con asignar_cita(..., sobrecupo=True).
+
+AUSENTE, ATENDIDA = "Ausente", "Atendida"
+_PESO_PREVIO = 20       # citas "virtuales" con la tasa del profesional (franjas con poco historial)
+
+
+def utilizacion(p: float, n: int) -> float:
+    return 1 - p ** n
+
+
+def desborde(p: float, n: int) -> float:
+    """Pacientes esperados por sobre el primero que llega al bloque."""
+    return n * (1 - p) - utilizacion(p, n)
+
+
+def cupos_extra(p: float, citas: int) -> int:
+    """Sobrecupos que convienen en una franja con tasa de ausencia p y `citas` de historial."""
+    if citas < settings.SOBRECUPO_MIN_CITAS:
+        return 0
+    c = settings.SOBRECUPO_COSTO_DESBORDE
+    umbral = c / (1 + c)
+    extra = 0
+    while extra < settings.SOBRECUPO_MAX_POR_BLOQUE and p ** (1 + extra) > umbral:
+        extra += 1
+    return extra
+
+
+class FilaPolitica:
+    """Política de sobrecupo de una franja, con su efecto esperado en los bloques futuros."""
+    __slots__ = ("profesional_id", "profesional", "hora", "citas", "ausentes", "tasa", "extra", "bloques")
+
+    def __init__(self, profesional_id, profesional, hora, citas, ausentes, tasa, bloques):
+        self.profesional_id = profesional_id
+        self.profesional = profesional
+        self.hora = hora
+        self.citas = citas
+        self.ausentes = ausentes
+        self.tasa = tasa
+        self.extra = cupos_extra(tasa, citas)
+        self.bloques = bloques
+
+    @property
+    def utilizacion_actual(self):
+        return utilizacion(self.tasa, 1)
+
+    @property
+    def utilizacion(self):
+        return utilizacion(self.tasa, 1 + self.extra)
+
+    @property
+    def desborde(self):
+        return desborde(self.tasa, 1 + self.extra)
+
+    @property
+    def atenciones_extra(self):
+        """Bloques atendidos de más en el horizonte (si se llenan los sobrecupos)."""
+        return (self.utilizacion - self.utilizacion_actual) * self.bloques
+
+
+# --- consultas ---
+def tasas_ausencia(desde, hasta, profesional_id=None) -> dict:
+    """{(profesional_id, hora): (citas, ausentes)} de las citas cerradas en [desde, hasta)."""
+    ausente = catalogos.estados.por_nombre(AUSENTE)
+    atendida = catalogos.estados.por_nombre(ATENDIDA)
+    if ausente is None:
+        return {}
+    qs = Cita.objects.filter(
+        estado_id__in=[e.pk for e in (ausente, atendida) if e],
+        agenda__inicio__gte=desde, agenda__inicio__lt=hasta,
+    )
+    if profesional_id:
+        qs = qs.filter(agenda__profesional_id=profesional_id)
+    filas = (qs.annotate(hora=ExtractHour("agenda__inicio", tzinfo=timezone.get_current_timezone()))
+             .values_list("agenda__profesional_id", "hora")
+             .annotate(citas=Count("pk"), ausentes=Count("pk", filter=Q(estado_id=ausente.pk)))
+             .order_by())
+    return {(prof, hora): (n, aus) for prof, hora, n, aus in filas}
+
+
+def _bloques_futuros(desde, hasta, profesional_id=None):
+    qs = Agenda.objects.filter(inicio__gte=desde, inicio__lt=hasta)
+    if profesional_id:
+        qs = qs.filter(profesional_id=profesional_id)
+    filas = (qs.annotate(hora=ExtractHour("inicio", tzinfo=timezone.get_current_timezone()))
+             .values_list("profesional_id", "hora")
+             .annotate(n=Count("pk"))
+             .order_by())
+    return {(prof, hora): n for prof, hora, n in filas}
+
+
+def politica(semanas: int = 26, dias: int = 14, profesional_id=None, ahora=None) -> list[FilaPolitica]:
+    """
+    Una fila por franja con bloques en los próximos `dias`, según el historial de las
+    últimas `semanas`. Tres consultas agregadas (historial, bloques, nombres).
+    """
+    ahora = ahora or timezone.now()
+    historial = tasas_ausencia(ahora - timedelta(weeks=semanas), ahora, profesional_id)
+    bloques = _bloques_futuros(ahora, ahora + timedelta(days=dias), profesional_id)
+
+    # Suavizado: franja -> profesional -> COSAM
+    total = sum(n for n, _ in historial.values())
+    tasa_global = sum(a for _, a in historial.values()) / total if total else 0.0
+    por_prof = {}
+    for (prof, _), (n, aus) in historial.items():
+        acumulado = por_prof.setdefault(prof, [0, 0])
+        acumulado[0] += n
+        acumulado[1] += aus
+    tasa_prof = {prof: (aus + _PESO_PREVIO * tasa_global) / (n + _PESO_PREVIO)
+                 for prof, (n, aus) in por_prof.items()}
+
+    nombres = {p.pk: str(p) for p in Profesional.objects.filter(pk__in={prof for prof, _ in bloques})}
+    filas = []
+    for (prof, hora), n_bloques in sorted(bloques.items(), key=lambda kv: (nombres.get(kv[0][0], ""), kv[0][1])):
+        n, aus = historial.get((prof, hora), (0, 0))
+        tasa = (aus + _PESO_PREVIO * tasa_prof.get(prof, tasa_global)) / (n + _PESO_PREVIO)
+        filas.append(FilaPolitica(prof, nombres.get(prof, prof), hora, n, aus, tasa, n_bloques))
+    return filas
+
+
+@transaction.atomic
+def aplicar(filas: list[FilaPolitica], dias: int = 14, ahora=None) -> int:
+    """
+    Fija Agenda.sobrecupo_max en los bloques futuros de los profesionales de la política:
+    un UPDATE que los deja en 0 y uno por (profesional, cupos) con las horas que corresponden.
+    """
+    ahora = ahora or timezone.now()
+    futuros = Agenda.objects.filter(inicio__gte=ahora, inicio__lt=ahora + timedelta(days=dias))
+    futuros.filter(profesional_id__in={f.profesional_id for f in filas}).update(sobrecupo_max=0)
+
+    grupos = {}
+    for f in filas:
+        if f.extra:
+            grupos.setdefault((f.profesional_id, f.extra), []).append(f.hora)
+    tz = timezone.get_current_timezone()
+    actualizados = 0
+    for (prof, extra), horas in grupos.items():
+        actualizados += (futuros.filter(profesional_id=prof)
+                         .annotate(hora=ExtractHour("inicio", tzinfo=tz))
+                         .filter(hora__in=horas)
+                         .update(sobrecupo_max=extra))
+    return actualizados
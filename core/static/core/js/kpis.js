@@ -0,0 +1,120 @@
+/* Dashboard de KPIs de recepción: pide /kpis/data/ y dibuja con Chart.js */
+const URL_DATOS = document.currentScript.dataset.urlDatos;
+const $ = sel => document.querySelector(sel);
+let chLine, chPie;
+
+/* Paleta con orden “clínico”:
+   0: Atendidas (verde)
+   1: Ausentes (rojo)
+   2: Canceladas (amarillo)
+   3: Confirmadas (azul)
+   El resto se usa para otros estados si aparecen.
+*/
+function palette(n){
+  const colors = [
+    '#10b981', // verde  - atendidas
+    '#ef4444', // rojo   - ausentes
+    '#f59e0b', // amarillo - canceladas
+    '#3b82f6', // azul   - confirmadas
+    '#a855f7',
+    '#eab308',
+    '#0ea5e9',
+    '#22c55e',
+    '#facc15',
+    '#6b7280'
+  ];
+  while(colors.length < n){ colors.push('#6b7280'); }
+  return colors.slice(0,n);
+}
+
+function toDatasets(series, labels){
+  const estados = Object.keys(series);
+  const cols = palette(estados.length);
+  return estados.map((est, i) => ({
+    label: est,
+    data: series[est],
+    borderColor: cols[i],
+    backgroundColor: cols[i],
+    tension: .25,
+    fill: false,
+    pointRadius: 3,
+    pointHoverRadius: 5
+  }));
+}
+
+async function fetchData(){
+  const params = new URLSearchParams(new FormData($('#filtros'))).toString();
+  const res = await fetch(`${URL_DATOS}?${params}`);
+  return await res.json();
+}
+
+function renderCharts(data){
+  const labels = data.labels_semanas;
+  const datasets = toDatasets(data.series, labels);
+
+  // Line
+  if (chLine) chLine.destroy();
+  chLine = new Chart($('#chLine'), {
+    type: 'line',
+    data: { labels, datasets },
+    options: {
+      responsive: true,
+      maintainAspectRatio: false,
+      plugins: {
+        legend: { position: 'bottom' }
+      },
+      scales: {
+        y: { beginAtZero: true, ticks: { precision: 0 } }
+      }
+    }
+  });
+
+  // Pie / Doughnut
+  const distKeys = Object.keys(data.distribucion);
+  const distVals = distKeys.map(k => data.distribucion[k]);
+  if (chPie) chPie.destroy();
+  chPie = new Chart($('#chPie'), {
+    type: 'doughnut',
+    data: {
+      labels: distKeys,
+      datasets: [{ data: distVals, backgroundColor: palette(distKeys.length) }]
+    },
+    options: {
+      responsive: true,
+      maintainAspectRatio: false,
+      plugins: {
+        legend: { position: 'bottom' }
+      },
+      cutout: '60%'
+    }
+  });
+}
+
+function renderKPIs(k){
+  $('#kpi-total').textContent       = k.total;
+  $('#kpi-atendidas').textContent   = k.atendidas;
+  $('#kpi-ausentes').textContent    = k.ausentes;
+  $('#kpi-canceladas').textContent  = k.canceladas;
+  $('#kpi-confirmadas').textContent = k.confirmadas;
+  $('#kpi-asistencia').textContent  = (k.tasa_asistencia ?? 0) + '%';
+}
+
+async function boot(){
+  const data = await fetchData();
+  renderCharts(data);
+  renderKPIs(data.kpis);
+
+  // Actualizar badge de rango (por si el backend ajusta fechas)
+  if (data.rango) {
+    const { desde, hasta } = data.rango;
+    const badge = document.getElementById('badge-rango');
+    if (badge) badge.textContent = `${desde} – ${hasta}`;
+  }
+}
+
+$('#filtros').addEventListener('submit', async (e) => {
+  e.preventDefault();
+  await boot();
+});
+
+boot();
@@ -0,0 +1,45 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from core import estaticos
+
+register = template.Library()
+
+
+@register.simple_tag
+def imagen_responsive(ruta, alt="", clase="", sizes="100vw", lazy=True):
+    """
+    <picture> con WebP + formato original redimensionados (srcset por ancho). Si falta el
+    build de variantes, queda el <img> de siempre apuntando a la imagen original.
+    """
+    variantes = estaticos.variantes_de(ruta)
+    carga = "lazy" if lazy else "eager"
+    if not variantes:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="{}" decoding="async">',
+                           static(ruta), clase, alt, carga)
+
+    def srcset(extension):
+        return ", ".join(
+            f"{static(estaticos.nombre_variante(ruta, ancho, ext))} {ancho}w"
+            for ancho, ext in variantes if ext == extension
+        )
+
+    # WebP para quien lo soporte; el <img> usa la variante en el formato original (jpg/png)
+    respaldo = next((ext for _, ext in variantes if ext != "webp"), None)
+    fuente = format_html('<source type="image/webp" srcset="{}" sizes="{}">', srcset("webp"), sizes)
+    if respaldo:
+        mayor = max(ancho for ancho, ext in variantes if ext == respaldo)
+        img = format_html('<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="{}" decoding="async">',
+                          static(estaticos.nombre_variante(ruta, mayor, respaldo)), srcset(respaldo),
+                          sizes, clase, alt, carga)
+    else:
+        img = format_html('<img src="{}" class="{}" alt="{}" loading="{}" decoding="async">',
+                          static(ruta), clase, alt, carga)
+    return format_html("<picture>{}{}</picture>", fuente, img)
+
+
+@register.simple_tag
+def asset_vendor(nombre):
+    """URL de una librería de terceros (local si fue vendorizada, si no el CDN)."""
+    return estaticos.url_vendor(nombre)
@@ -1,3 +1,218 @@
-from django.test import TestCase
+from datetime import datetime, time, timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.agendas import guardar_horario
+from core.citas import asignar_cita, cancelar_cita
+from core.models import (
+    Agenda, Cita, Especialidad, EstadoCita, ListaEspera, Paciente, PlantillaAtencion, Profesional, Role, Ubicacion,
+    UserRole,
+)
+
+
+class BaseAgenda(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pendiente = EstadoCita.objects.create(nombre="Pendiente")
+        cls.especialidad = Especialidad.objects.create(nombre="Psicología")
+        cls.prof = Profesional.objects.create(nombre="Ana", apellido="Prueba", especialidad=cls.especialidad)
+        cls.box = Ubicacion.objects.create(nombre="Box 1")
+        cls.pacientes = [
+            Paciente.objects.create(rut=f"1111111{k}-{k}", nombres=f"Paciente {k}", apellidos="Prueba")
+            for k in range(4)
+        ]
+
+    def bloque(self, dias=2, hora=10, sobrecupo_max=0):
+        inicio = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=dias), time(hora)))
+        return Agenda.objects.create(profesional=self.prof, ubicacion=self.box, inicio=inicio,
+                                     fin=inicio + timedelta(minutes=30), sobrecupo_max=sobrecupo_max)
+
+    def asignar(self, slot, paciente, **kwargs):
+        return asignar_cita(slot.pk, paciente, self.pendiente, None, **kwargs)
+
+
+# =========================
+#  SOBRECUPO: UN TITULAR POR BLOQUE
+# =========================
+
+class SobrecupoTests(BaseAgenda):
+    def test_titular_mas_un_sobrecupo_y_el_tercero_se_rechaza(self):
+        slot = self.bloque(sobrecupo_max=1)
+        titular = self.asignar(slot, self.pacientes[0])
+        extra = self.asignar(slot, self.pacientes[1], sobrecupo=True)
+        self.assertFalse(titular.sobrecupo)
+        self.assertTrue(extra.sobrecupo)
+
+        with self.assertRaisesMessage(ValidationError, "no admite más sobrecupos"):
+            self.asignar(slot, self.pacientes[2], sobrecupo=True)
+        self.assertEqual(slot.citas.count(), 2)
+
+    def test_sin_sobrecupo_el_bloque_tomado_se_rechaza(self):
+        slot = self.bloque(sobrecupo_max=1)
+        self.asignar(slot, self.pacientes[0])
+        with self.assertRaisesMessage(ValidationError, "ya fue asignado"):
+            self.asignar(slot, self.pacientes[1])
+
+    def test_bloque_sin_sobrecupo_max_no_admite_extras(self):
+        slot = self.bloque()
+        self.asignar(slot, self.pacientes[0])
+        with self.assertRaisesMessage(ValidationError, "no admite más sobrecupos"):
+            self.asignar(slot, self.pacientes[1], sobrecupo=True)
+
+    def test_la_base_rechaza_dos_titulares(self):
+        slot = self.bloque()
+        Cita.objects.create(agenda=slot, paciente=self.pacientes[0], estado=self.pendiente)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cita.objects.create(agenda=slot, paciente=self.pacientes[1], estado=self.pendiente)
+
+    def test_cancelar_titular_promueve_el_sobrecupo(self):
+        slot = self.bloque(sobrecupo_max=1)
+        titular = self.asignar(slot, self.pacientes[0])
+        extra = self.asignar(slot, self.pacientes[1], sobrecupo=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancelar_cita(titular.pk, None)
+
+        extra.refresh_from_db()
+        self.assertFalse(extra.sobrecupo)
+        self.assertEqual(list(slot.citas.values_list("pk", flat=True)), [extra.pk])
+        # El bloque vuelve a aceptar un sobrecupo
+        self.asignar(slot, self.pacientes[2], sobrecupo=True)
+
+    def test_al_liberarse_el_bloque_pasa_a_la_lista_de_espera(self):
+        slot = self.bloque(sobrecupo_max=1)
+        titular = self.asignar(slot, self.pacientes[0])
+        extra = self.asignar(slot, self.pacientes[1], sobrecupo=True)
+        espera = ListaEspera.objects.create(paciente=self.pacientes[3], especialidad=self.especialidad,
+                                            profesional=self.prof)
+
+        # Con sobrecupo promovido el bloque sigue tomado: la lista de espera no recibe nada
+        with self.captureOnCommitCallbacks(execute=True):
+            cancelar_cita(titular.pk, None)
+        espera.refresh_from_db()
+        self.assertEqual(espera.estado, ListaEspera.Estado.ACTIVA)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancelar_cita(extra.pk, None)
+        espera.refresh_from_db()
+        self.assertEqual(espera.estado, ListaEspera.Estado.ASIGNADA)
+        cita = slot.citas.get()
+        self.assertEqual((cita.paciente_id, cita.sobrecupo), (self.pacientes[3].pk, False))
+        self.assertEqual(espera.cita_id, cita.pk)
+
+
+# =========================
+#  HORARIO SEMANAL: SOLO SE APLICA LA DIFERENCIA
+# =========================
+
+class GuardarHorarioTests(BaseAgenda):
+    def tramo(self, hora_inicio, hora_fin, dia=PlantillaAtencion.DiaSemana.MIERCOLES):
+        return {"dia_semana": dia, "hora_inicio": time(hora_inicio), "hora_fin": time(hora_fin),
+                "duracion_minutos": 30, "modalidad": Agenda.Modalidad.PRESENCIAL, "ubicacion": self.box}
+
+    def slots(self, **filtros):
+        return {timezone.localtime(a.inicio) for a in Agenda.objects.filter(profesional=self.prof, **filtros)}
+
+    def test_acortar_la_ventana_conserva_slots_y_citas(self):
+        guardar_horario(self.prof, [self.tramo(9, 12)], weeks_ahead=2)
+        antes = self.slots()
+        self.assertTrue(antes)
+        tomado = Agenda.objects.filter(profesional=self.prof).order_by("-inicio").first()   # 11:30
+        self.asignar(tomado, self.pacientes[0])
+
+        m = guardar_horario(self.prof, [self.tramo(9, 11)], weeks_ahead=2)
+
+        despues = self.slots()
+        dentro = {s for s in antes if s.time() < time(11)}
+        fuera_libres = {s for s in antes if s.time() >= time(11)} - {timezone.localtime(tomado.inicio)}
+        self.assertEqual(m["created"], 0)
+        self.assertEqual(m["kept_free"], len(dentro))
+        self.assertEqual(m["deleted_free"], len(fuera_libres))
+        self.assertEqual(despues, dentro | {timezone.localtime(tomado.inicio)})
+        self.assertTrue(Cita.objects.filter(agenda=tomado).exists())
+
+    def test_sin_cambios_no_toca_las_agendas(self):
+        guardar_horario(self.prof, [self.tramo(9, 12)], weeks_ahead=2)
+        ids = set(Agenda.objects.filter(profesional=self.prof).values_list("pk", flat=True))
+
+        m = guardar_horario(self.prof, [self.tramo(9, 12)], weeks_ahead=2)
+
+        self.assertEqual((m["created"], m["deleted_free"], m["plantillas_sin_cambios"]), (0, 0, 1))
+        self.assertEqual(set(Agenda.objects.filter(profesional=self.prof).values_list("pk", flat=True)), ids)
+
+    def test_agregar_un_tramo_solo_genera_ese_dia(self):
+        guardar_horario(self.prof, [self.tramo(9, 12)], weeks_ahead=2)
+        ids = set(Agenda.objects.filter(profesional=self.prof).values_list("pk", flat=True))
+
+        m = guardar_horario(self.prof, [self.tramo(9, 12), self.tramo(15, 16, PlantillaAtencion.DiaSemana.JUEVES)],
+                            weeks_ahead=2)
+
+        nuevos = Agenda.objects.filter(profesional=self.prof).exclude(pk__in=ids)
+        self.assertEqual(m["created"], nuevos.count())
+        self.assertTrue(nuevos.exists())
+        self.assertTrue(all(timezone.localtime(a.inicio).isoweekday() == 4 for a in nuevos))
+
+
+# =========================
+#  LISTADOS DE AGENDA: PARÁMETROS DE LA URL
+# =========================
+
+# Las plantillas usan {% static %}: sin collectstatic no hay manifiesto
+@override_settings(STORAGES={
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+class ListadosAgendaTests(BaseAgenda):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.usuario_prof = User.objects.create_user("prof_prueba", password="x")
+        UserRole.objects.create(usuario=cls.usuario_prof, rol=Role.objects.create(nombre="Profesional"))
+        cls.prof.usuario = cls.usuario_prof
+        cls.prof.save(update_fields=["usuario"])
+        cls.usuario_recep = User.objects.create_user("recep_prueba", password="x")
+        UserRole.objects.create(usuario=cls.usuario_recep, rol=Role.objects.create(nombre="Recepción"))
+        # Sin plantilla activa el middleware manda al profesional al setup de horario
+        PlantillaAtencion.objects.create(profesional=cls.prof, dia_semana=PlantillaAtencion.DiaSemana.LUNES,
+                                         hora_inicio=time(9), hora_fin=time(10), ubicacion=cls.box)
+
+    def test_profesional_fecha_mal_formada_usa_hoy(self):
+        self.client.force_login(self.usuario_prof)
+        url = reverse("pro_agendas_list")
+        for params in ({"fecha": "abc"}, {"fecha": "2026-02-31"}, {"modo": "mes", "fecha": "2026-13-01"}):
+            r = self.client.get(url, params)
+            self.assertEqual(r.status_code, 200, params)
+            self.assertEqual(r.context["fecha"], timezone.localdate())
+
+    def test_recepcion_fecha_y_profesional_mal_formados(self):
+        self.client.force_login(self.usuario_recep)
+        url = reverse("recep_agendas_list")
+        for params in ({"fecha": "abc"}, {"fecha": "2026-02-31"}, {"prof": "abc"}, {"prof": "-1"}):
+            r = self.client.get(url, params)
+            self.assertEqual(r.status_code, 200, params)
+            self.assertEqual(r.context["fecha"], timezone.localdate())
+            self.assertIsNone(r.context["prof_id"])
+
+        r = self.client.get(url, {"prof": str(self.prof.pk)})
+        self.assertEqual(r.context["prof_id"], self.prof.pk)
+
+    def test_recepcion_oculta_sobrecupo_al_llegar_al_maximo(self):
+        slot = self.bloque(sobrecupo_max=1)
+        self.asignar(slot, self.pacientes[0])
+        self.client.force_login(self.usuario_recep)
+        params = {"fecha": f"{timezone.localtime(slot.inicio):%Y-%m-%d}", "prof": str(self.prof.pk)}
+        url_sobrecupo = reverse("recep_asignar_cita", args=[slot.pk]) + "?sobrecupo=1&next="
+
+        r = self.client.get(reverse("recep_agendas_list"), params)
+        self.assertContains(r, url_sobrecupo, count=1)
+        self.assertContains(r, "prof%3D" + str(self.prof.pk))
+
+        self.asignar(slot, self.pacientes[1], sobrecupo=True)
+        r = self.client.get(reverse("recep_agendas_list"), params)
+        self.assertNotContains(r, url_sobrecupo)
+        self.assertEqual([(a.sobrecupo, a.sobrecupos) for a in r.context["agendas"]], [(False, 1), (True, 1)])
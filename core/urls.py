@@ -52,11 +52,14 @@ urlpatterns = [
     path("panel/recepcion/agendas/<int:agenda_id>/asignar/", views.recep_asignar_cita, name="recep_asignar_cita"),
     path("panel/recepcion/citas/<int:cita_id>/cancelar/", views.recep_cancelar_cita, name="recep_cancelar_cita"),
     path("panel/recepcion/citas/<int:cita_id>/estado/", views.recep_cambiar_estado, name="recep_cambiar_estado"),
+    path("panel/recepcion/citas/cierre/", views.recep_cierre_dia, name="recep_cierre_dia"),
+    path("panel/recepcion/citas/confirmaciones/", views.recep_confirmaciones, name="recep_confirmaciones"),
 
 
     #profesional
     path("panel/profesional/", views.profesional_home, name="profesional_home"),
     path("panel/profesional/disponibilidad/", views.pro_setup_horario, name="pro_setup_horario"),
+    path("panel/profesional/horario/", views.pro_horario_api, name="pro_horario_api"),
     path("panel/profesional/agendas/", views.pro_agendas_list, name="pro_agendas_list"),
     path("panel/profesional/citas/<int:cita_id>/", views.pro_cita_detail, name="pro_cita_detail"),
 
@@ -78,6 +81,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path("panel/admin/kpis/", views.recep_kpis, name="recep_kpis"),
     path("panel/admin/kpis/data/", views.recep_kpis_data, name="recep_kpis_data"),
+    path("panel/admin/salas/", views.recep_ocupacion_salas, name="recep_ocupacion_salas"),
 
 
     #error 404 solo pacientes
@@ -1,5 +1,6 @@
 import secrets, hashlib, string
 from datetime import timedelta
+from django.db import transaction
 from django.utils import timezone
 from .models import PacienteResetToken
 
@@ -20,22 +21,36 @@ def crear_token_reset(paciente, minutos=30):
     """Crea un token de un solo uso y devuelve el token en texto plano (para el link)."""
     token = secrets.token_urlsafe(32)                 # texto plano (NO se guarda)
     token_hash = _hash_token(token)                   # guardamos solo hash
-    exp = timezone.now() + timedelta(minutes=minutos)
-    PacienteResetToken.objects.create(
-        paciente=paciente,
-        token_hash=token_hash,
-        expires_at=exp,
-    )
+    ahora = timezone.now()
+    exp = ahora + timedelta(minutes=minutos)
+    with transaction.atomic():
+        # Solo vale el último enlace: los anteriores se invalidan en un único UPDATE
+        PacienteResetToken.vigentes(ahora).filter(paciente=paciente).update(used_at=ahora)
+        PacienteResetToken.objects.create(
+            paciente=paciente,
+            token_hash=token_hash,
+            expires_at=exp,
+        )
     return token
 
 def obtener_token_valido(token_plano: str):
     """Busca un token no usado y no expirado. Devuelve instancia o None."""
     token_hash = _hash_token(token_plano)
-    try:
-        obj = PacienteResetToken.objects.select_related("paciente").get(token_hash=token_hash)
-    except PacienteResetToken.DoesNotExist:
-        return None
-    return obj if obj.is_valid() else None
+    return (PacienteResetToken.vigentes()
+            .select_related("paciente")
+            .filter(token_hash=token_hash)
+            .first())
+
+def consumir_token(token_obj) -> bool:
+    """
+    Marca el token como usado solo si sigue vigente (UPDATE condicional).
+    Devuelve False si otro request lo usó o venció entre la validación y el uso.
+    """
+    ahora = timezone.now()
+    usados = PacienteResetToken.vigentes(ahora).filter(pk=token_obj.pk).update(used_at=ahora)
+    if usados:
+        token_obj.used_at = ahora
+    return bool(usados)
 
 def generar_password(longitud=12):
     alfabeto = string.ascii_letters + string.digits + "!@#$%&*"
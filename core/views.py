@@ -1,16 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .utils import user_has_role, crear_token_reset, obtener_token_valido, generar_password
-from .decorators import role_required, paciente_login_required
+from .utils import user_has_role, crear_token_reset, obtener_token_valido, consumir_token, generar_password
+from .decorators import role_required, apaciente_login_required, lectura_replica
+from .ratelimit import Regla, limitar_intentos, ip_cliente, rut_enviado, token_de_url
+from . import cache_aside, catalogos, confirmaciones, directorio, proyecciones, salas
+from django.conf import settings
 from .models import *
 from django.contrib import messages
-from .forms import LoginPacienteForm, CambioPasswordPacienteForm, ProCitaEstadoNotaForm, SolicitarResetForm, ResetPasswordForm, PacienteCreateForm, PacienteEditForm , ProfesionalHorarioForm, AsignarCitaForm, CambiarEstadoCitaForm
+from .forms import LoginPacienteForm, CambioPasswordPacienteForm, ProCitaEstadoNotaForm, SolicitarResetForm, ResetPasswordForm, PacienteCreateForm, PacienteEditForm , ProfesionalHorarioForm, AsignarCitaForm, CambiarEstadoCitaForm, TramoHorarioForm
 from django.urls import reverse
-from django.core.cache import cache
 from django.core.mail import send_mail
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.db.models.functions import Replace, Upper
-from django.db.models import F, Value, Prefetch
+from django.db.models import F, Value
 from django.core.paginator import Paginator
 import re
 import datetime as dat
@@ -19,24 +21,31 @@ from django.utils.dateparse import parse_date
 from core.agendas import (
     generar_agendas_para_profesional,
     actualizar_disponibilidad_y_regenerar,
+    guardar_horario,
+    horario_actual,
 )
-from .citas import asignar_cita, cancelar_cita, cambiar_estado, pro_actualizar_cita_estado_y_nota
+from .citas import asignar_cita, cancelar_cita, cambiar_estado, pro_actualizar_cita_estado_y_nota, cambiar_estados_en_lote
 from django.core.exceptions import ValidationError, PermissionDenied
 from datetime import time, datetime
 from django.utils.http import url_has_allowed_host_and_scheme
-from django.http import HttpResponse
+from django.http import HttpResponse, Http404
+from asgiref.sync import sync_to_async
 from django.shortcuts import redirect
 from urllib.parse import urlencode, quote
 from django.utils import timezone
 from django.http import JsonResponse
 from django.db.models.functions import TruncWeek
 from django.db.models import Count
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import require_http_methods
+import json
 
 #renderizado de paginas
 def home(request):
     return render(request, 'core/html/home.html')
 
 @role_required("Recepción")
+@lectura_replica
 def recepcion_home(request):
     hoy = timezone.localdate()
     ayer = hoy - dat.timedelta(days=1)
@@ -83,6 +92,7 @@ def recepcion_home(request):
     })
 
 @role_required("Profesional")
+@lectura_replica
 def profesional_home(request):
     _prof_required(request.user)
     prof = _get_prof(request.user)
@@ -104,14 +114,11 @@ def profesional_home(request):
     )
 
     total_hoy    = agendas_hoy_qs.count()
-    ocupados_hoy = Cita.objects.filter(agenda__in=agendas_hoy_qs).count()
+    # Bloques tomados: los sobrecupos comparten el bloque de la cita titular
+    ocupados_hoy = Cita.objects.filter(agenda__in=agendas_hoy_qs, sobrecupo=False).count()
     libres_hoy   = total_hoy - ocupados_hoy
 
-    estado_ids = dict(
-        EstadoCita.objects
-        .filter(nombre__in=["Pendiente", "Ausente"])
-        .values_list("nombre", "id")
-    )
+    estado_ids = catalogos.estados.ids_por_nombre()
     pendientes_hoy = Cita.objects.filter(
         agenda__in=agendas_hoy_qs, estado_id=estado_ids.get("Pendiente", 0)
     ).count() if estado_ids.get("Pendiente") else 0
@@ -206,35 +213,29 @@ def admin_login_gate(request):
 
 # Llamar lista de profesionales para mostrar a los pacientes;
 
+@lectura_replica
 def profesionales_list(request):
 # Parámetros GET
     esp_param = (request.GET.get("especialidad") or "").strip()
     q_param   = (request.GET.get("q") or "").strip()
 
-    # Base: solo activos
-    qs = Profesional.objects.select_related("especialidad").filter(activo=True)
-
     # Filtro por especialidad (si viene un id válido)
+    esp_id = None
     if esp_param:
         try:
             esp_id = int(esp_param)
-            qs = qs.filter(especialidad_id=esp_id)
         except ValueError:
             pass  # ignora valores no numéricos
 
-    # (Opcional) Buscador por nombre/apellido
-    if q_param:
-        qs = qs.filter(
-            Q(nombre__icontains=q_param) | Q(apellido__icontains=q_param)
-        )
-
-    profesionales = qs.order_by("apellido", "nombre")
+    # Grilla de profesionales activos: sale del directorio cacheado (sin tocar la BD
+    # mientras no cambie ningún Profesional/Especialidad); el buscador ignora tildes
+    grilla = mark_safe(directorio.grilla_html(esp_id, q_param[:100]))
 
     # Para rellenar el <select> (todas las especialidades)
-    especialidades = Especialidad.objects.order_by("nombre").values("id", "nombre")
+    especialidades = catalogos.especialidades.todos()
 
     ctx = {
-        "profesionales": profesionales,
+        "grilla": grilla,
         "especialidades": especialidades,
         "selected_esp": esp_param,  # lo usamos para marcar el selected
         "q": q_param,
@@ -245,8 +246,12 @@ def profesionales_list(request):
 def custom_404(request, exception=None):
     return render(request, "core/html/404.html", status=404)
 
-def login_paciente(request):
-    if request.session.get("paciente_id"):
+@limitar_intentos(
+    Regla("ip", ip_cliente, limite=20, ventana=5 * 60),
+    Regla("rut", rut_enviado, limite=5, ventana=15 * 60),
+)
+async def login_paciente(request):
+    if await request.session.aget("paciente_id"):
         return redirect("home")
 
     form = LoginPacienteForm(request.POST or None)
@@ -262,14 +267,14 @@ def login_paciente(request):
             password = form.cleaned_data.get("password") or ""
 
             # Unificamos todos los fallos bajo el mismo mensaje:
-            p = Paciente.objects.filter(rut=rut, is_active=True).first()
-            if not p or not p.password or not p.check_password(password):
+            p = await Paciente.objects.filter(rut=rut, is_active=True).afirst()
+            if not p or not p.password or not await p.acheck_password(password):
                 messages.error(request, error_msg)
             else:
-                request.session.cycle_key()
-                request.session["paciente_id"] = p.id
+                await request.session.acycle_key()
+                await request.session.aset("paciente_id", p.id)
                 p.last_login = timezone.now()
-                p.save(update_fields=["last_login"])
+                await p.asave(update_fields=["last_login"])
                 return redirect(next_url)
         else:
             # Si el form no valida (ej: RUT mal formateado), también mostramos el genérico
@@ -299,11 +304,11 @@ def cambiar_password(request):
         actual = form.cleaned_data["password_actual"]
         nueva  = form.cleaned_data["nueva_password"]
 
-        # validar actual correcta
+        # validar actual correcta (único check_password del submit)
         if not paciente.check_password(actual):
             form.add_error("password_actual", "La contraseña actual no es correcta.")
-        # evitar repetir la misma
-        elif paciente.check_password(nueva):
+        # evitar repetir la misma: "actual" ya es la vigente, basta comparar texto (sin otro hash)
+        elif nueva == actual:
             form.add_error("nueva_password", "La nueva contraseña no puede ser igual a la anterior.")
         else:
             paciente.set_password(nueva)
@@ -318,26 +323,22 @@ def cambiar_password(request):
 
 
 # VISTA DE PRUEBA (ELMINIAR Y REMPLAZAR POR PERFIL REAL)
-@paciente_login_required
-def perfil_paciente(request):
+@apaciente_login_required
+async def perfil_paciente(request):
     # Como el decorador ya validó la sesión, acá tienes el paciente listo:
     paciente = request.paciente
     return render(request, "paciente/perfil.html", {"paciente": paciente})
 
 
+@limitar_intentos(
+    Regla("ip", ip_cliente, limite=5, ventana=60 * 60),
+    Regla("rut", rut_enviado, limite=3, ventana=60 * 60),
+)
 def solicitar_reset(request):
     form = SolicitarResetForm(request.POST or None)
 
-    # (Opcional) Rate-limit simple por IP: 5 intentos por hora
-    ip = request.META.get("REMOTE_ADDR", "unknown")
-    key = f"reset-req:{ip}"
-    count = cache.get(key, 0)
-
+    # El límite por IP/RUT lo aplica @limitar_intentos antes de llegar aquí
     if request.method == "POST" and form.is_valid():
-        if count >= 5:
-            messages.error(request, "Has alcanzado el límite de solicitudes. Inténtalo más tarde.")
-            return render(request, "paciente/solicitar_reset.html", {"form": form})
-
         rut = form.cleaned_data["rut"].strip()
 
         # No revelar si existe o no: respuesta siempre igual.
@@ -362,14 +363,15 @@ def solicitar_reset(request):
                 # En desarrollo: si no hay SMTP, al menos muestra el link en consola
                 print("LINK DE RESET (DEV):", link)
 
-        # incrementar rate
-        cache.set(key, count + 1, timeout=60 * 60)  # 1 hora
-
         messages.success(request, "Si el RUT existe y tiene correo registrado, te enviaremos un enlace para restablecer la contraseña.")
         return redirect("login_paciente")
 
     return render(request, "paciente/solicitar_reset.html", {"form": form})
 
+@limitar_intentos(
+    Regla("ip", ip_cliente, limite=10, ventana=60 * 60),
+    Regla("token", token_de_url, limite=5, ventana=60 * 60),
+)
 def restablecer_password(request, token):
     token_obj = obtener_token_valido(token)
     if not token_obj:
@@ -381,14 +383,17 @@ def restablecer_password(request, token):
         nueva = form.cleaned_data["nueva_password"]
         p = token_obj.paciente
 
-        # Si quieres obligar cambio nuevamente en ingreso, deja True;
-        # si se considera definitivo, marca False. Aquí lo pongo False:
-        p.set_password(nueva)
-        p.debe_cambiar_password = False
-        p.save(update_fields=["password", "debe_cambiar_password"])
+        with transaction.atomic():
+            # El token se consume primero: dos envíos simultáneos no pueden usarlo ambos
+            if not consumir_token(token_obj):
+                messages.error(request, "El enlace es inválido o ha expirado.")
+                return redirect("login_paciente")
 
-        token_obj.used_at = timezone.now()
-        token_obj.save(update_fields=["used_at"])
+            # Si quieres obligar cambio nuevamente en ingreso, deja True;
+            # si se considera definitivo, marca False. Aquí lo pongo False:
+            p.set_password(nueva)
+            p.debe_cambiar_password = False
+            p.save(update_fields=["password", "debe_cambiar_password"])
 
         messages.success(request, "Tu contraseña ha sido restablecida. Ya puedes iniciar sesión.")
         return redirect("login_paciente")
@@ -444,6 +449,7 @@ def probar_404(request):
     return render(request, "core/html/404.html", status=404)
 
 @role_required("Recepción")
+@lectura_replica
 def paciente_list(request):
     q = (request.GET.get("q") or "").strip()
     estado = (request.GET.get("estado") or "todos").strip().lower()
@@ -551,43 +557,32 @@ def paciente_edit(request, pk):
     return render(request, "admin/recepcion/listado_editar_paciente.html", {"form": form, "paciente": paciente})
 
 @role_required("Recepción")
+@lectura_replica
 def recep_agendas_list(request):
-    fecha_str = request.GET.get("fecha")    # yyyy-mm-dd
-    prof_id = request.GET.get("prof")       # id profesional
+    fecha = _fecha_param(request.GET.get("fecha"), timezone.localdate())   # yyyy-mm-dd
+    prof_id = request.GET.get("prof") or ""       # id profesional
+    prof_id = int(prof_id) if prof_id.isdigit() else None
     estado = request.GET.get("estado", "todos")  # todos | libres | ocupados
 
-    fecha = parse_date(fecha_str) if fecha_str else timezone.localdate()
-    tz = timezone.get_current_timezone()
-    inicio_dia = timezone.make_aware(datetime.combine(fecha, time.min), tz)
-    fin_dia    = timezone.make_aware(datetime.combine(fecha, time.max), tz)
-
-
-    qs = (Agenda.objects
-          .filter(inicio__gte=inicio_dia, inicio__lte=fin_dia)
-          .select_related("profesional", "ubicacion", "profesional__especialidad")
-          .order_by("inicio", "profesional__apellido", "profesional__nombre"))
-
-    if prof_id:
-        qs = qs.filter(profesional_id=prof_id)
-
-    qs = qs.prefetch_related(Prefetch("cita", queryset=Cita.objects.select_related("paciente", "estado")))
-
-    if estado == "libres":
-        agendas = [a for a in qs if not hasattr(a, "cita")]
-    elif estado == "ocupados":
-        agendas = [a for a in qs if hasattr(a, "cita")]
-    else:
-        agendas = list(qs)
+    # Filas livianas (una consulta, sin instanciar Agenda/Cita/Paciente por bloque)
+    agendas = proyecciones.bloques_recepcion(
+        fecha, fecha + dat.timedelta(days=1),
+        profesional_id=prof_id, estado=estado,
+    )
 
     profesionales = Profesional.objects.filter(activo=True).order_by("apellido", "nombre")
+    next_param = urlencode({"next": request.get_full_path()})
 
     ctx = {
         "agendas": agendas,
         "profesionales": profesionales,
         "fecha": fecha,
         "f_fecha": fecha.strftime("%Y-%m-%d"),
-        "prof_id": int(prof_id) if prof_id else None,
+        "prof_id": prof_id,
         "estado": estado,
+        # Asignar/Estado/Cancelar vuelven a este listado con los mismos filtros
+        "next_param": next_param,
+        "next_qs": f"?{next_param}",
     }
     return render(request, "admin/recepcion/listado_agendas.html", ctx)
 
@@ -600,7 +595,7 @@ def pro_setup_horario(request):
     prof = get_object_or_404(Profesional, usuario=request.user, activo=True)
 
     initial = {}
-    sala = Ubicacion.objects.filter(nombre__iexact="Sala").first()
+    sala = catalogos.ubicaciones.por_nombre("Sala")
     if sala:
         initial["ubicacion"] = sala.pk
 
@@ -622,9 +617,12 @@ def pro_setup_horario(request):
             msg = (
                 "Disponibilidad actualizada. "
                 f"Eliminados (libres futuros): {metrics.get('deleted_free', 0)}. "
+                f"Conservados: {metrics.get('kept_free', 0)}. "
                 f"Generados: {metrics.get('created', 0)}. "
                 f"Omitidos por pasado: {metrics.get('skipped_past', 0)}. "
-                f"Omitidos por choque con agendas existentes: {metrics.get('skipped_overlap', 0)}."
+                f"Omitidos por choque con agendas existentes: {metrics.get('skipped_overlap', 0)}. "
+                f"Omitidos por feriados/licencias/cierres: {metrics.get('skipped_exception', 0)}. "
+                f"Omitidos por sala ocupada: {metrics.get('skipped_room', 0)}."
             )
             messages.success(request, msg)
             return redirect("pro_agendas_list")
@@ -656,6 +654,7 @@ def _back_to_list(request, default="recep_agendas_list"):
 @role_required("Recepción")
 def recep_asignar_cita(request, agenda_id: int):
     # next permite volver al listado con los filtros
+    sobrecupo = (request.GET.get("sobrecupo") or request.POST.get("sobrecupo")) == "1"
     if request.method == "POST":
         form = AsignarCitaForm(request.POST)
         if form.is_valid():
@@ -663,8 +662,10 @@ def recep_asignar_cita(request, agenda_id: int):
                 p = form.cleaned_data["paciente"]
                 estado = form.cleaned_data["estado"]
                 motivo = form.cleaned_data.get("motivo") or ""
-                asignar_cita(agenda_id=agenda_id, paciente=p, estado=estado, usuario=request.user, motivo=motivo)
-                messages.success(request, "Cita creada correctamente.")
+                cita = asignar_cita(agenda_id=agenda_id, paciente=p, estado=estado, usuario=request.user,
+                                    motivo=motivo, sobrecupo=sobrecupo)
+                messages.success(request, "Sobrecupo creado correctamente." if cita.sobrecupo
+                                 else "Cita creada correctamente.")
                 return _back_to_list(request)
             except ValidationError as e:
                 form.add_error(None, e.message)
@@ -676,6 +677,7 @@ def recep_asignar_cita(request, agenda_id: int):
     return render(request, "admin/recepcion/citas_asignar.html", {
         "form": form,
         "agenda_id": agenda_id,
+        "sobrecupo": sobrecupo,
         "next": request.GET.get("next", ""),
     })
 
@@ -712,6 +714,119 @@ def recep_cambiar_estado(request, cita_id: int):
         "next": request.GET.get("next", ""),
     })
 
+def _fecha_param(valor, defecto):
+    """yyyy-mm-dd de la URL -> date; vacío, mal formado o imposible (p.ej. 31/02) -> defecto."""
+    try:
+        return parse_date(valor or "") or defecto
+    except ValueError:
+        return defecto
+
+@role_required("Recepción")
+def recep_cierre_dia(request):
+    """
+    Cierre de asistencia del día: lista todas las citas de la fecha y aplica en un solo
+    envío los estados elegidos (un UPDATE por estado y auditoría en lote).
+    """
+    fecha = _fecha_param(request.GET.get("fecha") or request.POST.get("fecha"), timezone.localdate())
+    prof_id = request.GET.get("prof") or request.POST.get("prof") or ""
+    prof_id = int(prof_id) if prof_id.isdigit() else None
+    estados = catalogos.estados.todos()
+
+    if request.method == "POST":
+        cambios = {}
+        for key, value in request.POST.items():
+            if not key.startswith("estado_"):
+                continue
+            estado = catalogos.estados.get(value)
+            if estado is None:
+                continue
+            try:
+                cambios[int(key.removeprefix("estado_"))] = estado
+            except ValueError:
+                continue
+        try:
+            n = cambiar_estados_en_lote(cambios, usuario=request.user)
+            messages.success(request, f"Cierre aplicado: {n} cita(s) actualizada(s).")
+        except Exception as e:
+            messages.error(request, f"No se pudo aplicar el cierre: {e}")
+        params = {"fecha": fecha.isoformat()}
+        if prof_id:
+            params["prof"] = prof_id
+        return redirect(f"{reverse('recep_cierre_dia')}?{urlencode(params)}")
+
+    tz = timezone.get_current_timezone()
+    inicio_dia = timezone.make_aware(datetime.combine(fecha, time.min), tz)
+    fin_dia    = timezone.make_aware(datetime.combine(fecha, time.max), tz)
+
+    citas = (Cita.objects
+             .filter(agenda__inicio__gte=inicio_dia, agenda__inicio__lte=fin_dia)
+             .select_related("paciente", "estado", "agenda", "agenda__profesional")
+             .order_by("agenda__inicio", "agenda__profesional__apellido"))
+    if prof_id:
+        citas = citas.filter(agenda__profesional_id=prof_id)
+
+    return render(request, "admin/recepcion/citas_cierre_dia.html", {
+        "citas": list(citas),
+        "estados": estados,
+        "profesionales": Profesional.objects.filter(activo=True).order_by("apellido", "nombre"),
+        "fecha": fecha,
+        "f_fecha": fecha.strftime("%Y-%m-%d"),
+        "prof_id": prof_id,
+    })
+
+@role_required("Recepción")
+def recep_confirmaciones(request):
+    """
+    Lista de llamadas de confirmación: citas Pendiente de los próximos días ordenadas por
+    riesgo de ausencia, con el último intento de contacto. El POST registra de una vez
+    los resultados elegidos (un ContactoCita por fila).
+    """
+    try:
+        dias = min(max(int(request.GET.get("dias") or request.POST.get("dias") or 3), 1), 30)
+    except ValueError:
+        dias = 3
+    prof_id = request.GET.get("prof") or request.POST.get("prof") or ""
+    prof_id = int(prof_id) if prof_id.isdigit() else None
+    params = {"dias": dias, **({"prof": prof_id} if prof_id else {})}
+
+    if request.method == "POST":
+        canal = request.POST.get("canal")
+        validos = ContactoCita.Resultado.values
+        resultados = {}
+        for key, value in request.POST.items():
+            if key.startswith("resultado_") and value in validos:
+                try:
+                    resultados[int(key.removeprefix("resultado_"))] = value
+                except ValueError:
+                    continue
+        if canal not in ContactoCita.Canal.values:
+            messages.error(request, "Selecciona el canal de contacto.")
+        elif not resultados:
+            messages.error(request, "No se marcó ningún resultado.")
+        else:
+            r = confirmaciones.registrar_contactos(
+                resultados, canal, request.user, (request.POST.get("descripcion") or "").strip()
+            )
+            messages.success(request, f"{r['registrados']} contacto(s) registrado(s); {r['confirmadas']} cita(s) confirmada(s).")
+        return redirect(f"{reverse('recep_confirmaciones')}?{urlencode(params)}")
+
+    cursor = request.GET.get("despues")
+    if not cursor:
+        confirmaciones.puntuar_faltantes(dias, prof_id)
+    filas, siguiente = confirmaciones.pagina(confirmaciones.por_confirmar(dias, prof_id), cursor)
+
+    return render(request, "admin/recepcion/confirmaciones.html", {
+        "filas": filas,
+        "siguiente": siguiente,
+        "es_primera": not cursor,
+        "params": urlencode(params),
+        "dias": dias,
+        "prof_id": prof_id,
+        "profesionales": Profesional.objects.filter(activo=True).order_by("apellido", "nombre"),
+        "resultados": ContactoCita.Resultado.choices,
+        "canales": ContactoCita.Canal.choices,
+    })
+
 def _prof_required(user):
     if not user_has_role(user, "Profesional"):
         raise PermissionDenied("No eres profesional.")
@@ -719,30 +834,83 @@ def _prof_required(user):
 def _get_prof(user):
     return get_object_or_404(Profesional, usuario=user, activo=True)
 
+def _tramo_json(t: dict) -> dict:
+    return {**t, "hora_inicio": f"{t['hora_inicio']:%H:%M}", "hora_fin": f"{t['hora_fin']:%H:%M}"}
+
+
+@role_required("Profesional")
+@require_http_methods(["GET", "PUT"])
+def pro_horario_api(request):
+    """
+    Editor de horario semanal (JSON).
+    - GET: {"tramos": [...]} con el horario activo.
+    - PUT {"tramos": [{dia_semana, hora_inicio "HH:MM", hora_fin, duracion_minutos,
+      modalidad, ubicacion_id}, ...]}: reemplaza el horario completo (turnos partidos,
+      distintas salas por día) y aplica solo los cambios de slots que implica.
+      Errores: 400 {"errores": {indice: {...}}} por tramo o {"errores": {"__all__": [...]}}
+      si los tramos se cruzan.
+    """
+    prof = get_object_or_404(Profesional, usuario=request.user, activo=True)
+    if request.method == "GET":
+        return JsonResponse({"tramos": [_tramo_json(t) for t in horario_actual(prof)]})
+
+    try:
+        tramos_in = json.loads(request.body or b"{}").get("tramos")
+    except (ValueError, AttributeError):
+        tramos_in = None
+    if not isinstance(tramos_in, list):
+        return JsonResponse({"errores": {"__all__": ["Se espera {\"tramos\": [...]}."]}}, status=400)
+
+    tramos, errores = [], {}
+    for i, data in enumerate(tramos_in):
+        if isinstance(data, dict) and "ubicacion_id" in data:
+            data = {**data, "ubicacion": data["ubicacion_id"]}
+        form = TramoHorarioForm(data if isinstance(data, dict) else {})
+        if form.is_valid():
+            tramos.append(form.cleaned_data)
+        else:
+            errores[i] = form.errors.get_json_data()
+    if errores:
+        return JsonResponse({"errores": errores}, status=400)
+
+    try:
+        metrics = guardar_horario(prof, tramos, weeks_ahead=8)
+    except ValidationError as e:
+        return JsonResponse({"errores": {"__all__": e.messages}}, status=400)
+    return JsonResponse({
+        "metricas": metrics,
+        "tramos": [_tramo_json(t) for t in horario_actual(prof)],
+    })
+
+
 @role_required("Profesional")
+@lectura_replica
 def pro_agendas_list(request):
     _prof_required(request.user)
     prof = _get_prof(request.user)
 
-    fecha_str = request.GET.get("fecha")
-    fecha = parse_date(fecha_str) if fecha_str else timezone.localdate()
+    fecha = _fecha_param(request.GET.get("fecha"), timezone.localdate())
+    modo = request.GET.get("modo") if request.GET.get("modo") in proyecciones.MODOS else "dia"
 
-    tz = timezone.get_current_timezone()
-    inicio_dia = timezone.make_aware(datetime.combine(fecha, time.min), tz)
-    fin_dia    = timezone.make_aware(datetime.combine(fecha, time.max), tz)
+    # Todo el rango (día/semana/mes) en una consulta, filas livianas agrupadas por día
+    desde, hasta = proyecciones.rango_para(fecha, modo)
+    bloques = proyecciones.bloques_profesional(prof.id, desde, hasta)
+    dias = proyecciones.agrupar_por_dia(bloques, desde, hasta)
 
-    qs = (Agenda.objects
-          .filter(profesional=prof, inicio__gte=inicio_dia, inicio__lte=fin_dia)
-          .select_related("ubicacion")
-          .order_by("inicio"))
-
-    # Trae la cita si existe
-    qs = qs.prefetch_related(Prefetch("cita", queryset=Cita.objects.select_related("paciente", "estado")))
+    # Navegación: el rango anterior/siguiente del mismo modo
+    anterior = proyecciones.rango_para(desde - dat.timedelta(days=1), modo)[0]
 
     ctx = {
-        "agendas": qs,
+        "dias": dias,
+        "modo": modo,
+        "total": sum(d.total for d in dias),
+        "ocupados": sum(d.ocupados for d in dias),
+        "desde": desde,
+        "hasta": hasta - dat.timedelta(days=1),
         "fecha": fecha,
         "f_fecha": fecha.strftime("%Y-%m-%d"),
+        "f_anterior": anterior.strftime("%Y-%m-%d"),
+        "f_siguiente": hasta.strftime("%Y-%m-%d"),
     }
     return render(request, "admin/profesional/agendas.html", ctx)
 
@@ -784,8 +952,15 @@ def pro_cita_detail(request, cita_id: int):
         "volver_agenda_url": reverse("pro_agendas_list") + f"?fecha={cita.agenda.inicio.date():%Y-%m-%d}",
     })
 
-@paciente_login_required
-def paciente_citas(request):
+def _paginar(qs, numero, por_pagina):
+    page_obj = Paginator(qs, por_pagina).get_page(numero)
+    page_obj.object_list = list(page_obj.object_list)  # se evalúa aquí, no al renderizar
+    return page_obj
+
+
+@apaciente_login_required
+@lectura_replica
+async def paciente_citas(request):
     paciente = request.paciente
     now = timezone.now()
 
@@ -800,11 +975,11 @@ def paciente_citas(request):
         )
     )
 
-    proximas = base_qs.filter(agenda__inicio__gte=now).order_by("agenda__inicio")
+    proximas = [c async for c in base_qs.filter(agenda__inicio__gte=now).order_by("agenda__inicio")]
     pasadas_qs = base_qs.filter(agenda__inicio__lt=now).order_by("-agenda__inicio")
 
-    paginator = Paginator(pasadas_qs, 10)
-    page_obj = paginator.get_page(request.GET.get("page"))
+    # Paginator es síncrono (count + slice): se ejecuta en un hilo
+    page_obj = await sync_to_async(_paginar)(pasadas_qs, request.GET.get("page"), 10)
 
     ctx = {"proximas": proximas, "page_obj": page_obj}
     return render(request, "paciente/mis_citas.html", ctx)
@@ -816,7 +991,7 @@ def _utcstamp(dt):
     """Retorna dt en UTC con formato iCal YYYYMMDDTHHMMSSZ."""
     if timezone.is_naive(dt):
         dt = timezone.make_aware(dt, timezone.get_current_timezone())
-    dt_utc = dt.astimezone(timezone.utc)
+    dt_utc = dt.astimezone(dat.timezone.utc)
     return dt_utc.strftime("%Y%m%dT%H%M%SZ")
 
 def _gcal_localstamp(dt):
@@ -862,15 +1037,20 @@ def _time_range_from_agenda(cita: Cita):
 
 # --- Descarga .ICS ---
 
-@paciente_login_required
-def paciente_cita_ics(request, cita_id: int):
+async def _cita_del_paciente(request, cita_id: int) -> Cita:
     # solo el dueño de la cita
-    cita = get_object_or_404(
-        Cita.objects.select_related(
-            "paciente", "estado", "agenda", "agenda__profesional", "agenda__ubicacion"
-        ),
-        pk=cita_id, paciente=request.paciente
-    )
+    cita = await (Cita.objects
+                  .select_related("paciente", "estado", "agenda", "agenda__profesional", "agenda__ubicacion")
+                  .filter(pk=cita_id, paciente=request.paciente)
+                  .afirst())
+    if cita is None:
+        raise Http404("Cita no encontrada")
+    return cita
+
+
+@apaciente_login_required
+async def paciente_cita_ics(request, cita_id: int):
+    cita = await _cita_del_paciente(request, cita_id)
 
     start_dt, end_dt = _time_range_from_agenda(cita)
     uid      = f"cita-{cita.id}@mihora-lampa"
@@ -910,14 +1090,9 @@ def paciente_cita_ics(request, cita_id: int):
 
 # --- Deep link Google Calendar ---
 
-@paciente_login_required
-def paciente_cita_google(request, cita_id: int):
-    cita = get_object_or_404(
-        Cita.objects.select_related(
-            "paciente", "estado", "agenda", "agenda__profesional", "agenda__ubicacion"
-        ),
-        pk=cita_id, paciente=request.paciente
-    )
+@apaciente_login_required
+async def paciente_cita_google(request, cita_id: int):
+    cita = await _cita_del_paciente(request, cita_id)
     start_dt, end_dt = _time_range_from_agenda(cita)
 
     params = {
@@ -948,12 +1123,14 @@ def recep_kpis(request):
     default_hasta = hoy.isoformat()
 
     return render(request, "admin/kpis.html", {
-        "profesionales": profesionales,
+        "profesionales": profesionales.select_related("especialidad"),
+        "version_directorio": directorio.version(),
         "default_desde": default_desde,
         "default_hasta": default_hasta,
     })
 
 @role_required("Recepción")
+@lectura_replica
 def recep_kpis_data(request):
     """
     Devuelve JSON con KPIs por rango y (opcional) por profesional.
@@ -970,18 +1147,28 @@ def recep_kpis_data(request):
     desde = parse_date(request.GET.get("desde") or "") or (hoy - timezone.timedelta(weeks=8))
     hasta = parse_date(request.GET.get("hasta") or "") or hoy
     prof_id = request.GET.get("prof")
+    if prof_id:
+        try:
+            prof_id = int(prof_id)
+        except ValueError:
+            pass
+
+    # Varias recepcionistas miran el mismo rango: se cachea el resultado unos minutos
+    clave = f"kpis:{desde.isoformat()}:{hasta.isoformat()}:{prof_id or 0}"
+    datos = cache_aside.obtener_o_calcular(
+        clave, lambda: _calcular_kpis(desde, hasta, prof_id), timeout=settings.KPIS_CACHE_TTL
+    )
+    return JsonResponse(datos)
 
+
+def _calcular_kpis(desde, hasta, prof_id) -> dict:
     # Nos basamos en la fecha de la atención (agenda.inicio), no la fecha de creación de la cita.
     base = (Cita.objects
             .select_related("estado", "agenda", "agenda__profesional")
             .filter(agenda__inicio__date__gte=desde, agenda__inicio__date__lte=hasta))
 
-    if prof_id:
-        try:
-            prof_id = int(prof_id)
-            base = base.filter(agenda__profesional_id=prof_id)
-        except ValueError:
-            pass
+    if isinstance(prof_id, int):
+        base = base.filter(agenda__profesional_id=prof_id)
 
     # Normalizamos algunos nombres esperados (ajusta si tus estados se llaman distinto)
     EST_NOMBRES = {
@@ -992,8 +1179,7 @@ def recep_kpis_data(request):
         "PENDIENTE": "Pendiente",
     }
     # Set de todos los estados que aparecerán como series
-    estados_obj = EstadoCita.objects.all().values_list("nombre", flat=True)
-    estados_sistema = list(estados_obj)  # p.ej. ["Pendiente","Confirmada","Atendida","Ausente","Cancelada"]
+    estados_sistema = catalogos.estados.nombres()  # p.ej. ["Atendida","Ausente","Cancelada","Confirmada","Pendiente"]
 
     # ------- Series semanales por estado -------
     tz = timezone.get_current_timezone()
@@ -1035,7 +1221,7 @@ def recep_kpis_data(request):
     tasa_asistencia = round(100 * atendidas / base_asistencia, 1)
     tasa_ausentismo = round(100 * ausentes / base_asistencia, 1)
 
-    return JsonResponse({
+    return {
         "rango": {"desde": desde.isoformat(), "hasta": hasta.isoformat(), "prof": prof_id},
         "labels_semanas": semanas,
         "series": series,                # { "Atendida":[..], "Ausente":[..], ... }
@@ -1050,4 +1236,28 @@ def recep_kpis_data(request):
             "tasa_asistencia": tasa_asistencia,
             "tasa_ausentismo": tasa_ausentismo,
         },
+    }
+
+
+SALAS_MAX_DIAS = 31
+
+@role_required("Recepción")
+@lectura_replica
+def recep_ocupacion_salas(request):
+    """
+    Ocupación de cada sala por hora del día (presencial), por defecto la semana actual.
+    GET: desde=YYYY-MM-DD, hasta=YYYY-MM-DD (inclusive, a lo más SALAS_MAX_DIAS días).
+    """
+    hoy = timezone.localdate()
+    desde = _fecha_param(request.GET.get("desde"), hoy - dat.timedelta(days=hoy.weekday()))
+    hasta = _fecha_param(request.GET.get("hasta"), desde + dat.timedelta(days=6))
+    if hasta < desde:
+        desde, hasta = hasta, desde
+    # La consulta reparte cada bloque del rango por hora: se acota el rango
+    hasta = min(hasta, desde + dat.timedelta(days=SALAS_MAX_DIAS - 1))
+
+    return render(request, "admin/ocupacion_salas.html", {
+        "desde": desde,
+        "hasta": hasta,
+        "ocupacion": salas.ocupacion_por_hora(desde, hasta + dat.timedelta(days=1)),
     })